@@ -0,0 +1,251 @@
+import argparse
+import logging
+import os
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import yaml
+
+from metadata_index import METADATA_FILE_NAME
+from stl_mesh import STL_FACET_DTYPE, STL_HEADER_SIZE
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+CORRUPTION_FLIP = "flip"
+CORRUPTION_DEGENERATE = "degenerate"
+CORRUPTION_HOLE = "hole"
+CORRUPTIONS: List[str] = [CORRUPTION_FLIP, CORRUPTION_DEGENERATE, CORRUPTION_HOLE]
+
+PRINTERS: List[str] = ["V0.2", "V1.8", "V2.4", "VSW", "VT"]
+# Fixed dates keep the generated git history (and therefore the commit hashes) identical between runs
+GIT_EPOCH = 1672531200
+GIT_COMMIT_INTERVAL = 3600
+
+
+def make_closed_mesh(facet_count: int, rng: np.random.Generator) -> np.ndarray:
+    # Closed, consistently oriented, bumpy UV sphere with roughly facet_count facets, shape (facets, 3, 3)
+    segments: int = max(3, int(round(np.sqrt(facet_count / 2))))
+    rings: int = max(3, int(round(facet_count / (2 * segments))) + 1)
+    theta: np.ndarray = np.linspace(0, np.pi, rings + 1)[1:-1]
+    phi: np.ndarray = np.linspace(0, 2 * np.pi, segments, endpoint=False)
+    radius: np.ndarray = 10.0 * (1.0 + 0.1 * rng.random((len(theta), segments)))
+    ring_vertices: np.ndarray = np.stack(
+        [
+            radius * np.sin(theta)[:, None] * np.cos(phi)[None, :],
+            radius * np.sin(theta)[:, None] * np.sin(phi)[None, :],
+            radius * np.cos(theta)[:, None] * np.ones_like(phi)[None, :],
+        ],
+        axis=-1,
+    ).reshape(-1, 3)
+    top, bottom = len(ring_vertices), len(ring_vertices) + 1
+    vertices: np.ndarray = np.vstack([ring_vertices, [[0.0, 0.0, 10.0], [0.0, 0.0, -10.0]]])
+
+    index = lambda ring, segment: ring * segments + segment % segments  # noqa: E731
+    triangles: List[List[int]] = []
+    for segment in range(segments):
+        triangles.append([top, index(0, segment), index(0, segment + 1)])
+        triangles.append([bottom, index(len(theta) - 1, segment + 1), index(len(theta) - 1, segment)])
+        for ring in range(len(theta) - 1):
+            triangles.append([index(ring, segment), index(ring + 1, segment), index(ring + 1, segment + 1)])
+            triangles.append([index(ring, segment), index(ring + 1, segment + 1), index(ring, segment + 1)])
+    return vertices[np.array(triangles)]
+
+
+def random_rotation(rng: np.random.Generator) -> np.ndarray:
+    # QR decomposition of a gaussian matrix gives a uniformly distributed rotation
+    q, r = np.linalg.qr(rng.normal(size=(3, 3)))
+    q = q * np.sign(np.diag(r))
+    if np.linalg.det(q) < 0:
+        q[:, 0] = -q[:, 0]
+    return q
+
+
+def generate_stl(
+    stl_file: Path, facet_count: int, seed: int, corruptions: Optional[List[str]] = None, rotate: bool = False, corrupt_count: int = 4
+):
+    rng: np.random.Generator = np.random.default_rng(seed)
+    triangles: np.ndarray = make_closed_mesh(facet_count=facet_count, rng=rng)
+    if rotate:
+        triangles = triangles @ random_rotation(rng).T
+    for corruption in corruptions or []:
+        selected: np.ndarray = rng.choice(len(triangles), size=min(corrupt_count, len(triangles)), replace=False)
+        if corruption == CORRUPTION_FLIP:
+            triangles[selected] = triangles[selected][:, [0, 2, 1]]
+        elif corruption == CORRUPTION_DEGENERATE:
+            triangles[selected, 2] = triangles[selected, 1]
+        elif corruption == CORRUPTION_HOLE:
+            triangles = np.delete(triangles, selected, axis=0)
+    facets: np.ndarray = np.zeros(len(triangles), dtype=STL_FACET_DTYPE)
+    normals: np.ndarray = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    lengths: np.ndarray = np.linalg.norm(normals, axis=1, keepdims=True)
+    facets["normal"] = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+    facets["vertices"] = triangles
+    stl_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(stl_file, "wb") as f:
+        f.write(b"bench_generate".ljust(STL_HEADER_SIZE, b" "))
+        f.write(np.uint32(len(facets)).tobytes())
+        f.write(facets.tobytes())
+
+
+def git(repo_dir: Path, *git_args: str, date: int = GIT_EPOCH):
+    env: Dict[str, str] = {
+        **os.environ,
+        "GIT_AUTHOR_NAME": "bench",
+        "GIT_AUTHOR_EMAIL": "bench@example.com",
+        "GIT_COMMITTER_NAME": "bench",
+        "GIT_COMMITTER_EMAIL": "bench@example.com",
+        "GIT_AUTHOR_DATE": f"{date} +0000",
+        "GIT_COMMITTER_DATE": f"{date} +0000",
+    }
+    subprocess.run(["git", "-C", repo_dir.as_posix(), *git_args], check=True, env=env, stdout=subprocess.DEVNULL)
+
+
+def generate_mod_repository(
+    root: Path,
+    creators: int,
+    mods_per_creator: int,
+    stls_per_mod: int,
+    facet_count: int,
+    commits: int,
+    seed: int,
+    corrupt_ratio: float = 0.1,
+    missing_reference_ratio: float = 0.05,
+) -> Dict[str, int]:
+    # Fake VoronUsers tree: <creator>/<mod>/{.metadata.yml, STLs/*.stl, Images/*.png} in a git repository,
+    # the mods are spread over the given number of commits
+    rng: np.random.Generator = np.random.default_rng(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    git(root, "init", "-q")
+    mod_dirs: List[Path] = []
+    stl_count: int = 0
+    for creator_index in range(creators):
+        for mod_index in range(mods_per_creator):
+            mod_dir: Path = Path(root, f"creator_{creator_index:04d}", f"mod_{mod_index:04d}")
+            stl_names: List[str] = []
+            for stl_index in range(stls_per_mod):
+                stl_name: str = f"part_{stl_index}.stl"
+                corrupt: bool = rng.random() < corrupt_ratio
+                generate_stl(
+                    stl_file=Path(mod_dir, "STLs", stl_name),
+                    facet_count=facet_count,
+                    seed=int(rng.integers(2**31)),
+                    corruptions=[str(rng.choice(CORRUPTIONS))] if corrupt else None,
+                    rotate=bool(rng.random() < 0.5),
+                )
+                stl_names.append(f"STLs/{stl_name}")
+                stl_count += 1
+            Path(mod_dir, "Images").mkdir(parents=True, exist_ok=True)
+            Path(mod_dir, "Images", "mod.png").write_bytes(b"")
+            cad: List[str] = list(stl_names)
+            if rng.random() < missing_reference_ratio:
+                cad.append("STLs/missing.stl")
+            metadata: Dict[str, object] = {
+                "title": f"Mod {mod_index} by creator {creator_index}",
+                "description": f"Synthetic benchmark mod {mod_index} of creator {creator_index}",
+                "printer_compatibility": sorted(rng.choice(PRINTERS, size=2, replace=False).tolist()),
+                "mod_version": 1,
+                "cad": cad,
+                "images": ["Images/mod.png"],
+            }
+            Path(mod_dir, METADATA_FILE_NAME).write_text(yaml.safe_dump(metadata), encoding="utf-8")
+            mod_dirs.append(mod_dir)
+
+    commit_count: int = max(1, min(commits, len(mod_dirs)))
+    for commit_index, commit_mods in enumerate(np.array_split(np.arange(len(mod_dirs)), commit_count)):
+        git(root, "add", *[mod_dirs[mod_index].relative_to(root).as_posix() for mod_index in commit_mods])
+        git(root, "commit", "-q", "-m", f"Add mods, part {commit_index}", date=GIT_EPOCH + commit_index * GIT_COMMIT_INTERVAL)
+    logger.info(f"Generated {len(mod_dirs)} mods with {stl_count} STLs in {commit_count} commits in {root.as_posix()}")
+    return {"mods": len(mod_dirs), "stls": stl_count, "commits": commit_count}
+
+
+def main(args: argparse.Namespace):
+    if args.verbose:
+        logger.setLevel("INFO")
+    generate_mod_repository(
+        root=Path(args.output_dir),
+        creators=args.creators,
+        mods_per_creator=args.mods_per_creator,
+        stls_per_mod=args.stls_per_mod,
+        facet_count=args.facets,
+        commits=args.commits,
+        seed=args.seed,
+    )
+
+
+def add_generator_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--creators",
+        required=False,
+        action="store",
+        type=int,
+        default=20,
+        help="Number of creators in the generated repository",
+    )
+    parser.add_argument(
+        "--mods_per_creator",
+        required=False,
+        action="store",
+        type=int,
+        default=5,
+        help="Number of mods per creator",
+    )
+    parser.add_argument(
+        "--stls_per_mod",
+        required=False,
+        action="store",
+        type=int,
+        default=2,
+        help="Number of STLs per mod",
+    )
+    parser.add_argument(
+        "--facets",
+        required=False,
+        action="store",
+        type=int,
+        default=5000,
+        help="Approximate number of facets per generated STL",
+    )
+    parser.add_argument(
+        "--commits",
+        required=False,
+        action="store",
+        type=int,
+        default=50,
+        help="Number of commits the mods are spread over",
+    )
+    parser.add_argument(
+        "--seed",
+        required=False,
+        action="store",
+        type=int,
+        default=0,
+        help="Seed of the generator, identical seeds generate identical repositories",
+    )
+
+
+if __name__ == "__main__":
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog="VoronDesign benchmark data generator",
+        description="This tool generates a deterministic fake VoronUsers repository with synthetic STLs and git history",
+    )
+    parser.add_argument(
+        "-o",
+        "--output_dir",
+        required=True,
+        action="store",
+        type=str,
+        help="Directory to generate the repository into",
+    )
+    add_generator_arguments(parser)
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        required=False,
+        action="store_true",
+        help="Print debug output to stdout",
+    )
+    args: argparse.Namespace = parser.parse_args()
+    main(args=args)
@@ -0,0 +1,189 @@
+import argparse
+import itertools
+import logging
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from bench_generate import make_closed_mesh
+from stl_mesh import STL_FACET_DTYPE, convert_ascii_stl, load_binary_stl, parse_ascii_stl
+from stl_sidecar import get_binary_stl
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+BENCHMARK_PREAMBLE = """## ASCII STL loading
+
+| Filename | Facets | Size [MB] | {loaders} |
+| --- | --- | --- | {separators} |
+"""
+
+BENCHMARK_SUMMARY = """
+Times are the median of {repeats} runs in seconds, the peak memory traced by tracemalloc is given in parentheses where it is meaningful.
+The binary sidecar is created once by the first stage which loads an ASCII STL, all later stages and runs only load the sidecar.
+"""
+
+ASCII_FACET_FORMAT = (
+    "facet normal {:.9g} {:.9g} {:.9g}\n  outer loop\n    vertex {:.9g} {:.9g} {:.9g}\n    vertex {:.9g} {:.9g} {:.9g}\n"
+    "    vertex {:.9g} {:.9g} {:.9g}\n  endloop\nendfacet\n"
+)
+
+
+def write_ascii_stl(facets: np.ndarray, stl_file: Path):
+    values: np.ndarray = np.concatenate([facets["normal"], facets["vertices"].reshape(-1, 9)], axis=1).astype(np.float64)
+    with open(stl_file, "w", encoding="ascii") as f:
+        f.write(f"solid {stl_file.stem}\n")
+        for row in values.tolist():
+            f.write(ASCII_FACET_FORMAT.format(*row))
+        f.write(f"endsolid {stl_file.stem}\n")
+
+
+def generate_ascii_stls(output_dir: Path, facet_counts: List[int], seed: int) -> List[Path]:
+    stls: List[Path] = []
+    for facet_count in facet_counts:
+        triangles: np.ndarray = make_closed_mesh(facet_count=facet_count, rng=np.random.default_rng(seed))
+        facets: np.ndarray = np.zeros(len(triangles), dtype=STL_FACET_DTYPE)
+        facets["vertices"] = triangles
+        stl_file: Path = Path(output_dir, f"sphere_{facet_count}.stl")
+        write_ascii_stl(facets=facets, stl_file=stl_file)
+        stls.append(stl_file)
+    return stls
+
+
+def convert_to_ascii(stls: List[Path], output_dir: Path) -> List[Path]:
+    # Binary STLs of the corpus are benchmarked as their ASCII equivalent
+    ascii_stls: List[Path] = []
+    for stl in stls:
+        facets: Optional[np.ndarray] = load_binary_stl(stl)
+        if facets is None:
+            ascii_stls.append(stl)
+            continue
+        ascii_stl: Path = Path(output_dir, f"{len(ascii_stls)}_{stl.name}")
+        write_ascii_stl(facets=facets, stl_file=ascii_stl)
+        ascii_stls.append(ascii_stl)
+    return ascii_stls
+
+
+def get_loaders(scratch_dir: Path) -> Dict[str, Tuple[Callable[[Path], Any], bool]]:
+    # Loader name to the loader and whether its allocations are visible to tracemalloc
+    loaders: Dict[str, Tuple[Callable[[Path], Any], bool]] = {}
+    try:
+        from admesh import Stl
+
+        loaders["admesh"] = (lambda stl: Stl(stl.as_posix()), False)
+    except ImportError:
+        logger.warning("admesh is not installed, skipping its loader")
+    try:
+        from tweaker3 import FileHandler
+
+        file_handler: FileHandler.FileHandler = FileHandler.FileHandler()
+        loaders["tweaker3"] = (lambda stl: file_handler.load_mesh(inputfile=stl.as_posix()), True)
+    except ImportError:
+        logger.warning("tweaker3 is not installed, skipping its loader")
+    loaders["numpy"] = (lambda stl: parse_ascii_stl(stl.read_bytes()), True)
+    loaders["numpy streaming"] = (lambda stl: convert_ascii_stl(stl_file=stl, binary_stl_file=Path(scratch_dir, "streamed.stl")), True)
+    # The sidecar already exists, loading it is what every stage after the first one does
+    loaders["sidecar"] = (
+        lambda stl: np.array(load_binary_stl(get_binary_stl(stl_file=stl, sidecar_dir=Path(scratch_dir, "sidecars").as_posix()))),
+        True,
+    )
+    return loaders
+
+
+def measure(loader: Callable[[Path], Any], stl: Path, repeats: int, traced: bool) -> Tuple[float, Optional[float]]:
+    loader(stl)
+    durations: List[float] = []
+    for _ in range(repeats):
+        start_time: float = time.perf_counter()
+        loader(stl)
+        durations.append(time.perf_counter() - start_time)
+    peak_mb: Optional[float] = None
+    if traced:
+        tracemalloc.start()
+        loader(stl)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+    return statistics.median(durations), peak_mb
+
+
+def main(args: argparse.Namespace):
+    if args.verbose:
+        logger.setLevel("INFO")
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        if args.input_dir is not None:
+            input_path: Path = Path(args.input_dir)
+            stls: List[Path] = sorted(itertools.chain(input_path.glob("**/*.stl"), input_path.glob("**/*.STL")))
+            stls = convert_to_ascii(stls=stls, output_dir=Path(scratch_dir))
+        else:
+            stls = generate_ascii_stls(output_dir=Path(scratch_dir), facet_counts=args.facets, seed=args.seed)
+        loaders: Dict[str, Tuple[Callable[[Path], Any], bool]] = get_loaders(scratch_dir=Path(scratch_dir))
+        report: str = BENCHMARK_PREAMBLE.format(loaders=" | ".join(loaders), separators=" | ".join("---" for _ in loaders))
+        for stl in stls:
+            facets: Optional[np.ndarray] = parse_ascii_stl(stl.read_bytes())
+            if facets is None:
+                logger.warning(f"{stl.as_posix()} is no single solid ASCII STL, skipping it")
+                continue
+            cells: List[str] = []
+            for name, (loader, traced) in loaders.items():
+                duration, peak_mb = measure(loader=loader, stl=stl, repeats=args.repeats, traced=traced)
+                logger.info(f"{stl.name}: {name} took {duration:.3f}s")
+                cells.append(f"{duration:.3f}" + (f" ({peak_mb:.0f} MB)" if peak_mb is not None else ""))
+            report += f"| {stl.name} | {len(facets)} | {stl.stat().st_size / 1024 / 1024:.1f} | {' | '.join(cells)} |\n"
+    report += BENCHMARK_SUMMARY.format(repeats=args.repeats)
+    print(report)
+
+
+if __name__ == "__main__":
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog="VoronDesign ASCII STL loading benchmark",
+        description="This tool compares the ASCII STL loaders of admesh and tweaker3 with the numpy parser and the binary sidecar",
+    )
+    parser.add_argument(
+        "-i",
+        "--input_dir",
+        required=False,
+        action="store",
+        type=str,
+        help="Directory containing an STL corpus, binary STLs are converted to ASCII. Generated STLs are used otherwise.",
+    )
+    parser.add_argument(
+        "--facets",
+        required=False,
+        action="store",
+        type=int,
+        nargs="+",
+        default=[10000, 100000, 1000000],
+        help="Approximate facet counts of the generated STLs",
+    )
+    parser.add_argument(
+        "--seed",
+        required=False,
+        action="store",
+        type=int,
+        default=0,
+        help="Seed of the generated STLs",
+    )
+    parser.add_argument(
+        "-n",
+        "--repeats",
+        required=False,
+        action="store",
+        type=int,
+        default=3,
+        help="Number of measured runs per loader and STL",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        required=False,
+        action="store_true",
+        help="Print debug output to stdout",
+    )
+    args: argparse.Namespace = parser.parse_args()
+    main(args=args)
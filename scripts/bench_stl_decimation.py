@@ -0,0 +1,125 @@
+import argparse
+import itertools
+import logging
+import statistics
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+from tweaker3 import FileHandler
+from tweaker3.MeshTweaker import Tweak
+
+from stl_decimate import decimate_mesh
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+BENCHMARK_PREAMBLE = """## Decimation accuracy of the rotation analysis
+
+| Filename | Facets | Decimated Facets | Full [s] | Decimated [s] | Rotation Suggested (Full / Decimated) | Up Vector Deviation |
+| --- | --- | --- | --- | --- | --- | --- |
+"""
+
+BENCHMARK_SUMMARY = """
+{agreeing}/{total} STLs get the same suggestion with and without decimation ({agreement:.0%}).
+Median up vector deviation {median_deviation:.1f}°, maximum {max_deviation:.1f}°. Tweak took {full_time:.1f}s on the full meshes and {decimated_time:.1f}s (including decimation) on the decimated ones.
+"""
+
+# Rotation angle (in radians) from which check_stl_rotation suggests a rotation
+ROTATION_THRESHOLD = 0.1
+
+
+def run_tweak(mesh: np.ndarray) -> Tuple[float, np.ndarray, float]:
+    start_time: float = time.perf_counter()
+    x: Tweak = Tweak(mesh, extended_mode=True, verbose=False, min_volume=True)
+    return x.rotation_angle, np.asarray(x.matrix, dtype=np.float64), time.perf_counter() - start_time
+
+
+def up_vector(matrix: np.ndarray) -> np.ndarray:
+    # Meshes are rotated as row vectors (mesh @ matrix), this is the original direction which ends up pointing to +Z
+    return matrix[:, 2] / np.linalg.norm(matrix[:, 2])
+
+
+def main(args: argparse.Namespace):
+    if args.verbose:
+        logger.setLevel("INFO")
+
+    input_path: Path = Path(args.input_dir)
+    stls: List[Path] = sorted(itertools.chain(input_path.glob("**/*.stl"), input_path.glob("**/*.STL")))
+    file_handler: FileHandler.FileHandler = FileHandler.FileHandler()
+    report: str = BENCHMARK_PREAMBLE
+    deviations: List[float] = []
+    agreeing: int = 0
+    full_time: float = 0.0
+    decimated_time: float = 0.0
+    for stl in stls:
+        mesh: np.ndarray = np.asarray(file_handler.load_mesh(inputfile=stl.as_posix())[0]["mesh"], dtype=np.float64)
+        facet_count: int = len(mesh) // 3
+        if facet_count <= args.decimate_threshold:
+            continue
+        full_angle, full_matrix, full_duration = run_tweak(mesh)
+        start_time: float = time.perf_counter()
+        decimated: np.ndarray = decimate_mesh(mesh, max_facets=args.decimate_threshold)
+        decimated_angle, decimated_matrix, decimated_duration = run_tweak(decimated)
+        decimated_duration = time.perf_counter() - start_time
+
+        full_rotates: bool = full_angle >= ROTATION_THRESHOLD
+        decimated_rotates: bool = decimated_angle >= ROTATION_THRESHOLD
+        deviation: float = float(np.degrees(np.arccos(np.clip(np.dot(up_vector(full_matrix), up_vector(decimated_matrix)), -1.0, 1.0))))
+        deviations.append(deviation)
+        agreeing += int(full_rotates == decimated_rotates)
+        full_time += full_duration
+        decimated_time += decimated_duration
+        logger.info(f"{stl.as_posix()}: {facet_count} -> {len(decimated) // 3} facets, deviation {deviation:.1f}°")
+        report += (
+            f"| {stl.relative_to(input_path).as_posix()} | {facet_count} | {len(decimated) // 3} | {full_duration:.2f} "
+            f"| {decimated_duration:.2f} | {'yes' if full_rotates else 'no'} / {'yes' if decimated_rotates else 'no'} | {deviation:.1f}° |\n"
+        )
+
+    if len(deviations) == 0:
+        logger.error(f"No STL in {input_path} has more than {args.decimate_threshold} facets")
+        return
+    report += BENCHMARK_SUMMARY.format(
+        agreeing=agreeing,
+        total=len(deviations),
+        agreement=agreeing / len(deviations),
+        median_deviation=statistics.median(deviations),
+        max_deviation=max(deviations),
+        full_time=full_time,
+        decimated_time=decimated_time,
+    )
+    print(report)
+
+
+if __name__ == "__main__":
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog="VoronDesign STL decimation accuracy check",
+        description="This tool compares the orientations suggested by Tweak with and without decimating large STLs",
+    )
+    parser.add_argument(
+        "-i",
+        "--input_dir",
+        required=True,
+        action="store",
+        type=str,
+        help="Directory containing the STL corpus, e.g. a VoronUsers checkout",
+    )
+    parser.add_argument(
+        "-d",
+        "--decimate_threshold",
+        required=False,
+        action="store",
+        type=int,
+        default=100000,
+        help="Facet threshold (and target) of the decimation, only STLs above it are compared",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        required=False,
+        action="store_true",
+        help="Print debug output to stdout",
+    )
+    args: argparse.Namespace = parser.parse_args()
+    main(args=args)
@@ -0,0 +1,89 @@
+import argparse
+import itertools
+import logging
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from check_stl_rotation import render_stl_thumb
+from stl_mesh import load_binary_stl
+from stl_render import render_mesh_to_file
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+BENCHMARK_PREAMBLE = """## STL thumbnail renderer comparison
+
+| Renderer | STLs | Mean [ms] | Median [ms] | Max [ms] | Total [s] |
+| --- | --- | --- | --- | --- | --- |
+"""
+
+
+def main(args: argparse.Namespace):
+    if args.verbose:
+        logger.setLevel("INFO")
+
+    input_path: Path = Path(args.input_dir)
+    stls: List[Path] = sorted(itertools.chain(input_path.glob("**/*.stl"), input_path.glob("**/*.STL")))
+    timings: Dict[str, List[float]] = {"stl-thumb (subprocess)": [], "numpy (load + render)": [], "numpy (render only)": []}
+    with tempfile.TemporaryDirectory() as output_dir:
+        for index, stl in enumerate(stls):
+            facets: Optional[np.ndarray] = load_binary_stl(stl)
+            if facets is None:
+                logger.warning(f"Skipping {stl.as_posix()}, only binary STLs are supported by this benchmark")
+                continue
+
+            if shutil.which("stl-thumb") is not None:
+                start_time: float = time.perf_counter()
+                render_stl_thumb(stl_file_path=stl, image_out_path=Path(output_dir, f"{index}_stl_thumb.png"))
+                timings["stl-thumb (subprocess)"].append(time.perf_counter() - start_time)
+
+            # The rotation checker already has the mesh in memory, so it only pays the render cost
+            start_time = time.perf_counter()
+            vertices: np.ndarray = np.array(load_binary_stl(stl)["vertices"], dtype=np.float64)
+            load_time: float = time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            render_mesh_to_file(mesh=vertices, image_path=Path(output_dir, f"{index}_numpy.png"))
+            render_time: float = time.perf_counter() - start_time
+            timings["numpy (load + render)"].append(load_time + render_time)
+            timings["numpy (render only)"].append(render_time)
+            logger.info(f"{stl.as_posix()}: {len(vertices)} facets rendered in {render_time * 1000:.1f}ms")
+
+    report: str = BENCHMARK_PREAMBLE
+    for renderer, durations in timings.items():
+        if len(durations) == 0:
+            continue
+        report += (
+            f"| {renderer} | {len(durations)} | {statistics.mean(durations) * 1000:.1f} "
+            f"| {statistics.median(durations) * 1000:.1f} | {max(durations) * 1000:.1f} | {sum(durations):.2f} |\n"
+        )
+    print(report)
+
+
+if __name__ == "__main__":
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog="VoronDesign STL thumbnail renderer benchmark",
+        description="This tool compares the stl-thumb subprocess renderer with the in-process numpy renderer",
+    )
+    parser.add_argument(
+        "-i",
+        "--input_dir",
+        required=True,
+        action="store",
+        type=str,
+        help="Directory containing STL files to be rendered",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        required=False,
+        action="store_true",
+        help="Print debug output to stdout",
+    )
+    args: argparse.Namespace = parser.parse_args()
+    main(args=args)
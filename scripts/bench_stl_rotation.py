@@ -0,0 +1,115 @@
+import argparse
+import itertools
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from check_stl_rotation import EXECUTOR_PROCESS, EXECUTOR_THREAD, make_parser, run_rotation_checks
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+BENCHMARK_PREAMBLE = """## STL rotation checker scaling
+
+| Executor | Workers | Chunksize | Wall time [s] | STLs/s | Speedup vs. thread pool |
+| --- | --- | --- | --- | --- | --- |
+"""
+
+
+def time_engine(args: argparse.Namespace, stls: List[Path], executor: str, jobs: int) -> float:
+    with tempfile.TemporaryDirectory() as output_dir:
+        # Parsed by the checker's own parser, so that new options get their defaults without changes here
+        check_args: argparse.Namespace = make_parser().parse_args(
+            [
+                f"--input_dir={args.input_dir}",
+                f"--output_dir={output_dir}",
+                "--url_endpoint=https://example.invalid",
+                "--imagekit_subfolder=benchmark",
+                f"--executor={executor}",
+                f"--jobs={jobs}",
+                f"--chunksize={args.chunksize}",
+                f"--batch_size={len(stls)}",
+                "--skip_prefilter",
+            ]
+        )
+        start: float = time.perf_counter()
+        run_rotation_checks(args=check_args, stls=stls)
+        return time.perf_counter() - start
+
+
+def main(args: argparse.Namespace):
+    if args.verbose:
+        logger.setLevel("INFO")
+
+    input_path: Path = Path(args.input_dir)
+    stls: List[Path] = sorted(itertools.chain(input_path.glob("**/*.stl"), input_path.glob("**/*.STL")))
+    if len(stls) == 0:
+        logger.error(f"No STLs found in {input_path}")
+        return
+
+    worker_counts: List[int] = sorted({1, 2, 4, os.cpu_count() or 1}) if args.jobs is None else args.jobs
+    timings: Dict[Tuple[str, int], float] = {}
+    for jobs in worker_counts:
+        for executor in [EXECUTOR_THREAD, EXECUTOR_PROCESS]:
+            # Keep the best of several rounds to reduce noise from other processes on the runner
+            timings[(executor, jobs)] = min(time_engine(args=args, stls=stls, executor=executor, jobs=jobs) for _ in range(args.rounds))
+            logger.info(f"{executor} pool with {jobs} workers: {timings[(executor, jobs)]:.2f}s")
+
+    report: str = BENCHMARK_PREAMBLE
+    for (executor, jobs), wall_time in timings.items():
+        speedup: float = timings[(EXECUTOR_THREAD, jobs)] / wall_time
+        report += f"| {executor} | {jobs} | {args.chunksize} | {wall_time:.2f} | {len(stls) / wall_time:.2f} | {speedup:.2f}x |\n"
+    print(report)
+
+
+if __name__ == "__main__":
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog="VoronDesign STL rotation checker benchmark",
+        description="This tool compares the scaling of the thread and process execution modes of the rotation checker",
+    )
+    parser.add_argument(
+        "-i",
+        "--input_dir",
+        required=True,
+        action="store",
+        type=str,
+        help="Directory containing STL files to be checked",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        required=False,
+        action="store",
+        type=int,
+        nargs="+",
+        help="Worker counts to benchmark, defaults to 1, 2, 4 and the number of CPUs",
+    )
+    parser.add_argument(
+        "--chunksize",
+        required=False,
+        action="store",
+        type=int,
+        default=1,
+        help="Number of STLs sent to a worker process at once",
+    )
+    parser.add_argument(
+        "-r",
+        "--rounds",
+        required=False,
+        action="store",
+        type=int,
+        default=3,
+        help="Number of rounds per configuration, the fastest round is reported",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        required=False,
+        action="store_true",
+        help="Print debug output to stdout",
+    )
+    args: argparse.Namespace = parser.parse_args()
+    main(args=args)
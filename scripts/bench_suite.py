@@ -0,0 +1,369 @@
+import argparse
+import contextlib
+import importlib.util
+import json
+import logging
+import os
+import platform
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from bench_generate import add_generator_arguments, generate_mod_repository
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+BENCHMARK_PREAMBLE = """## Benchmark results
+
+| Script | Files | Runs | p50 [s] | p90 [s] | Max [s] | Files/s | Peak RSS [MB] | Δ p50 |
+| --- | --- | --- | --- | --- | --- | --- | --- | --- |
+"""
+
+DAEMON_NOTE = """
+Rows marked (daemon) run the script in a warm checker daemon, their peak RSS is the one of the client.
+"""
+
+RESULTS_VERSION = 1
+SCRIPTS_DIR = Path(__file__).parent
+DAEMON_SUFFIX = " (daemon)"
+DAEMON_STARTUP_TIMEOUT = 60.0
+
+
+class Benchmark:
+    def __init__(self, name: str, requires: List[str], file_count: str, command: Callable[[Path, Path], List[str]], cwd_is_repo: bool = False):
+        self.name: str = name
+        # Python modules which have to be importable to run the script
+        self.requires: List[str] = requires
+        # Key of the generator statistics the throughput refers to
+        self.file_count: str = file_count
+        # Builds the command line from the generated repository and a scratch directory
+        self.command: Callable[[Path, Path], List[str]] = command
+        self.cwd_is_repo: bool = cwd_is_repo
+
+
+def script(name: str) -> str:
+    return Path(SCRIPTS_DIR, name).as_posix()
+
+
+BENCHMARKS: List[Benchmark] = [
+    Benchmark(
+        name="check_stl_corruption",
+        requires=["admesh"],
+        file_count="stls",
+        command=lambda repo, scratch: [sys.executable, script("check_stl_corruption.py"), f"--input_dir={repo}"],
+    ),
+    Benchmark(
+        name="check_stl_rotation",
+        requires=["tweaker3"],
+        file_count="stls",
+        command=lambda repo, scratch: [
+            sys.executable,
+            script("check_stl_rotation.py"),
+            f"--input_dir={repo}",
+            f"--output_dir={scratch}",
+            "--url_endpoint=https://example.com",
+            "--imagekit_subfolder=bench",
+            "--renderer=numpy",
+        ],
+    ),
+    Benchmark(
+        name="check_stl_pipeline",
+        requires=["admesh", "tweaker3"],
+        file_count="stls",
+        command=lambda repo, scratch: [
+            sys.executable,
+            script("check_stl_pipeline.py"),
+            f"--input_dir={repo}",
+            f"--output_dir={scratch}",
+            "--url_endpoint=https://example.com",
+            "--imagekit_subfolder=bench",
+        ],
+    ),
+    Benchmark(
+        name="generate_readme",
+        requires=["yaml"],
+        file_count="mods",
+        command=lambda repo, scratch: [sys.executable, script("generate_readme.py"), f"--input_dir={repo}", "--preview=true", "--json=false"],
+    ),
+    Benchmark(
+        name="check_files",
+        requires=["yaml"],
+        file_count="mods",
+        command=lambda repo, scratch: [sys.executable, script("check_files.py")],
+        cwd_is_repo=True,
+    ),
+    Benchmark(
+        name="validate_metadata",
+        requires=["yaml", "jsonschema"],
+        file_count="mods",
+        command=lambda repo, scratch: [sys.executable, script("validate_metadata.py"), f"--input_dir={repo}"],
+    ),
+]
+
+
+def through_daemon(benchmark: Benchmark, socket_path: str) -> Benchmark:
+    # Same command line, sent to the daemon by the client instead of starting the script
+    return Benchmark(
+        name=benchmark.name + DAEMON_SUFFIX,
+        requires=benchmark.requires,
+        file_count=benchmark.file_count,
+        command=lambda repo, scratch: [sys.executable, script("checker_client.py"), f"--socket={socket_path}", "--no_fallback", benchmark.name]
+        + benchmark.command(repo, scratch)[2:],
+        cwd_is_repo=benchmark.cwd_is_repo,
+    )
+
+
+@contextlib.contextmanager
+def checker_daemon(socket_path: str, scripts: List[str]) -> Iterator[None]:
+    start_time: float = time.perf_counter()
+    process: subprocess.Popen = subprocess.Popen(
+        [sys.executable, script("checker_daemon.py"), f"--socket={socket_path}", "--scripts", *scripts], stderr=subprocess.DEVNULL
+    )
+    try:
+        while not Path(socket_path).exists():
+            if process.poll() is not None or time.perf_counter() - start_time > DAEMON_STARTUP_TIMEOUT:
+                raise RuntimeError("The checker daemon did not start")
+            time.sleep(0.01)
+        logger.info(f"Checker daemon started in {time.perf_counter() - start_time:.3f}s")
+        yield
+    finally:
+        process.send_signal(signal.SIGINT)
+        process.wait()
+
+
+def run_once(benchmark: Benchmark, repo_dir: Path) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        env: Dict[str, str] = {
+            **os.environ,
+            "GITHUB_OUTPUT": Path(scratch_dir, "github_output").as_posix(),
+            "GITHUB_STEP_SUMMARY": Path(scratch_dir, "github_step_summary").as_posix(),
+        }
+        start_time: float = time.perf_counter()
+        process: subprocess.Popen = subprocess.Popen(
+            benchmark.command(repo_dir, Path(scratch_dir, "output")),
+            cwd=repo_dir if benchmark.cwd_is_repo else None,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        # wait4 returns the resource usage of this child only, unlike getrusage(RUSAGE_CHILDREN)
+        _, exit_status, rusage = os.wait4(process.pid, 0)
+        duration: float = time.perf_counter() - start_time
+        process.returncode = os.waitstatus_to_exitcode(exit_status)
+    # Non-zero exit codes are expected, the generated repository contains corrupt STLs and missing files on purpose
+    return {"duration": duration, "peak_rss_mb": rusage.ru_maxrss / 1024, "exit_code": process.returncode}
+
+
+def run_benchmark(benchmark: Benchmark, repo_dir: Path, file_count: int, repeats: int, warmup: int) -> Dict[str, Any]:
+    for _ in range(warmup):
+        run_once(benchmark=benchmark, repo_dir=repo_dir)
+    runs: List[Dict[str, float]] = [run_once(benchmark=benchmark, repo_dir=repo_dir) for _ in range(repeats)]
+    durations: np.ndarray = np.array([run["duration"] for run in runs])
+    p50: float = float(np.percentile(durations, 50))
+    return {
+        "files": file_count,
+        "runs": repeats,
+        "p50": p50,
+        "p90": float(np.percentile(durations, 90)),
+        "max": float(durations.max()),
+        "files_per_second": file_count / p50 if p50 > 0 else 0.0,
+        "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+        "exit_codes": sorted(set(int(run["exit_code"]) for run in runs)),
+    }
+
+
+def get_environment() -> Dict[str, Any]:
+    commit: subprocess.CompletedProcess = subprocess.run(
+        ["git", "-C", SCRIPTS_DIR.as_posix(), "rev-parse", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    return {
+        "commit": commit.stdout.decode("utf-8").strip() if commit.returncode == 0 else None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def make_report(results: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> str:
+    report: str = BENCHMARK_PREAMBLE
+    for name, result in results["benchmarks"].items():
+        delta: str = ""
+        if baseline is not None and name in baseline["benchmarks"]:
+            baseline_p50: float = baseline["benchmarks"][name]["p50"]
+            delta = f"{(result['p50'] - baseline_p50) / baseline_p50:+.1%}" if baseline_p50 > 0 else ""
+        report += (
+            f"| {name} | {result['files']} | {result['runs']} | {result['p50']:.3f} | {result['p90']:.3f} | {result['max']:.3f} "
+            f"| {result['files_per_second']:.1f} | {result['peak_rss_mb']:.1f} | {delta} |\n"
+        )
+    for name in results["skipped"]:
+        report += f"| {name} | | | | | | | | skipped, dependencies missing |\n"
+    if any(name.endswith(DAEMON_SUFFIX) for name in results["benchmarks"]):
+        report += DAEMON_NOTE
+    if baseline is not None:
+        report += f"\nBaseline: commit {baseline['environment']['commit']} on {baseline['environment']['platform']}\n"
+    return report
+
+
+def main(args: argparse.Namespace):
+    if args.verbose:
+        logger.setLevel("INFO")
+
+    parameters: Dict[str, int] = {
+        "creators": args.creators,
+        "mods_per_creator": args.mods_per_creator,
+        "stls_per_mod": args.stls_per_mod,
+        "facets": args.facets,
+        "commits": args.commits,
+        "seed": args.seed,
+        "repeats": args.repeats,
+        "warmup": args.warmup,
+    }
+    baseline: Optional[Dict[str, Any]] = None
+    if args.baseline is not None:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        # Results are only comparable if they were measured on identical generated data
+        if baseline.get("version") != RESULTS_VERSION or baseline["parameters"] != parameters:
+            logger.warning(f"Baseline {args.baseline} was measured with different parameters, deltas are not meaningful")
+
+    selected: List[Benchmark] = [benchmark for benchmark in BENCHMARKS if args.scripts is None or benchmark.name in args.scripts]
+    results: Dict[str, Any] = {
+        "version": RESULTS_VERSION,
+        "environment": get_environment(),
+        "parameters": parameters,
+        "benchmarks": {},
+        "skipped": [],
+    }
+    with tempfile.TemporaryDirectory() as work_dir:
+        repo_dir: Path = Path(work_dir, "repository")
+        start_time: float = time.perf_counter()
+        counts: Dict[str, int] = generate_mod_repository(
+            root=repo_dir,
+            creators=args.creators,
+            mods_per_creator=args.mods_per_creator,
+            stls_per_mod=args.stls_per_mod,
+            facet_count=args.facets,
+            commits=args.commits,
+            seed=args.seed,
+        )
+        logger.info(f"Generated benchmark repository in {time.perf_counter() - start_time:.1f}s: {counts}")
+        runnable: List[Benchmark] = []
+        for benchmark in selected:
+            if any(importlib.util.find_spec(module) is None for module in benchmark.requires):
+                logger.warning(f"Skipping {benchmark.name}, one of {benchmark.requires} is not installed")
+                results["skipped"].append(benchmark.name)
+                continue
+            runnable.append(benchmark)
+        # Cold runs start a new interpreter per run, warm runs are sent to a single daemon started up front
+        socket_path: str = Path(work_dir, "checker.sock").as_posix()
+        with checker_daemon(socket_path=socket_path, scripts=[benchmark.name for benchmark in runnable]) if args.daemon else contextlib.nullcontext():
+            for benchmark in runnable:
+                variants: List[Benchmark] = [benchmark, through_daemon(benchmark=benchmark, socket_path=socket_path)] if args.daemon else [benchmark]
+                for variant in variants:
+                    logger.info(f"Running {variant.name}")
+                    results["benchmarks"][variant.name] = run_benchmark(
+                        benchmark=variant, repo_dir=repo_dir, file_count=counts[variant.file_count], repeats=args.repeats, warmup=args.warmup
+                    )
+        if args.keep_repository is not None:
+            shutil.copytree(repo_dir, args.keep_repository, dirs_exist_ok=True)
+
+    if args.results_file is not None:
+        Path(args.results_file).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.results_file, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+    report: str = make_report(results=results, baseline=baseline)
+    print(report)
+    if args.github_step_summary:
+        with open(os.environ["GITHUB_STEP_SUMMARY"], "a", encoding="utf-8") as gh_step_summary:
+            gh_step_summary.write(report)
+
+
+if __name__ == "__main__":
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog="VoronDesign benchmark suite",
+        description="This tool runs the CI scripts on a generated fake VoronUsers repository and reports "
+        "throughput, latency percentiles and peak memory usage",
+    )
+    add_generator_arguments(parser)
+    parser.add_argument(
+        "-s",
+        "--scripts",
+        required=False,
+        action="store",
+        type=str,
+        nargs="+",
+        choices=[benchmark.name for benchmark in BENCHMARKS],
+        help="Only run the given benchmarks",
+    )
+    parser.add_argument(
+        "-n",
+        "--repeats",
+        required=False,
+        action="store",
+        type=int,
+        default=5,
+        help="Number of measured runs per script",
+    )
+    parser.add_argument(
+        "--warmup",
+        required=False,
+        action="store",
+        type=int,
+        default=1,
+        help="Number of unmeasured runs per script, e.g. to warm up the page cache",
+    )
+    parser.add_argument(
+        "-r",
+        "--results_file",
+        required=False,
+        action="store",
+        type=str,
+        help="File to store the results as json into, to be used as baseline of a later run",
+    )
+    parser.add_argument(
+        "-b",
+        "--baseline",
+        required=False,
+        action="store",
+        type=str,
+        help="Results file of an earlier run (e.g. on another commit) to compare against",
+    )
+    parser.add_argument(
+        "-k",
+        "--keep_repository",
+        required=False,
+        action="store",
+        type=str,
+        help="Copy the generated repository to this directory",
+    )
+    parser.add_argument(
+        "-d",
+        "--daemon",
+        required=False,
+        action="store_true",
+        help="Additionally run every script through a warm checker daemon, to compare cold and warm latency",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        required=False,
+        action="store_true",
+        help="Print debug output to stdout",
+    )
+    parser.add_argument(
+        "-g",
+        "--github_step_summary",
+        required=False,
+        action="store_true",
+        help="Whether to output a step summary when running inside a github action",
+    )
+    args: argparse.Namespace = parser.parse_args()
+    main(args=args)
@@ -0,0 +1,124 @@
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import jsonschema
+import yaml
+
+from metadata_index import METADATA_FILE_NAME, load_metadata_content, scan_metadata_files
+from validate_metadata import validate_metadata_files
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+BENCHMARK_PREAMBLE = """## Metadata validation benchmark
+
+| Mode | Files | Invalid | Total [s] | Files/s |
+| --- | --- | --- | --- | --- |
+"""
+
+
+def generate_corpus(root: Path, mod_count: int, invalid_every: int):
+    for index in range(mod_count):
+        mod_dir: Path = Path(root, f"creator_{index % 100}", f"mod_{index}")
+        mod_dir.mkdir(parents=True)
+        metadata: Dict[str, Any] = {
+            "title": f"Mod {index}",
+            "description": f"Synthetic mod number {index}",
+            "printer_compatibility": ["V2.4", "VT"],
+            "mod_version": 1,
+            "cad": [f"CAD/mod_{index}.step"],
+            "images": [f"Images/mod_{index}.png"],
+        }
+        if invalid_every > 0 and index % invalid_every == 0:
+            del metadata["cad"]
+        Path(mod_dir, METADATA_FILE_NAME).write_text(yaml.safe_dump(metadata), encoding="utf-8")
+
+
+def validate_per_file(root: Path, schema_file: str) -> List[Tuple[str, List[str]]]:
+    # What a per-file validator does: load and compile the schema again for every single file
+    results: List[Tuple[str, List[str]]] = []
+    for yml_file in scan_metadata_files(root):
+        with open(schema_file, "r", encoding="utf-8") as f:
+            schema: Dict[str, Any] = json.load(f)
+        try:
+            jsonschema.validate(load_metadata_content(yml_file.read_bytes()), schema)
+            results.append((yml_file.as_posix(), []))
+        except jsonschema.ValidationError as e:
+            results.append((yml_file.as_posix(), [e.message]))
+    return results
+
+
+def main(args: argparse.Namespace):
+    if args.verbose:
+        logger.setLevel("INFO")
+
+    report: str = BENCHMARK_PREAMBLE
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        root: Path = Path(corpus_dir)
+        generate_corpus(root=root, mod_count=args.mod_count, invalid_every=args.invalid_every)
+        logger.info(f"Generated {args.mod_count} synthetic mods in {corpus_dir}")
+
+        modes: Dict[str, Any] = {
+            "per-file schema compile": lambda: validate_per_file(root=root, schema_file=args.schema_file),
+            "batch, serial": lambda: validate_metadata_files(
+                root=root, yml_files=scan_metadata_files(root), schema_file=args.schema_file, jobs=1
+            ),
+            f"batch, {os.cpu_count()} processes": lambda: validate_metadata_files(
+                root=root, yml_files=scan_metadata_files(root), schema_file=args.schema_file
+            ),
+        }
+        for mode, run in modes.items():
+            start_time: float = time.perf_counter()
+            results: List[Tuple[str, List[str]]] = run()
+            duration: float = time.perf_counter() - start_time
+            invalid_count: int = sum(1 for _, errors in results if len(errors) > 0)
+            report += f"| {mode} | {len(results)} | {invalid_count} | {duration:.2f} | {len(results) / duration:.0f} |\n"
+    print(report)
+
+
+if __name__ == "__main__":
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog="VoronDesign metadata validation benchmark",
+        description="This tool measures metadata validation throughput on a synthetic mod repository",
+    )
+    parser.add_argument(
+        "-n",
+        "--mod_count",
+        required=False,
+        action="store",
+        type=int,
+        default=10000,
+        help="Number of synthetic mods to generate",
+    )
+    parser.add_argument(
+        "--invalid_every",
+        required=False,
+        action="store",
+        type=int,
+        default=20,
+        help="Make every n-th synthetic mod invalid (0 to keep all valid)",
+    )
+    parser.add_argument(
+        "-s",
+        "--schema_file",
+        required=False,
+        action="store",
+        type=str,
+        default=Path(__file__).parent.parent.joinpath("support_files", "json_schema.json").as_posix(),
+        help="JSON schema to validate against",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        required=False,
+        action="store_true",
+        help="Print debug output to stdout",
+    )
+    args: argparse.Namespace = parser.parse_args()
+    main(args=args)
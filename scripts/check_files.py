@@ -1,8 +1,10 @@
 from pathlib import Path
 import os
 import sys
-import yaml
-from typing import Any, Dict, Iterable
+from typing import List, Optional, Tuple
+
+from file_index import FileIndex
+from metadata_index import ModMetadata, parse_metadata_files
 
 header = """
 | File type | File | Exists |
@@ -10,28 +12,30 @@ header = """
 """
 
 
+def check_reference(file_index: FileIndex, mod: ModMetadata, file_type: str, reference: str) -> Tuple[bool, str]:
+    if file_index.exists(base_dir=mod.mod_dir, reference=reference):
+        return True, f"| {file_type} | {reference} | ✅ |\n"
+    suggestion: Optional[str] = file_index.suggest(base_dir=mod.mod_dir, reference=reference)
+    if suggestion is not None:
+        return False, f"| {file_type} | {reference} | ❌ Did you mean `{suggestion}`? |\n"
+    return False, f"| {file_type} | {reference} | ❌ |\n"
+
+
 def main():
-    yaml_list: Iterable[Path] = Path(".").glob("**/.metadata.yml")
+    # A single directory walk provides both the metadata files and the existence checks of all referenced files
+    file_index: FileIndex = FileIndex(Path("."))
+    mods: List[ModMetadata] = parse_metadata_files(root=Path("."), yml_files=file_index.metadata_files)
     result_error: bool = False
     step_summary: str = ""
-    for yml in sorted(yaml_list):
-        with open(yml, "r") as f:
-            content: Dict[str, Any] = yaml.safe_load(f)
-            step_summary += f"## Checking {yml.as_posix()}\n"
-            step_summary += header
-            for cad_file in content["cad"]:
-                if Path(yml.parent, cad_file).exists():
-                    step_summary += f"| CAD | {cad_file} | ✅ |\n"
-                else:
-                    step_summary += f"| CAD | {cad_file} | ❌ |\n"
-                    result_error = True
-            for img_file in content.get("images", list()):
-                if Path(yml.parent, img_file).exists():
-                    step_summary += f"| IMG | {img_file} | ✅ |\n"
-                else:
-                    step_summary += f"| IMG | {img_file} | ❌ |\n"
-                    result_error = True
-            step_summary += "\n"
+    for mod in mods:
+        step_summary += f"## Checking {mod.yml_file.as_posix()}\n"
+        step_summary += header
+        for file_type, references in [("CAD", mod.cad), ("IMG", mod.images)]:
+            for reference in references:
+                exists, row = check_reference(file_index=file_index, mod=mod, file_type=file_type, reference=reference)
+                step_summary += row
+                result_error = result_error or not exists
+        step_summary += "\n"
     with open(os.environ["GITHUB_STEP_SUMMARY"], "w") as f:
         f.write(step_summary)
     if result_error:
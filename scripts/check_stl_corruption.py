@@ -1,15 +1,48 @@
-import itertools
+import contextlib
+import functools
+import gzip
 import logging
 import os
+import shutil
+import subprocess
 import sys
+import time
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from importlib import metadata
 from pathlib import Path
-from typing import List
+from typing import TYPE_CHECKING, Any, List, Optional, Tuple
 
-from admesh import Stl
 from enum import IntEnum
 from typing import Dict
 
+from result_cache import CACHE_FILE_SUFFIX, ResultCache, file_content_hash, prune_cache
+from stl_scheduler import collect_stls, in_input_order, make_deferred_summary, order_by_cost, run_batches, save_work_list
+from stl_supervisor import Supervisor, add_supervisor_arguments, is_supervised
+
+from stl_metrics import (
+    add_instrumentation_arguments,
+    extend_preamble,
+    keep_slowest_profiles,
+    make_metric_cells,
+    measure_stl,
+    timed,
+    write_metrics_file,
+)
+
+try:
+    from stl_mesh import prescreen_facets, prescreen_stl
+    from stl_sidecar import SIDECAR_FILE_SUFFIX, get_binary_stl, load_stl
+except ImportError:
+    # numpy is not available, every STL goes through the full admesh repair
+    prescreen_facets = None
+    prescreen_stl = None
+    get_binary_stl = None
+    load_stl = None
+
+if TYPE_CHECKING:
+    from admesh import Stl
+
 
 class ReturnStatus(IntEnum):
     SUCCESS = 0
@@ -40,80 +73,241 @@ STEP_SUMMARY_PREAMBLE = """## STL corruption check summary
 | ----- | --- | --- | --- | --- | --- | --- | --- |
 """
 
+# Used instead of STEP_SUMMARY_PREAMBLE when fixed STLs are written
+STEP_SUMMARY_PREAMBLE_OUTPUT = """## STL corruption check summary
 
-def process_stl(stl_file: Path, args: argparse.Namespace) -> ReturnStatus:
-    logger.info(f"Checking {stl_file}")
+| Filename | Result | Edges Fixed | Backwards Edges | Degenerate Facets | Facets Removed | Facets Added | Facets Reversed | Bytes Written | Write Time |
+| ----- | --- | --- | --- | --- | --- | --- | --- | --- | --- |
+"""
+
+OUTPUT_FORMAT_BINARY = "binary"
+OUTPUT_FORMAT_ASCII = "ascii"
+OUTPUT_COMPRESSION_NONE = "none"
+OUTPUT_COMPRESSION_GZIP = "gzip"
+OUTPUT_COMPRESSION_ZSTD = "zstd"
+output_compression_suffix_map: Dict[str, str] = {
+    OUTPUT_COMPRESSION_NONE: "",
+    OUTPUT_COMPRESSION_GZIP: ".gz",
+    OUTPUT_COMPRESSION_ZSTD: ".zst",
+}
+
+STL_STATS_KEYS: List[str] = [
+    "edges_fixed",
+    "backwards_edges",
+    "degenerate_facets",
+    "facets_removed",
+    "facets_added",
+    "facets_reversed",
+]
+EMPTY_STL_STATS: Dict[str, int] = {key: 0 for key in STL_STATS_KEYS}
+
+METRICS_STAGE = "corruption"
+METRICS_KEYS: List[str] = ["load_time", "repair_time", "total_time", "facets", "worker_peak_rss_mb"]
+
+
+def get_admesh_version() -> str:
+    # Combine the python binding and the libadmesh/cli version, either of them changes the repair results
+    versions: List[str] = []
     try:
-        stl: Stl = Stl(stl_file.as_posix())
-        stl.repair(verbose_flag=False)
-        if (
-            stl.stats["edges_fixed"] > 0
-            or stl.stats["backwards_edges"] > 0
-            or stl.stats["degenerate_facets"] > 0
-            or stl.stats["facets_removed"] > 0
-            or stl.stats["facets_added"] > 0
-            or stl.stats["facets_reversed"] > 0
-        ):
-            logger.error(f"Corrupt STL detected! Please fix {stl_file.as_posix()}!")
-            if args.github_step_summary:
-                with open(os.environ["GITHUB_STEP_SUMMARY"], "a") as gh_step_summary:
-                    cell_contents: str = " | ".join(
-                        [
-                            stl_file.name,
-                            RESULT_FAILURE,
-                            str(stl.stats["edges_fixed"]),
-                            str(stl.stats["backwards_edges"]),
-                            str(stl.stats["degenerate_facets"]),
-                            str(stl.stats["facets_removed"]),
-                            str(stl.stats["facets_added"]),
-                            str(stl.stats["facets_reversed"]),
-                        ]
-                    )
-                    gh_step_summary.write(f"| {cell_contents} |\n")
-            if args.output_dir is not None:
-                out_stl_path: Path = Path(args.output_dir, stl_file.relative_to(args.input_dir))
-                out_stl_path.parent.mkdir(parents=True, exist_ok=True)
-                logger.info(f"Saving fixed STL to: {out_stl_path}")
-                stl.write_ascii(out_stl_path.as_posix())
-            return ReturnStatus.FAILURE
+        versions.append(metadata.version("admesh"))
+    except metadata.PackageNotFoundError:
+        versions.append("unknown")
+    if shutil.which("admesh") is not None:
+        admesh_cli_output: str = subprocess.run(["admesh", "--version"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout.decode("utf-8")
+        versions.append(admesh_cli_output.strip())
+    return "/".join(versions)
+
+
+@functools.lru_cache(maxsize=None)
+def get_result_cache(cache_dir: Optional[str]) -> Optional[ResultCache]:
+    if cache_dir is None:
+        return None
+    return ResultCache(cache_dir=Path(cache_dir), namespace="stl_corruption", tool_version=get_admesh_version())
+
+
+def make_step_summary_preamble(args: argparse.Namespace) -> str:
+    preamble: str = STEP_SUMMARY_PREAMBLE if args.output_dir is None else STEP_SUMMARY_PREAMBLE_OUTPUT
+    return extend_preamble(preamble, METRICS_KEYS) if args.instrument else preamble
+
+
+def make_step_summary_row(
+    stl_file: Path,
+    result: str,
+    stats: Dict[str, int],
+    args: argparse.Namespace,
+    write_stats: Optional[Tuple[int, float]] = None,
+    metrics: Optional[Dict[str, float]] = None,
+) -> str:
+    cells: List[str] = [stl_file.name, result] + [str(stats[key]) for key in STL_STATS_KEYS]
+    if args.output_dir is not None:
+        if write_stats is not None:
+            cells += [f"{write_stats[0]}", f"{write_stats[1] * 1000:.1f} ms"]
+        else:
+            cells += ["", ""]
+    if args.instrument:
+        cells += make_metric_cells(metrics or {}, METRICS_KEYS)
+    cell_contents: str = " | ".join(cells)
+    return f"| {cell_contents} |\n"
+
+
+def write_fixed_stl(stl: "Stl", stl_file: Path, args: argparse.Namespace) -> Tuple[int, float]:
+    out_stl_path: Path = Path(args.output_dir, stl_file.relative_to(args.input_dir))
+    out_stl_path = out_stl_path.with_name(out_stl_path.name + output_compression_suffix_map[args.output_compression])
+    out_stl_path.parent.mkdir(parents=True, exist_ok=True)
+    logger.info(f"Saving fixed STL to: {out_stl_path}")
+    start_time: float = time.perf_counter()
+    # admesh can only write to a path, so compressed outputs are written uncompressed first
+    raw_stl_path: Path = (
+        out_stl_path if args.output_compression == OUTPUT_COMPRESSION_NONE else out_stl_path.with_name(out_stl_path.name + ".tmp")
+    )
+    if args.output_format == OUTPUT_FORMAT_ASCII:
+        stl.write_ascii(raw_stl_path.as_posix())
+    else:
+        stl.write_binary(raw_stl_path.as_posix())
+    if args.output_compression != OUTPUT_COMPRESSION_NONE:
+        compress_file(source=raw_stl_path, destination=out_stl_path, compression=args.output_compression)
+        raw_stl_path.unlink()
+    return out_stl_path.stat().st_size, time.perf_counter() - start_time
+
+
+def compress_file(source: Path, destination: Path, compression: str):
+    with open(source, "rb") as f_in:
+        if compression == OUTPUT_COMPRESSION_GZIP:
+            with gzip.open(destination, "wb", compresslevel=6) as f_out:
+                shutil.copyfileobj(f_in, f_out)
         else:
-            logger.info(f"STL {stl_file.as_posix()} does not contain any errors!")
-            if args.github_step_summary:
-                with open(os.environ["GITHUB_STEP_SUMMARY"], "a") as gh_step_summary:
-                    cell_contents: str = " | ".join(
-                        [
-                            stl_file.name,
-                            RESULT_SUCCESS,
-                            "0",
-                            "0",
-                            "0",
-                            "0",
-                            "0",
-                            "0",
-                        ]
-                    )
-                    gh_step_summary.write(f"| {cell_contents} |\n")
-        return ReturnStatus.SUCCESS
+            import zstandard
+
+            with open(destination, "wb") as f_out:
+                zstandard.ZstdCompressor(level=10).copy_stream(f_in, f_out)
+
+
+def prescreen_passed(stl_file: Path, args: argparse.Namespace, facets: Optional[Any] = None) -> bool:
+    # Clean STLs are detected without admesh, everything else (unparsable STLs, suspicious meshes) is repaired
+    if prescreen_stl is None or args.skip_prescreen:
+        return False
+    prescreen_stats: Optional[Dict[str, int]] = prescreen_stl(stl_file) if facets is None else prescreen_facets(facets)
+    if prescreen_stats is None:
+        return False
+    if any(value > 0 for value in prescreen_stats.values()):
+        logger.info(f"Pre-screen of {stl_file.as_posix()} found potential problems: {prescreen_stats}")
+        return False
+    return True
+
+
+def check_stl(
+    stl_file: Path, args: argparse.Namespace, content_hash: Optional[str], facets: Optional[Any], metrics: Dict[str, float]
+) -> Tuple[ReturnStatus, Dict[str, int], Optional[Tuple[int, float]]]:
+    result_cache: Optional[ResultCache] = get_result_cache(args.cache_dir)
+    with timed(metrics, "load_time"):
+        if content_hash is None:
+            content_hash = file_content_hash(stl_file) if result_cache is not None else ""
+    cached_result: Optional[Dict[str, Any]] = result_cache.get(content_hash) if result_cache is not None else None
+
+    # A cached failure still requires a repair run if the fixed STL should be saved
+    if cached_result is not None and (cached_result["status"] == ReturnStatus.SUCCESS or args.output_dir is None):
+        logger.info(f"Using cached result for {stl_file.as_posix()}")
+        return ReturnStatus(cached_result["status"]), cached_result["stats"], None
+
+    # ASCII STLs are parsed as text only once, the pre-screen and admesh load their binary sidecar
+    binary_stl_file: Path = stl_file
+    if get_binary_stl is not None:
+        with timed(metrics, "load_time"):
+            binary_stl_file = get_binary_stl(stl_file=stl_file, sidecar_dir=args.sidecar_dir, content_hash=content_hash or None, facets=facets)
+    if facets is None and load_stl is not None and not args.skip_prescreen:
+        with timed(metrics, "load_time"):
+            facets = load_stl(binary_stl_file)
+    if facets is not None:
+        metrics["facets"] = len(facets)
+    with timed(metrics, "repair_time"):
+        passed: bool = prescreen_passed(stl_file=stl_file, args=args, facets=facets)
+    if passed:
+        logger.info(f"Pre-screen found no problems in {stl_file.as_posix()}, skipping repair")
+        if result_cache is not None:
+            result_cache.put(content_hash, {"status": int(ReturnStatus.SUCCESS), "stats": EMPTY_STL_STATS})
+        return ReturnStatus.SUCCESS, EMPTY_STL_STATS, None
+
+    # admesh is only imported once an STL actually needs a repair, cached and pre-screened STLs never load it
+    from admesh import Stl
+
+    with timed(metrics, "load_time"):
+        stl: Stl = Stl(binary_stl_file.as_posix())
+    with timed(metrics, "repair_time"):
+        stl.repair(verbose_flag=False)
+    metrics.setdefault("facets", stl.stats["number_of_facets"])
+    stats: Dict[str, int] = {key: stl.stats[key] for key in STL_STATS_KEYS}
+    return_status: ReturnStatus = ReturnStatus.FAILURE if any(value > 0 for value in stats.values()) else ReturnStatus.SUCCESS
+    if result_cache is not None:
+        result_cache.put(content_hash, {"status": int(return_status), "stats": stats})
+    write_stats: Optional[Tuple[int, float]] = None
+    if return_status == ReturnStatus.FAILURE and args.output_dir is not None:
+        write_stats = write_fixed_stl(stl=stl, stl_file=stl_file, args=args)
+    return return_status, stats, write_stats
+
+
+def process_stl(
+    stl_file: Path, args: argparse.Namespace, content_hash: Optional[str] = None, facets: Optional[Any] = None
+) -> Tuple[ReturnStatus, str, Dict[str, float]]:
+    # content_hash and facets can be passed in by callers which already read the STL
+    logger.info(f"Checking {stl_file}")
+    metrics: Dict[str, float] = {}
+    try:
+        with measure_stl(metrics=metrics, stl_file=stl_file, args=args, stage=METRICS_STAGE):
+            return_status, stats, write_stats = check_stl(
+                stl_file=stl_file, args=args, content_hash=content_hash, facets=facets, metrics=metrics
+            )
     except Exception as e:
         logger.error("A fatal error occurred during rotation checking", exc_info=e)
-        if args.github_step_summary:
-            with open(os.environ["GITHUB_STEP_SUMMARY"], "a") as gh_step_summary:
-                cell_contents: str = " | ".join(
-                    [
-                        stl_file.name,
-                        RESULT_EXCEPTION,
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                    ]
-                )
-                gh_step_summary.write(f"| {cell_contents} |\n")
-        return ReturnStatus.EXCEPTION
+        return ReturnStatus.EXCEPTION, make_step_summary_row(
+            stl_file=stl_file, result=RESULT_EXCEPTION, stats=EMPTY_STL_STATS, args=args, metrics=metrics
+        ), metrics
+
+    if return_status == ReturnStatus.FAILURE:
+        logger.error(f"Corrupt STL detected! Please fix {stl_file.as_posix()}!")
+        return return_status, make_step_summary_row(
+            stl_file=stl_file, result=RESULT_FAILURE, stats=stats, args=args, write_stats=write_stats, metrics=metrics
+        ), metrics
+    logger.info(f"STL {stl_file.as_posix()} does not contain any errors!")
+    return return_status, make_step_summary_row(stl_file=stl_file, result=RESULT_SUCCESS, stats=stats, args=args, metrics=metrics), metrics
+
+def make_failure_result(args: argparse.Namespace, reason: str, stl_file: Path) -> Tuple[ReturnStatus, str, Dict[str, float]]:
+    # Result of STLs whose worker process timed out or crashed, reported by the supervisor
+    return ReturnStatus.EXCEPTION, make_step_summary_row(
+        stl_file=stl_file, result=f"{RESULT_EXCEPTION} ({reason})", stats=EMPTY_STL_STATS, args=args
+    ), {}
+
+
+def prune_caches(args: argparse.Namespace):
+    # The size and age limits apply to the result cache and the sidecar directory separately
+    caches: List[Tuple[Optional[str], str]] = [(args.cache_dir, CACHE_FILE_SUFFIX)]
+    if get_binary_stl is not None:
+        caches.append((args.sidecar_dir, SIDECAR_FILE_SUFFIX))
+    for cache_dir, suffix in caches:
+        if cache_dir is None:
+            continue
+        prune_cache(
+            cache_dir=Path(cache_dir),
+            max_size_bytes=int(args.cache_max_size_mb * 1024 * 1024) if args.cache_max_size_mb is not None else None,
+            max_age_days=args.cache_max_age_days,
+            suffix=suffix,
+        )
+
+
+def make_pool(args: argparse.Namespace) -> Any:
+    if is_supervised(args):
+        return Supervisor(
+            on_failure=functools.partial(make_failure_result, args),
+            max_workers=args.jobs,
+            timeout=args.file_timeout,
+            memory_limit_mb=args.memory_limit_mb,
+        )
+    if args.jobs > 1:
+        return ProcessPoolExecutor(max_workers=args.jobs)
+    return contextlib.nullcontext()
+
 
 def main(args: argparse.Namespace):
+    start_time: float = time.monotonic()
     input_path: Path = Path(args.input_dir)
     return_status: ReturnStatus = ReturnStatus.SUCCESS
 
@@ -121,29 +315,62 @@ def main(args: argparse.Namespace):
         logger.setLevel("INFO")
 
     logger.info(f"Processing STL files in {str(input_path)}")
-    stls: List[Path] = list(itertools.chain(input_path.glob("**/*.stl"), input_path.glob("**/*.STL")))
+    work_list: Optional[Path] = Path(args.work_list) if args.work_list is not None else None
+    input_stls: List[Path] = collect_stls(input_path=input_path, work_list=work_list, since=args.since, cache_dir=args.cache_dir)
+    stls: List[Path] = order_by_cost(input_stls)
     if len(stls) == 0:
         return
-    if len(stls) > 40:
-        logger.warning(f"Excessive amount of STLs ({len(stls)}) detected. I am only going to check 40!")
-        stls = stls[:40]
-    
+
+    # Results are always collected in scheduling order, so serial and parallel runs produce identical outputs
+    results: List[Tuple[ReturnStatus, str, Dict[str, float]]]
+    deferred: List[Path]
+    with make_pool(args) as pool:
+        def process_batch(batch: List[Path]) -> List[Tuple[ReturnStatus, str, Dict[str, float]]]:
+            if pool is None:
+                return [process_stl(stl_file=stl, args=args) for stl in batch]
+            return list(pool.map(functools.partial(process_stl, args=args), batch))
+
+        results, deferred = run_batches(
+            stls=stls, process_batch=process_batch, batch_size=args.batch_size, time_budget=args.time_budget, start_time=start_time
+        )
+    if work_list is not None:
+        save_work_list(work_list=work_list, input_path=input_path, deferred=deferred)
+
+    summaries: List[str] = []
+    metrics_entries: List[Tuple[Path, Dict[str, float]]] = []
+    # The summary lists the STLs in their usual order, not in the order they were checked in
+    stls, results = in_input_order(input_stls=input_stls, stls=stls, results=results)
+    for stl, (stl_result, summary, metrics) in zip(stls, results):
+        summaries.append(summary)
+        metrics_entries.append((stl, metrics))
+        return_status = max(return_status, stl_result)
+    # Deferred STLs are not a failure, they are listed in the summary and counted in the deferred-count output,
+    # so that a follow-up run can check them from the work list
+
     if args.github_step_summary:
         with open(os.environ["GITHUB_STEP_SUMMARY"], "w") as gh_step_summary:
-            gh_step_summary.write(STEP_SUMMARY_PREAMBLE)
+            gh_step_summary.write(make_step_summary_preamble(args))
+            for summary in summaries:
+                gh_step_summary.write(summary)
+            gh_step_summary.write(make_deferred_summary(input_path=input_path, deferred=deferred))
+
+    if args.metrics_file is not None:
+        write_metrics_file(metrics_file=Path(args.metrics_file), input_path=input_path, stage=METRICS_STAGE, entries=metrics_entries)
+    keep_slowest_profiles(args=args, stage=METRICS_STAGE, entries=metrics_entries)
 
-    for stl in stls:
-        return_status = max(process_stl(stl_file=stl, args=args), return_status)
+    if args.cache_max_size_mb is not None or args.cache_max_age_days is not None:
+        prune_caches(args)
 
     with open(os.environ["GITHUB_OUTPUT"], 'a') as f:
         f.write(f"extended-outcome={return_status_string_map[return_status]}\n")
+        f.write(f"deferred-count={len(deferred)}\n")
 
     if return_status > ReturnStatus.SUCCESS and args.fail_on_error:
         logger.error("Error detected during STL checking!")
         sys.exit(255)
 
 
-if __name__ == "__main__":
+def make_parser() -> argparse.ArgumentParser:
     parser: argparse.ArgumentParser = argparse.ArgumentParser(
         prog="VoronDesign STL checker & fixer",
         description="This tool can be used to check a provided folder of STLs and potentially fix them",
@@ -164,6 +391,24 @@ if __name__ == "__main__":
         type=str,
         help="Directory to store the fixed STL files into",
     )
+    parser.add_argument(
+        "--output_format",
+        required=False,
+        action="store",
+        type=str,
+        choices=[OUTPUT_FORMAT_BINARY, OUTPUT_FORMAT_ASCII],
+        default=OUTPUT_FORMAT_BINARY,
+        help="File format of the fixed STL files",
+    )
+    parser.add_argument(
+        "--output_compression",
+        required=False,
+        action="store",
+        type=str,
+        choices=[OUTPUT_COMPRESSION_NONE, OUTPUT_COMPRESSION_GZIP, OUTPUT_COMPRESSION_ZSTD],
+        default=OUTPUT_COMPRESSION_NONE,
+        help="Compress the fixed STL files, zstd requires the zstandard package",
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -185,5 +430,88 @@ if __name__ == "__main__":
         action="store_true",
         help="Whether to output a step summary when running inside a github action",
     )
-    args: argparse.Namespace = parser.parse_args()
+    parser.add_argument(
+        "-c",
+        "--cache_dir",
+        required=False,
+        action="store",
+        type=str,
+        help="Directory to cache check results in, keyed by STL content hash and admesh version",
+    )
+    parser.add_argument(
+        "--cache_max_size_mb",
+        required=False,
+        action="store",
+        type=float,
+        help="Evict least recently used cache entries until the cache (and the sidecar directory) is smaller than this size",
+    )
+    parser.add_argument(
+        "--cache_max_age_days",
+        required=False,
+        action="store",
+        type=float,
+        help="Evict cache entries which have not been used for this many days",
+    )
+    parser.add_argument(
+        "--sidecar_dir",
+        required=False,
+        action="store",
+        type=str,
+        help="Directory to store binary copies of ASCII STLs in, keyed by content hash, which are loaded instead of the text",
+    )
+    parser.add_argument(
+        "--skip_prescreen",
+        required=False,
+        action="store_true",
+        help="Always run the full admesh repair instead of pre-screening STLs with numpy first",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        required=False,
+        action="store",
+        type=int,
+        default=1,
+        help="Number of worker processes used to check STLs in parallel",
+    )
+    parser.add_argument(
+        "-t",
+        "--time_budget",
+        required=False,
+        action="store",
+        type=float,
+        help="Wall-clock budget in seconds, STLs which do not fit into it are deferred",
+    )
+    parser.add_argument(
+        "-b",
+        "--batch_size",
+        required=False,
+        action="store",
+        type=int,
+        default=8,
+        help="Number of STLs scheduled at once, the time budget is checked between batches",
+    )
+    parser.add_argument(
+        "-w",
+        "--work_list",
+        required=False,
+        action="store",
+        type=str,
+        help="File to persist deferred STLs into, an existing work list is resumed instead of checking the whole folder",
+    )
+    parser.add_argument(
+        "-s",
+        "--since",
+        required=False,
+        action="store",
+        type=str,
+        help="Only check STLs changed since the merge base with this git ref, renamed STLs reuse their results from --cache_dir",
+    )
+    add_instrumentation_arguments(parser)
+    add_supervisor_arguments(parser)
+    return parser
+
+
+if __name__ == "__main__":
+    args: argparse.Namespace = make_parser().parse_args()
     main(args)
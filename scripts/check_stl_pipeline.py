@@ -0,0 +1,384 @@
+import argparse
+import hashlib
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+import check_stl_corruption
+import check_stl_rotation
+from check_stl_corruption import ReturnStatus, return_status_string_map
+from stl_mesh import parse_stl
+from stl_metrics import add_instrumentation_arguments, extend_preamble, keep_slowest_profiles, timed, write_metrics_file
+from stl_scheduler import collect_stls, in_input_order, make_deferred_summary, order_by_cost, run_batches, save_work_list
+from stl_supervisor import Supervisor, add_supervisor_arguments, is_supervised
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+METRICS_STAGE = "pipeline"
+
+PipelineResult = Tuple[Tuple[ReturnStatus, str, Dict[str, float]], Tuple[ReturnStatus, str, Dict[str, float]], Dict[str, float]]
+
+
+def make_corruption_args(args: argparse.Namespace) -> argparse.Namespace:
+    # Both checkers call their output directory "output_dir", the corruption checker writes fixed STLs into it
+    return argparse.Namespace(**{**vars(args), "output_dir": args.fixed_output_dir})
+
+
+def init_worker_process(verbose: bool):
+    check_stl_rotation.init_worker_process(verbose=verbose)
+    if verbose:
+        logger.setLevel("INFO")
+        check_stl_corruption.logger.setLevel("INFO")
+
+
+def process_stl(args: argparse.Namespace, corruption_args: argparse.Namespace, stl_file: Path) -> PipelineResult:
+    # The STL is read and parsed exactly once, all stages work on the same in-memory facets.
+    # Only ASCII STLs above the streaming threshold are left to the stages, which convert them to a binary sidecar.
+    pipeline_metrics: Dict[str, float] = {}
+    with timed(pipeline_metrics, "load_time"):
+        raw_content: bytes = stl_file.read_bytes()
+        content_hash: str = hashlib.sha256(raw_content).hexdigest()
+        facets: Optional[np.ndarray] = parse_stl(raw_content)
+        mesh: Optional[np.ndarray] = facets["vertices"].reshape(-1, 3).astype(np.float64) if facets is not None else None
+    if facets is None:
+        logger.info(f"{stl_file.as_posix()} is no binary or small ASCII STL, every stage loads it separately")
+
+    corruption_result: Tuple[ReturnStatus, str, Dict[str, float]] = check_stl_corruption.process_stl(
+        stl_file=stl_file, args=corruption_args, content_hash=content_hash, facets=facets
+    )
+    # Rendering the thumbnails is part of the rotation stage
+    rotation_result: Tuple[ReturnStatus, str, Dict[str, float]] = check_stl_rotation.check_stl_rotation(
+        input_args=args, stl_file_path=stl_file, mesh=mesh, content_hash=content_hash
+    )
+    return corruption_result, rotation_result, pipeline_metrics
+
+
+def make_failure_result(reason: str, args: argparse.Namespace, corruption_args: argparse.Namespace, stl_file: Path) -> PipelineResult:
+    # Result of STLs whose worker process timed out or crashed, reported by the supervisor
+    return (
+        check_stl_corruption.make_failure_result(corruption_args, reason, stl_file),
+        check_stl_rotation.make_failure_result(args, reason, stl_file),
+        {},
+    )
+
+
+def main(args: argparse.Namespace):
+    start_time: float = time.monotonic()
+    input_path: Path = Path(args.input_dir)
+
+    if args.verbose:
+        logger.setLevel("INFO")
+        check_stl_corruption.logger.setLevel("INFO")
+        check_stl_rotation.logger.setLevel("INFO")
+
+    logger.info(f"Processing STL files in {str(input_path)}")
+    work_list: Optional[Path] = Path(args.work_list) if args.work_list is not None else None
+    input_stls: List[Path] = collect_stls(input_path=input_path, work_list=work_list, since=args.since, cache_dir=args.cache_dir)
+    stls: List[Path] = order_by_cost(input_stls)
+    if len(stls) == 0:
+        return
+
+    corruption_args: argparse.Namespace = make_corruption_args(args)
+    results: List[PipelineResult]
+    deferred: List[Path]
+    pool: Union[ProcessPoolExecutor, Supervisor]
+    if is_supervised(args):
+        pool = Supervisor(
+            on_failure=make_failure_result,
+            max_workers=args.jobs,
+            timeout=args.file_timeout,
+            memory_limit_mb=args.memory_limit_mb,
+            initializer=init_worker_process,
+            initargs=(args.verbose,),
+        )
+    else:
+        pool = ProcessPoolExecutor(max_workers=args.jobs, initializer=init_worker_process, initargs=(args.verbose,))
+    with pool:
+        def process_batch(batch: List[Path]) -> List[PipelineResult]:
+            return list(pool.map(process_stl, [args] * len(batch), [corruption_args] * len(batch), batch))
+
+        results, deferred = run_batches(
+            stls=stls, process_batch=process_batch, batch_size=args.batch_size, time_budget=args.time_budget, start_time=start_time
+        )
+    if work_list is not None:
+        save_work_list(work_list=work_list, input_path=input_path, deferred=deferred)
+    stls, results = in_input_order(input_stls=input_stls, stls=stls, results=results)
+
+    corruption_status: ReturnStatus = ReturnStatus.SUCCESS
+    rotation_status: ReturnStatus = ReturnStatus.SUCCESS
+    for (corruption_result, _, _), (rotation_result, _, _), _ in results:
+        corruption_status = max(corruption_status, ReturnStatus(corruption_result))
+        rotation_status = max(rotation_status, ReturnStatus(rotation_result))
+    # Deferred STLs are reported in both summaries, but do not fail either check
+
+    # Write both step summaries, in the same format as the individual checkers
+    if args.github_step_summary:
+        with open(os.environ["GITHUB_STEP_SUMMARY"], "w") as gh_step_summary:
+            gh_step_summary.write(check_stl_corruption.make_step_summary_preamble(corruption_args))
+            for (_, summary, _), _, _ in results:
+                gh_step_summary.write(summary)
+            gh_step_summary.write("\n")
+            gh_step_summary.write(
+                extend_preamble(check_stl_rotation.STEP_SUMMARY_PREAMBLE, check_stl_rotation.METRICS_KEYS)
+                if args.instrument
+                else check_stl_rotation.STEP_SUMMARY_PREAMBLE
+            )
+            for _, (_, summary, _), _ in results:
+                gh_step_summary.write(summary)
+            gh_step_summary.write(check_stl_rotation.make_prefilter_summary(stl_stats=[stats for _, (_, _, stats), _ in results]))
+            gh_step_summary.write(make_deferred_summary(input_path=input_path, deferred=deferred))
+
+    checked: List[Tuple[Path, PipelineResult]] = list(zip(stls, results))
+    if args.metrics_file is not None:
+        write_metrics_file(
+            metrics_file=Path(args.metrics_file),
+            input_path=input_path,
+            stage=METRICS_STAGE,
+            entries=[
+                (stl, {"pipeline": pipeline_metrics, "corruption": corruption_metrics, "rotation": rotation_metrics})
+                for stl, ((_, _, corruption_metrics), (_, _, rotation_metrics), pipeline_metrics) in checked
+            ],
+        )
+    keep_slowest_profiles(args=args, stage=check_stl_corruption.METRICS_STAGE, entries=[(stl, result[0][2]) for stl, result in checked])
+    keep_slowest_profiles(args=args, stage=check_stl_rotation.METRICS_STAGE, entries=[(stl, result[1][2]) for stl, result in checked])
+
+    if args.cache_max_size_mb is not None or args.cache_max_age_days is not None:
+        check_stl_corruption.prune_caches(args)
+
+    # Write the extended-outcome of each stage, plus the combined one
+    with open(os.environ["GITHUB_OUTPUT"], "a") as f:
+        f.write(f"corruption-extended-outcome={return_status_string_map[corruption_status]}\n")
+        f.write(f"rotation-extended-outcome={return_status_string_map[rotation_status]}\n")
+        f.write(f"extended-outcome={return_status_string_map[max(corruption_status, rotation_status)]}\n")
+        f.write(f"deferred-count={len(deferred)}\n")
+
+    # Like in the individual checkers, only corrupt STLs fail the run, wrong rotations are a warning
+    if corruption_status > ReturnStatus.SUCCESS and args.fail_on_error:
+        logger.error("Error detected during STL checking!")
+        sys.exit(255)
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog="VoronDesign STL check pipeline",
+        description="This tool reads every STL in a folder once and runs the corruption check, the rotation check "
+        "and the thumbnail rendering on the in-memory mesh",
+    )
+    parser.add_argument(
+        "-i",
+        "--input_dir",
+        required=True,
+        action="store",
+        type=str,
+        help="Directory containing STL files to be checked",
+    )
+    parser.add_argument(
+        "-o",
+        "--output_dir",
+        required=True,
+        action="store",
+        type=str,
+        help="Directory to store the rotated STL files and thumbnails into",
+    )
+    parser.add_argument(
+        "--fixed_output_dir",
+        required=False,
+        action="store",
+        type=str,
+        help="Directory to store the fixed STL files into",
+    )
+    parser.add_argument(
+        "--output_format",
+        required=False,
+        action="store",
+        type=str,
+        choices=[check_stl_corruption.OUTPUT_FORMAT_BINARY, check_stl_corruption.OUTPUT_FORMAT_ASCII],
+        default=check_stl_corruption.OUTPUT_FORMAT_BINARY,
+        help="File format of the fixed STL files",
+    )
+    parser.add_argument(
+        "--output_compression",
+        required=False,
+        action="store",
+        type=str,
+        choices=[
+            check_stl_corruption.OUTPUT_COMPRESSION_NONE,
+            check_stl_corruption.OUTPUT_COMPRESSION_GZIP,
+            check_stl_corruption.OUTPUT_COMPRESSION_ZSTD,
+        ],
+        default=check_stl_corruption.OUTPUT_COMPRESSION_NONE,
+        help="Compress the fixed STL files, zstd requires the zstandard package",
+    )
+    parser.add_argument(
+        "-u",
+        "--url_endpoint",
+        required=True,
+        action="store",
+        type=str,
+        help="Imagekit endpoint",
+    )
+    parser.add_argument(
+        "-c",
+        "--imagekit_subfolder",
+        required=True,
+        action="store",
+        type=str,
+        help="Image subfolder within the imagekit storage",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        required=False,
+        action="store_true",
+        help="Print debug output to stdout",
+    )
+    parser.add_argument(
+        "-f",
+        "--fail_on_error",
+        required=False,
+        action="store_true",
+        help="Whether to return an error exit code if one of the STLs is faulty",
+    )
+    parser.add_argument(
+        "-g",
+        "--github_step_summary",
+        required=False,
+        action="store_true",
+        help="Whether to output a step summary when running inside a github action",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        required=False,
+        action="store",
+        type=str,
+        help="Directory to cache check results in, keyed by STL content hash, tool versions and analysis parameters",
+    )
+    parser.add_argument(
+        "--cache_max_size_mb",
+        required=False,
+        action="store",
+        type=float,
+        help="Evict least recently used cache entries until the cache (and the sidecar directory) is smaller than this size",
+    )
+    parser.add_argument(
+        "--cache_max_age_days",
+        required=False,
+        action="store",
+        type=float,
+        help="Evict cache entries which have not been used for this many days",
+    )
+    parser.add_argument(
+        "--sidecar_dir",
+        required=False,
+        action="store",
+        type=str,
+        help="Directory to store binary copies of ASCII STLs in, keyed by content hash, which are loaded instead of the text",
+    )
+    parser.add_argument(
+        "--skip_prescreen",
+        required=False,
+        action="store_true",
+        help="Always run the full admesh repair instead of pre-screening STLs with numpy first",
+    )
+    parser.add_argument(
+        "-r",
+        "--renderer",
+        required=False,
+        action="store",
+        type=str,
+        choices=[check_stl_rotation.RENDERER_STL_THUMB, check_stl_rotation.RENDERER_NUMPY],
+        default=check_stl_rotation.RENDERER_NUMPY,
+        help="Thumbnail renderer, stl-thumb parses every STL again in a subprocess",
+    )
+    parser.add_argument(
+        "--render_cache_dir",
+        required=False,
+        action="store",
+        type=str,
+        help="Directory to cache rendered thumbnails in, keyed by mesh content and render parameters",
+    )
+    parser.add_argument(
+        "--skip_prefilter",
+        required=False,
+        action="store_true",
+        help="Run Tweak on every STL, even if it obviously lies on its largest flat face already",
+    )
+    parser.add_argument(
+        "--prefilter_min_contact",
+        required=False,
+        action="store",
+        type=float,
+        default=0.95,
+        help="Minimum print bed contact area, relative to the largest flat face, to skip Tweak",
+    )
+    parser.add_argument(
+        "--prefilter_max_overhang",
+        required=False,
+        action="store",
+        type=float,
+        default=0.05,
+        help="Maximum overhanging area, relative to the total surface area, to skip Tweak",
+    )
+    parser.add_argument(
+        "--decimate_threshold",
+        required=False,
+        action="store",
+        type=int,
+        help="Meshes with more facets are reduced to about this many facets by vertex clustering before Tweak",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        required=False,
+        action="store",
+        type=int,
+        help="Number of worker processes, defaults to the number of CPUs",
+    )
+    parser.add_argument(
+        "-t",
+        "--time_budget",
+        required=False,
+        action="store",
+        type=float,
+        help="Wall-clock budget in seconds, STLs which do not fit into it are deferred",
+    )
+    parser.add_argument(
+        "-b",
+        "--batch_size",
+        required=False,
+        action="store",
+        type=int,
+        default=8,
+        help="Number of STLs scheduled at once, the time budget is checked between batches",
+    )
+    parser.add_argument(
+        "-w",
+        "--work_list",
+        required=False,
+        action="store",
+        type=str,
+        help="File to persist deferred STLs into, an existing work list is resumed instead of checking the whole folder",
+    )
+    parser.add_argument(
+        "-s",
+        "--since",
+        required=False,
+        action="store",
+        type=str,
+        help="Only check STLs changed since the merge base with this git ref, renamed STLs reuse their results from --cache_dir",
+    )
+    add_instrumentation_arguments(parser)
+    add_supervisor_arguments(parser)
+    return parser
+
+
+if __name__ == "__main__":
+    args: argparse.Namespace = make_parser().parse_args()
+    main(args=args)
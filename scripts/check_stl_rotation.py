@@ -1,18 +1,37 @@
 import functools
-import itertools
+import hashlib
 import logging
 import os
 import re
-import random
-import string
+import shutil
 import subprocess
 import sys
+import time
 import argparse
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from importlib import metadata
 from pathlib import Path
-from typing import Dict, Any, List, Tuple
-from tweaker3 import FileHandler
-from tweaker3.MeshTweaker import Tweak
+from typing import Dict, Any, List, Optional, Tuple, Union
+import numpy as np
+
+from orientation_prefilter import is_obviously_well_oriented
+from result_cache import ResultCache, file_content_hash
+from stl_decimate import decimate_mesh
+from stl_fingerprint import GeometryIndex
+from stl_mesh import load_binary_stl
+from stl_metrics import (
+    add_instrumentation_arguments,
+    extend_preamble,
+    keep_slowest_profiles,
+    make_metric_cells,
+    measure_stl,
+    timed,
+    write_metrics_file,
+)
+from stl_render import render_mesh_to_file
+from stl_scheduler import collect_stls, in_input_order, make_deferred_summary, order_by_cost, run_batches, save_work_list
+from stl_sidecar import get_binary_stl
+from stl_supervisor import Supervisor, add_supervisor_arguments, is_supervised
 
 from enum import IntEnum
 from typing import Dict
@@ -46,24 +65,67 @@ STEP_SUMMARY_PREAMBLE = """## STL rotation check summary
 | ----- | --- | --- | --- |
 """
 
-file_handler = FileHandler.FileHandler()
+# Shared by all threads in thread mode, replaced by a private instance in each worker process in process mode.
+# Created on first use, so that tweaker3 is only imported once an STL is actually loaded or analyzed.
+file_handler: Optional[Any] = None
 
+PREFILTER_SUMMARY = """
+Orientation pre-filter skipped Tweak for {hits}/{total} STLs ({hit_rate:.0%}), saving an estimated {saved_time:.1f}s.
+"""
 
-def get_random_string(length):
-    # choose from all lower/uppercase letters
-    letters = string.ascii_lowercase + string.ascii_uppercase
-    result_str = ''.join(random.choice(letters) for i in range(length))
-    return result_str
+THUMBNAIL_SIZE = 300
+THUMBNAIL_HASH_LENGTH = 16
 
+RENDERER_STL_THUMB = "stl-thumb"
+RENDERER_NUMPY = "numpy"
 
-def make_image_url(stl_file_path: Path, input_args: argparse.Namespace) -> str:
-    # Generate the filename:
-    #  Replace stl with png
-    #  Append 8 digit random string to avoid collisions. This is necessary so that old CI runs still show their respective images"
-    image_file_name = stl_file_path.with_stem(stl_file_path.stem + "_" + get_random_string(8)).with_suffix(".png").name
-    image_out_folder = Path(input_args.output_dir, "img", input_args.imagekit_subfolder)
-    image_out_path = Path(image_out_folder, image_file_name)
-    image_out_path.parent.mkdir(parents=True, exist_ok=True)
+EXECUTOR_THREAD = "thread"
+EXECUTOR_PROCESS = "process"
+
+METRICS_STAGE = "rotation"
+METRICS_KEYS: List[str] = ["load_time", "tweak_time", "render_time", "total_time", "facets", "worker_peak_rss_mb"]
+
+
+def get_tweaker_version() -> str:
+    try:
+        return metadata.version("tweaker3")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+@functools.lru_cache(maxsize=None)
+def get_result_cache(cache_dir: Optional[str], parameters: str) -> Optional[ResultCache]:
+    if cache_dir is None:
+        return None
+    return ResultCache(cache_dir=Path(cache_dir), namespace=f"stl_rotation:{parameters}", tool_version=get_tweaker_version())
+
+
+def get_analysis_parameters(input_args: argparse.Namespace) -> str:
+    # Every parameter which changes the result or the thumbnails is part of the cache key
+    return ":".join(
+        str(parameter)
+        for parameter in [
+            input_args.renderer,
+            THUMBNAIL_SIZE,
+            input_args.skip_prefilter,
+            input_args.prefilter_min_contact,
+            input_args.prefilter_max_overhang,
+            input_args.decimate_threshold,
+        ]
+    )
+
+
+def get_thumbnail_hash(stl_file_path: Path, input_args: argparse.Namespace, mesh: Optional[np.ndarray] = None) -> str:
+    # Identical meshes rendered with identical parameters always produce the same thumbnail name
+    digest = hashlib.sha256(f"{input_args.renderer}:{THUMBNAIL_SIZE}:".encode("utf-8"))
+    if mesh is not None:
+        digest.update(np.ascontiguousarray(mesh, dtype=np.float64).tobytes())
+    else:
+        digest.update(file_content_hash(stl_file_path).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def render_stl_thumb(stl_file_path: Path, image_out_path: Path):
     cmd = [
         "stl-thumb",
         stl_file_path.as_posix(),
@@ -71,59 +133,297 @@ def make_image_url(stl_file_path: Path, input_args: argparse.Namespace) -> str:
         "-a",
         "fxaa",
         "-s",
-        "300",
+        str(THUMBNAIL_SIZE),
     ]
 
     subprocess.check_output(cmd, stderr=subprocess.DEVNULL)
+
+
+def make_image_url(
+    stl_file_path: Path, input_args: argparse.Namespace, mesh: Optional[np.ndarray] = None, render_file_path: Optional[Path] = None
+) -> str:
+    # Generate the filename:
+    #  Replace stl with png
+    #  Append a hash of the mesh and render parameters. This avoids collisions and keeps the images of old CI runs
+    #  valid, while identical meshes map to the same image which therefore only needs to be rendered and uploaded once
+    thumbnail_hash: str = get_thumbnail_hash(stl_file_path=stl_file_path, input_args=input_args, mesh=mesh)
+    image_file_name = stl_file_path.with_stem(stl_file_path.stem + "_" + thumbnail_hash[:THUMBNAIL_HASH_LENGTH]).with_suffix(".png").name
+    image_out_folder = Path(input_args.output_dir, "img", input_args.imagekit_subfolder)
+    image_out_path = Path(image_out_folder, image_file_name)
+    image_out_path.parent.mkdir(parents=True, exist_ok=True)
+    cached_image_path: Optional[Path] = (
+        Path(input_args.render_cache_dir, thumbnail_hash[:2], f"{thumbnail_hash}.png") if input_args.render_cache_dir is not None else None
+    )
+    if image_out_path.exists():
+        logger.info(f"Thumbnail {image_out_path.as_posix()} already exists")
+    elif cached_image_path is not None and cached_image_path.exists():
+        logger.info(f"Using cached thumbnail for {stl_file_path.as_posix()}")
+        shutil.copyfile(cached_image_path, image_out_path)
+    else:
+        # The numpy renderer reuses the already loaded mesh instead of parsing the STL again in a subprocess
+        if input_args.renderer == RENDERER_NUMPY and mesh is not None:
+            render_mesh_to_file(mesh=mesh, image_path=image_out_path, size=THUMBNAIL_SIZE)
+        else:
+            render_stl_thumb(stl_file_path=render_file_path or stl_file_path, image_out_path=image_out_path)
+        if cached_image_path is not None:
+            cached_image_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(image_out_path, cached_image_path)
     # Imagekit replaces "[", "]", "(", ")" with underscores
     return re.sub("\]|\[|\)|\(", "_", f"{input_args.url_endpoint}/{input_args.imagekit_subfolder}/{image_file_name}")
 
 
-def check_stl_rotation(input_args: argparse.Namespace, stl_file_path: Path) -> Tuple[ReturnStatus, str]:
+def get_file_handler() -> Any:
+    global file_handler
+    if file_handler is None:
+        from tweaker3 import FileHandler
+
+        file_handler = FileHandler.FileHandler()
+    return file_handler
+
+
+def analyze_rotation(
+    input_args: argparse.Namespace, stl_file_path: Path, mesh: Optional[np.ndarray], content_hash: Optional[str], stl_stats: Dict[str, float]
+) -> Optional[Tuple[ReturnStatus, str, str]]:
+    # Returns the status and the original and rotated image urls, None if the STL is skipped
+    binary_stl_path: Path = stl_file_path
+    if mesh is None:
+        # ASCII STLs are parsed as text only once, later stages and runs load their binary sidecar
+        with timed(stl_stats, "load_time"):
+            binary_stl_path = get_binary_stl(stl_file=stl_file_path, sidecar_dir=input_args.sidecar_dir, content_hash=content_hash)
+            if binary_stl_path != stl_file_path:
+                mesh = load_binary_stl(binary_stl_path)["vertices"].reshape(-1, 3).astype(np.float64)
+    objs: Dict[int, Any]
+    if mesh is not None:
+        objs = {0: {"mesh": mesh, "name": stl_file_path.name}}
+    else:
+        with timed(stl_stats, "load_time"):
+            objs = get_file_handler().load_mesh(inputfile=stl_file_path.as_posix())
+    stl_stats["facets"] = len(objs[0]["mesh"]) // 3
+    with timed(stl_stats, "render_time"):
+        original_image_url: str = make_image_url(
+            stl_file_path=stl_file_path, input_args=input_args, mesh=objs[0]["mesh"], render_file_path=binary_stl_path
+        )
+    if len(objs.items()) > 1:
+        logger.warning(f"{stl_file_path.as_posix()} contains multiple objects and is therefore skipped.!")
+        return None
+
+    rotation_angle: float = 0.0
+    if not input_args.skip_prefilter:
+        start_time: float = time.perf_counter()
+        well_oriented, prefilter_metrics = is_obviously_well_oriented(
+            objs[0]["mesh"],
+            min_contact_ratio=input_args.prefilter_min_contact,
+            max_overhang_ratio=input_args.prefilter_max_overhang,
+        )
+        stl_stats["prefilter_time"] = time.perf_counter() - start_time
+        stl_stats["prefilter_hit"] = float(well_oriented)
+        logger.info(f"Orientation pre-filter metrics of {stl_file_path.as_posix()}: {prefilter_metrics}")
+    if stl_stats.get("prefilter_hit", 0.0) == 0.0:
+        # Tweak only needs the rough shape, the rotated STL is still written at full resolution
+        analysis_mesh: np.ndarray = objs[0]["mesh"]
+        if input_args.decimate_threshold is not None and stl_stats["facets"] > input_args.decimate_threshold:
+            with timed(stl_stats, "decimate_time"):
+                analysis_mesh = decimate_mesh(analysis_mesh, max_facets=input_args.decimate_threshold)
+            stl_stats["analysis_facets"] = len(analysis_mesh) // 3
+        from tweaker3.MeshTweaker import Tweak
+
+        with timed(stl_stats, "tweak_time"):
+            x: Tweak = Tweak(analysis_mesh, extended_mode=True, verbose=False, min_volume=True)
+        rotation_angle = x.rotation_angle
+
+    if rotation_angle < 0.1:
+        logger.info(f"STL {stl_file_path.as_posix()} does not contain any errors!")
+        return ReturnStatus.SUCCESS, original_image_url, ""
+
+    rotated_image_url: str = ""
+    if input_args.output_dir is not None:
+        out_stl_path: Path = Path(
+            input_args.output_dir,
+            stl_file_path.relative_to(input_args.input_dir).with_stem(f"{stl_file_path.stem}_rotated"),
+        )
+        out_stl_path.parent.mkdir(parents=True, exist_ok=True)
+        logger.info(f"Saving rotated STL to: {out_stl_path}")
+        get_file_handler().write_mesh(
+            objects=objs, info={0: {"matrix": x.matrix, "tweaker_stats": x}}, outputfile=out_stl_path.as_posix()
+        )
+        with timed(stl_stats, "render_time"):
+            rotated_image_url = make_image_url(
+                stl_file_path=out_stl_path, input_args=input_args, mesh=np.matmul(np.asarray(objs[0]["mesh"]), x.matrix)
+            )
+    return ReturnStatus.WARNING, original_image_url, rotated_image_url
+
+
+def check_rotation(
+    input_args: argparse.Namespace, stl_file_path: Path, mesh: Optional[np.ndarray], content_hash: Optional[str], stl_stats: Dict[str, float]
+) -> Optional[Tuple[ReturnStatus, str, str]]:
+    result_cache: Optional[ResultCache] = get_result_cache(input_args.cache_dir, get_analysis_parameters(input_args))
+    if result_cache is None:
+        return analyze_rotation(input_args=input_args, stl_file_path=stl_file_path, mesh=mesh, content_hash=content_hash, stl_stats=stl_stats)
+
+    with timed(stl_stats, "load_time"):
+        if content_hash is None:
+            content_hash = file_content_hash(stl_file_path)
+    cached_result: Optional[Dict[str, Any]] = result_cache.get(content_hash)
+    # The image urls of cached results point to the images uploaded by an earlier run.
+    # A cached rotation warning still requires an analysis run if the rotated STL should be saved.
+    if cached_result is not None and (cached_result["status"] == ReturnStatus.SUCCESS or input_args.output_dir is None):
+        logger.info(f"Using cached result for {stl_file_path.as_posix()}")
+        return ReturnStatus(cached_result["status"]), cached_result["original_image_url"], cached_result["rotated_image_url"]
+
+    result: Optional[Tuple[ReturnStatus, str, str]] = analyze_rotation(
+        input_args=input_args, stl_file_path=stl_file_path, mesh=mesh, content_hash=content_hash, stl_stats=stl_stats
+    )
+    if result is not None:
+        result_cache.put(
+            content_hash, {"status": int(result[0]), "original_image_url": result[1], "rotated_image_url": result[2]}
+        )
+    return result
+
+
+def make_step_summary_row(cells: List[str], input_args: argparse.Namespace, stl_stats: Dict[str, float]) -> str:
+    if input_args.instrument:
+        cells = cells + make_metric_cells(stl_stats, METRICS_KEYS)
+    return f'| {" | ".join(cells)} |\n'
+
+
+def make_result_row(
+    stl_file_path: Path,
+    result: Tuple[ReturnStatus, str, str],
+    input_args: argparse.Namespace,
+    stl_stats: Dict[str, float],
+    twin: Optional[str] = None,
+) -> str:
+    # twin is the path of the geometrically identical STL whose result is reused
+    stl_return_status, original_image_url, rotated_image_url = result
+    result_cell: str = RESULT_WARNING if stl_return_status == ReturnStatus.WARNING else RESULT_SUCCESS
+    return make_step_summary_row(
+        cells=[
+            stl_file_path.name,
+            result_cell if twin is None else f"{result_cell} (same as {twin})",
+            f'[<img src="{original_image_url}" width="100" height="100">]({original_image_url})',
+            f'[<img src="{rotated_image_url}" width="100" height="100">]({rotated_image_url})'
+            if rotated_image_url != ""
+            else "",
+        ],
+        input_args=input_args,
+        stl_stats=stl_stats,
+    )
+
+
+def check_stl_rotation(
+    input_args: argparse.Namespace, stl_file_path: Path, mesh: Optional[np.ndarray] = None, content_hash: Optional[str] = None
+) -> Tuple[ReturnStatus, str, Dict[str, float]]:
+    # mesh (vertices, shape (3 * facets, 3)) and content_hash can be passed in by callers which already read the STL
     logger.info(f"Checking {stl_file_path.as_posix()}")
+    stl_stats: Dict[str, float] = {}
     try:
-        stl_return_status: ReturnStatus = ReturnStatus.SUCCESS
-        rotated_image_url: str = ""
-        original_image_url: str = make_image_url(stl_file_path=stl_file_path, input_args=input_args)
-
-        objs: Dict[int, Any] = file_handler.load_mesh(inputfile=stl_file_path.as_posix())
-        if len(objs.items()) > 1:
-            logger.warning(f"{stl_file_path.as_posix()} contains multiple objects and is therefore skipped.!")
-            return False, ""
-        x: Tweak = Tweak(objs[0]["mesh"], extended_mode=True, verbose=False, min_volume=True)
-
-        if x.rotation_angle >= 0.1:
-            if input_args.output_dir is not None:
-                out_stl_path: Path = Path(
-                    input_args.output_dir,
-                    stl_file_path.relative_to(input_args.input_dir).with_stem(f"{stl_file_path.stem}_rotated"),
-                )
-                out_stl_path.parent.mkdir(parents=True, exist_ok=True)
-                logger.info(f"Saving rotated STL to: {out_stl_path}")
-                file_handler.write_mesh(
-                    objects=objs, info={0: {"matrix": x.matrix, "tweaker_stats": x}}, outputfile=out_stl_path.as_posix()
-                )
-                rotated_image_url = make_image_url(stl_file_path=out_stl_path, input_args=input_args)
-            stl_return_status = ReturnStatus.WARNING
-        else:
-            logger.info(f"STL {stl_file_path.as_posix()} does not contain any errors!")
-        github_summary_table_contents: str = " | ".join(
-            [
-                stl_file_path.name,
-                RESULT_WARNING if stl_return_status == ReturnStatus.WARNING else RESULT_SUCCESS,
-                f'[<img src="{original_image_url}" width="100" height="100">]({original_image_url})',
-                f'[<img src="{rotated_image_url}" width="100" height="100">]({rotated_image_url})'
-                if rotated_image_url != ""
-                else "",
-            ]
-        )
-        github_summary_table = f"| {github_summary_table_contents} |\n"
-        return stl_return_status, github_summary_table
+        with measure_stl(metrics=stl_stats, stl_file=stl_file_path, args=input_args, stage=METRICS_STAGE):
+            result: Optional[Tuple[ReturnStatus, str, str]] = check_rotation(
+                input_args=input_args, stl_file_path=stl_file_path, mesh=mesh, content_hash=content_hash, stl_stats=stl_stats
+            )
     except Exception as e:
         logger.error("A fatal error occurred during rotation checking", exc_info=e)
-        return ReturnStatus.EXCEPTION, f'| {" | ".join([ stl_file_path.name, RESULT_EXCEPTION, "", ""])} |\n'
+        return ReturnStatus.EXCEPTION, make_step_summary_row(
+            cells=[stl_file_path.name, RESULT_EXCEPTION, "", ""], input_args=input_args, stl_stats=stl_stats
+        ), stl_stats
+    if result is None:
+        return ReturnStatus.SUCCESS, "", stl_stats
+
+    return result[0], make_result_row(stl_file_path=stl_file_path, result=result, input_args=input_args, stl_stats=stl_stats), stl_stats
+
+
+def make_prefilter_summary(stl_stats: List[Dict[str, float]]) -> str:
+    checked: List[Dict[str, float]] = [stats for stats in stl_stats if "prefilter_hit" in stats]
+    if len(checked) == 0:
+        return ""
+    hits: int = sum(int(stats["prefilter_hit"]) for stats in checked)
+    tweak_times: List[float] = [stats["tweak_time"] for stats in checked if "tweak_time" in stats]
+    prefilter_time: float = sum(stats["prefilter_time"] for stats in checked)
+    # Skipped files are assumed to have taken as long as the average file that went through Tweak
+    saved_time: float = hits * sum(tweak_times) / len(tweak_times) - prefilter_time if len(tweak_times) > 0 else 0.0
+    logger.info(f"Orientation pre-filter: {hits}/{len(checked)} hits, {prefilter_time:.2f}s spent, ~{saved_time:.2f}s saved")
+    return PREFILTER_SUMMARY.format(hits=hits, total=len(checked), hit_rate=hits / len(checked), saved_time=saved_time)
+
+def init_worker_process(verbose: bool):
+    global file_handler
+    file_handler = None
+    if verbose:
+        logger.setLevel("INFO")
+
+
+def check_hashed_stl(input_args: argparse.Namespace, content_hash: Optional[str], stl_file_path: Path) -> Tuple[ReturnStatus, str, Dict[str, float]]:
+    # Called by the worker pools with the content hash from the geometry index, the STL is the last argument like the supervisor expects
+    return check_stl_rotation(input_args=input_args, stl_file_path=stl_file_path, content_hash=content_hash)
+
+
+def make_failure_result(input_args: argparse.Namespace, reason: str, *call_args: Any) -> Tuple[ReturnStatus, str, Dict[str, float]]:
+    # Result of STLs whose worker process timed out or crashed, reported by the supervisor with the arguments of the
+    # failed call, the last one is the STL
+    stl_file_path: Path = call_args[-1]
+    return ReturnStatus.EXCEPTION, make_step_summary_row(
+        cells=[stl_file_path.name, f"{RESULT_EXCEPTION} ({reason})", "", ""], input_args=input_args, stl_stats={}
+    ), {}
+
+
+def reuse_geometry_results(
+    args: argparse.Namespace, stls: List[Path], geometry_index: GeometryIndex
+) -> Tuple[List[Path], List[Tuple[Path, Tuple[ReturnStatus, str, Dict[str, float]]]]]:
+    # STLs with the same geometry in the same pose (up to a rotation around Z) as an already checked STL take over
+    # its result. Returns the STLs which still have to be checked and the reused results.
+    result_cache: Optional[ResultCache] = get_result_cache(args.cache_dir, get_analysis_parameters(args))
+    if result_cache is None:
+        return stls, []
+    remaining: List[Path] = []
+    reused: List[Tuple[Path, Tuple[ReturnStatus, str, Dict[str, float]]]] = []
+    for stl in stls:
+        twin_result: Optional[Tuple[str, Dict[str, Any]]] = geometry_index.lookup_twin_result(stl=stl, result_cache=result_cache, same_pose=True)
+        # Like cached results, a reused warning still requires an analysis run if the rotated STL should be saved
+        if twin_result is None or (twin_result[1]["status"] != ReturnStatus.SUCCESS and args.output_dir is not None):
+            remaining.append(stl)
+            continue
+        twin, cached_result = twin_result
+        logger.info(f"Reusing the result of the geometrically identical {twin} for {stl.as_posix()}")
+        result: Tuple[ReturnStatus, str, str] = (
+            ReturnStatus(cached_result["status"]),
+            cached_result["original_image_url"],
+            cached_result["rotated_image_url"],
+        )
+        reused.append((stl, (result[0], make_result_row(stl_file_path=stl, result=result, input_args=args, stl_stats={}, twin=twin), {})))
+    return remaining, reused
+
+
+def run_rotation_checks(
+    args: argparse.Namespace, stls: List[Path], start_time: Optional[float] = None, content_hashes: Optional[Dict[Path, str]] = None
+) -> Tuple[List[Tuple[ReturnStatus, str, Dict[str, float]]], List[Path]]:
+    content_hashes = content_hashes or {}
+    pool: Union[Executor, Supervisor]
+    if is_supervised(args):
+        # Threads cannot be killed, supervised checks always run in worker processes
+        pool = Supervisor(
+            on_failure=functools.partial(make_failure_result, args),
+            max_workers=args.jobs,
+            timeout=args.file_timeout,
+            memory_limit_mb=args.memory_limit_mb,
+            initializer=init_worker_process,
+            initargs=(args.verbose,),
+        )
+    elif args.executor == EXECUTOR_PROCESS:
+        pool = ProcessPoolExecutor(max_workers=args.jobs, initializer=init_worker_process, initargs=(args.verbose,))
+    else:
+        pool = ThreadPoolExecutor(max_workers=args.jobs)
+    with pool:
+        def process_batch(batch: List[Path]) -> List[Tuple[ReturnStatus, str, Dict[str, float]]]:
+            # chunksize is ignored by the thread pool
+            hashes: List[Optional[str]] = [content_hashes.get(stl) for stl in batch]
+            return list(pool.map(functools.partial(check_hashed_stl, args), hashes, batch, chunksize=args.chunksize))
+
+        return run_batches(
+            stls=stls, process_batch=process_batch, batch_size=args.batch_size, time_budget=args.time_budget, start_time=start_time
+        )
+
 
 def main(args: argparse.Namespace):
+    start_time: float = time.monotonic()
     input_path: Path = Path(args.input_dir)
     return_status: ReturnStatus = ReturnStatus.SUCCESS
 
@@ -131,33 +431,62 @@ def main(args: argparse.Namespace):
         logger.setLevel("INFO")
 
     logger.info(f"Processing STL files in {str(input_path)}")
-    stls: List[Path] = list(itertools.chain(input_path.glob("**/*.stl"), input_path.glob("**/*.STL")))
+    work_list: Optional[Path] = Path(args.work_list) if args.work_list is not None else None
+    input_stls: List[Path] = collect_stls(input_path=input_path, work_list=work_list, since=args.since, cache_dir=args.cache_dir)
+    stls: List[Path] = order_by_cost(input_stls)
     if len(stls) == 0:
         return
-    if len(stls) > 40:
-        logger.warning(f"Excessive amount of STLs ({len(stls)}) detected. I am only going to check 40!")
-        stls = stls[:40]
-    with ThreadPoolExecutor() as pool:
-        results = pool.map(functools.partial(check_stl_rotation, args), stls)
+
+    geometry_index: Optional[GeometryIndex] = None
+    reused: List[Tuple[Path, Tuple[ReturnStatus, str, Dict[str, float]]]] = []
+    content_hashes: Dict[Path, str] = {}
+    if args.geometry_index is not None:
+        geometry_index = GeometryIndex(index_file=Path(args.geometry_index), input_path=input_path)
+        content_hashes = geometry_index.update(stls=stls, jobs=args.jobs, sidecar_dir=args.sidecar_dir)
+        stls, reused = reuse_geometry_results(args=args, stls=stls, geometry_index=geometry_index)
+
+    results, deferred = run_rotation_checks(args=args, stls=stls, start_time=start_time, content_hashes=content_hashes)
+    if work_list is not None:
+        save_work_list(work_list=work_list, input_path=input_path, deferred=deferred)
+    # Reused results come first, deferred STLs stay the tail of the schedule
+    stls = [stl for stl, _ in reused] + stls
+    results = [result for _, result in reused] + results
+    # Back from the cost order to the order of the input
+    stls, results = in_input_order(input_stls=input_stls, stls=stls, results=results)
 
     summaries: List[str] = []
-    for stl_result, summary in results:
+    stl_stats: List[Dict[str, float]] = []
+    for stl_result, summary, stats in results:
         summaries.append(summary)
+        stl_stats.append(stats)
         return_status = max(return_status, stl_result)
+    metrics_entries: List[Tuple[Path, Dict[str, float]]] = list(zip(stls, stl_stats))
+    # Like in the corruption checker, deferred STLs are reported but do not fail the check
 
     # Write github step summary
     if args.github_step_summary:
         with open(os.environ["GITHUB_STEP_SUMMARY"], "w") as gh_step_summary:
-            gh_step_summary.write(STEP_SUMMARY_PREAMBLE)
+            gh_step_summary.write(extend_preamble(STEP_SUMMARY_PREAMBLE, METRICS_KEYS) if args.instrument else STEP_SUMMARY_PREAMBLE)
             for summary in summaries:
                 gh_step_summary.write(summary)
+            gh_step_summary.write(make_prefilter_summary(stl_stats=stl_stats))
+            gh_step_summary.write(make_deferred_summary(input_path=input_path, deferred=deferred))
+            if geometry_index is not None:
+                gh_step_summary.write(geometry_index.make_duplicate_summary(stls=stls))
+    if geometry_index is not None:
+        geometry_index.save()
+
+    if args.metrics_file is not None:
+        write_metrics_file(metrics_file=Path(args.metrics_file), input_path=input_path, stage=METRICS_STAGE, entries=metrics_entries)
+    keep_slowest_profiles(args=args, stage=METRICS_STAGE, entries=metrics_entries)
 
     # Write extended_outcome output
     with open(os.environ["GITHUB_OUTPUT"], 'a') as f:
         f.write(f"extended-outcome={return_status_string_map[return_status]}\n")
+        f.write(f"deferred-count={len(deferred)}\n")
 
 
-if __name__ == "__main__":
+def make_parser() -> argparse.ArgumentParser:
     parser: argparse.ArgumentParser = argparse.ArgumentParser(
         prog="VoronDesign STL rotation checker & fixer",
         description="This tool can be used to check the rotation of STLs in a folder and potentially fix them",
@@ -209,5 +538,138 @@ if __name__ == "__main__":
         action="store_true",
         help="Whether to output a step summary when running inside a github action",
     )
-    args: argparse.Namespace = parser.parse_args()
+    parser.add_argument(
+        "-r",
+        "--renderer",
+        required=False,
+        action="store",
+        type=str,
+        choices=[RENDERER_STL_THUMB, RENDERER_NUMPY],
+        default=RENDERER_STL_THUMB,
+        help="Thumbnail renderer, numpy renders in-process from the loaded mesh without an external binary",
+    )
+    parser.add_argument(
+        "--render_cache_dir",
+        required=False,
+        action="store",
+        type=str,
+        help="Directory to cache rendered thumbnails in, keyed by mesh content and render parameters",
+    )
+    parser.add_argument(
+        "--skip_prefilter",
+        required=False,
+        action="store_true",
+        help="Run Tweak on every STL, even if it obviously lies on its largest flat face already",
+    )
+    parser.add_argument(
+        "--prefilter_min_contact",
+        required=False,
+        action="store",
+        type=float,
+        default=0.95,
+        help="Minimum print bed contact area, relative to the largest flat face, to skip Tweak",
+    )
+    parser.add_argument(
+        "--prefilter_max_overhang",
+        required=False,
+        action="store",
+        type=float,
+        default=0.05,
+        help="Maximum overhanging area, relative to the total surface area, to skip Tweak",
+    )
+    parser.add_argument(
+        "--decimate_threshold",
+        required=False,
+        action="store",
+        type=int,
+        help="Meshes with more facets are reduced to about this many facets by vertex clustering before Tweak",
+    )
+    parser.add_argument(
+        "-e",
+        "--executor",
+        required=False,
+        action="store",
+        type=str,
+        choices=[EXECUTOR_PROCESS, EXECUTOR_THREAD],
+        default=EXECUTOR_PROCESS,
+        help="Whether to check STLs in worker processes or in threads of a single process",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        required=False,
+        action="store",
+        type=int,
+        help="Number of parallel workers, defaults to the number of CPUs",
+    )
+    parser.add_argument(
+        "--chunksize",
+        required=False,
+        action="store",
+        type=int,
+        default=1,
+        help="Number of STLs sent to a worker process at once",
+    )
+    parser.add_argument(
+        "-t",
+        "--time_budget",
+        required=False,
+        action="store",
+        type=float,
+        help="Wall-clock budget in seconds, STLs which do not fit into it are deferred",
+    )
+    parser.add_argument(
+        "-b",
+        "--batch_size",
+        required=False,
+        action="store",
+        type=int,
+        default=8,
+        help="Number of STLs scheduled at once, the time budget is checked between batches",
+    )
+    parser.add_argument(
+        "-w",
+        "--work_list",
+        required=False,
+        action="store",
+        type=str,
+        help="File to persist deferred STLs into, an existing work list is resumed instead of checking the whole folder",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        required=False,
+        action="store",
+        type=str,
+        help="Directory to cache check results in, keyed by STL content hash, tweaker3 version and analysis parameters",
+    )
+    parser.add_argument(
+        "--sidecar_dir",
+        required=False,
+        action="store",
+        type=str,
+        help="Directory to store binary copies of ASCII STLs in, keyed by content hash, which are loaded instead of the text",
+    )
+    parser.add_argument(
+        "-s",
+        "--since",
+        required=False,
+        action="store",
+        type=str,
+        help="Only check STLs changed since the merge base with this git ref, renamed STLs reuse their results from --cache_dir",
+    )
+    parser.add_argument(
+        "--geometry_index",
+        required=False,
+        action="store",
+        type=str,
+        help="Index of STL geometry fingerprints, geometrically identical STLs in the same pose reuse cached results "
+        "and all geometrically identical STLs are reported as duplicates",
+    )
+    add_instrumentation_arguments(parser)
+    add_supervisor_arguments(parser)
+    return parser
+
+
+if __name__ == "__main__":
+    args: argparse.Namespace = make_parser().parse_args()
     main(args=args)
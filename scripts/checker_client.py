@@ -0,0 +1,126 @@
+import argparse
+import json
+import logging
+import os
+import socket
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Only the standard library is imported here, the client has to start faster than the scripts it replaces
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = Path(os.environ.get("XDG_RUNTIME_DIR", tempfile.gettempdir()), f"voron-checker-{os.getuid()}.sock").as_posix()
+SCRIPTS_DIR = Path(__file__).parent
+# Scripts the daemon keeps warm, requests for anything else are rejected
+DAEMON_SCRIPTS: List[str] = [
+    "check_stl_corruption",
+    "check_stl_rotation",
+    "check_stl_pipeline",
+    "check_files",
+    "generate_readme",
+    "validate_metadata",
+]
+RECEIVE_SIZE = 65536
+# Environment variables the scripts and their subprocesses use, secrets like tokens and imagekit keys never leave the client
+FORWARDED_VARIABLES: List[str] = ["GITHUB_STEP_SUMMARY", "GITHUB_OUTPUT", "PATH", "HOME", "LANG", "LANGUAGE", "TZ", "TMPDIR", "PYTHONPATH"]
+FORWARDED_PREFIXES: List[str] = ["LC_"]
+
+
+def is_forwarded_variable(name: str) -> bool:
+    return name in FORWARDED_VARIABLES or any(name.startswith(prefix) for prefix in FORWARDED_PREFIXES)
+
+
+def get_forwarded_environment(environment: Dict[str, str]) -> Dict[str, str]:
+    return {name: value for name, value in environment.items() if is_forwarded_variable(name)}
+
+
+def send_message(connection: socket.socket, message: Dict[str, Any]):
+    # Messages are single lines of json
+    connection.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+
+def receive_message(connection: socket.socket) -> Dict[str, Any]:
+    content: bytes = b""
+    while not content.endswith(b"\n"):
+        chunk: bytes = connection.recv(RECEIVE_SIZE)
+        if chunk == b"":
+            raise ConnectionError("Connection closed before a complete message was received")
+        content += chunk
+    return json.loads(content)
+
+
+def run_in_daemon(socket_path: str, script: str, script_args: List[str]) -> int:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        # The script runs as if it was started from this shell, with the same working directory and step summary/output files
+        send_message(connection, {"script": script, "argv": script_args, "cwd": os.getcwd(), "env": get_forwarded_environment(dict(os.environ))})
+        response: Dict[str, Any] = receive_message(connection)
+    sys.stdout.write(response["output"])
+    sys.stdout.flush()
+    logger.info(f"{script} finished in {response['duration']:.3f}s within the daemon")
+    return response["exit_code"]
+
+
+def main(args: argparse.Namespace, script_args: List[str]):
+    if args.verbose:
+        logger.setLevel("INFO")
+    try:
+        exit_code: int = run_in_daemon(socket_path=args.socket, script=args.script, script_args=script_args)
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        if args.no_fallback:
+            logger.error(f"No checker daemon is listening on {args.socket}: {e}")
+            sys.exit(255)
+        # Without a daemon the script is started like before, in this process
+        logger.info(f"No checker daemon is listening on {args.socket}, running {args.script} directly")
+        script_path: str = Path(SCRIPTS_DIR, f"{args.script}.py").as_posix()
+        os.execv(sys.executable, [sys.executable, script_path] + script_args)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog="VoronDesign checker client",
+        description="This tool runs one of the checker scripts in a warm checker daemon (see checker_daemon.py), "
+        "all arguments after the script name are passed to the script",
+    )
+    parser.add_argument(
+        "-s",
+        "--socket",
+        required=False,
+        action="store",
+        type=str,
+        default=DEFAULT_SOCKET_PATH,
+        help="Unix socket the daemon listens on",
+    )
+    parser.add_argument(
+        "--no_fallback",
+        required=False,
+        action="store_true",
+        help="Fail instead of running the script directly if no daemon is listening",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        required=False,
+        action="store_true",
+        help="Print debug output to stdout",
+    )
+    parser.add_argument(
+        "script",
+        action="store",
+        type=str,
+        choices=DAEMON_SCRIPTS,
+        help="Script to run",
+    )
+    parser.add_argument(
+        "script_args",
+        action="store",
+        nargs=argparse.REMAINDER,
+        help="Arguments of the script",
+    )
+    args: argparse.Namespace = parser.parse_args()
+    main(args=args, script_args=args.script_args)
@@ -0,0 +1,177 @@
+import argparse
+import importlib
+import logging
+import os
+import socketserver
+import sys
+import tempfile
+import time
+import traceback
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict, List
+
+from checker_client import DAEMON_SCRIPTS, DEFAULT_SOCKET_PATH, SCRIPTS_DIR, get_forwarded_environment, is_forwarded_variable, receive_message, send_message
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+# Imported lazily by the scripts, loaded up front so that no request has to pay for them
+LAZY_DEPENDENCIES: List[str] = ["admesh", "tweaker3.FileHandler", "tweaker3.MeshTweaker"]
+
+
+def warm_up(scripts: List[str]) -> Dict[str, ModuleType]:
+    # Each script is imported once, together with all of its dependencies (numpy, admesh, tweaker3, yaml, jsonschema, ...).
+    # Requests only parse their arguments and call the main function of the already imported module.
+    available: Dict[str, ModuleType] = {}
+    for script in scripts:
+        start_time: float = time.perf_counter()
+        try:
+            available[script] = importlib.import_module(script)
+        except ImportError as e:
+            logger.warning(f"{script} is not available: {e}")
+            continue
+        logger.info(f"Loaded {script} in {time.perf_counter() - start_time:.3f}s")
+    for module in LAZY_DEPENDENCIES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.warning(f"{module} is not available: {e}")
+    return available
+
+
+def reset_loggers():
+    # Verbose runs raise the level of the loggers they use, this must not leak into the next run
+    for existing_logger in logging.root.manager.loggerDict.values():
+        if isinstance(existing_logger, logging.Logger) and existing_logger is not logger:
+            existing_logger.setLevel(logging.NOTSET)
+
+
+def run_script(module: ModuleType, argv: List[str], cwd: str, env: Dict[str, str]) -> Dict[str, Any]:
+    saved_cwd: str = os.getcwd()
+    saved_env: Dict[str, str] = dict(os.environ)
+    saved_argv: List[str] = sys.argv
+    script_path: str = Path(SCRIPTS_DIR, f"{module.__name__}.py").as_posix()
+    with tempfile.TemporaryFile() as output:
+        # Redirecting the file descriptors also captures the output of worker processes and subprocesses
+        sys.stdout.flush()
+        sys.stderr.flush()
+        saved_stdout: int = os.dup(1)
+        saved_stderr: int = os.dup(2)
+        os.dup2(output.fileno(), 1)
+        os.dup2(output.fileno(), 2)
+        start_time: float = time.perf_counter()
+        try:
+            os.chdir(cwd)
+            # Only the forwarded variables are taken from the client, everything else stays as the daemon was started
+            for name in [name for name in os.environ if is_forwarded_variable(name)]:
+                del os.environ[name]
+            os.environ.update(get_forwarded_environment(env))
+            sys.argv = [script_path] + argv
+            reset_loggers()
+            # Scripts without arguments (check_files) have no parser
+            if hasattr(module, "make_parser"):
+                module.main(args=module.make_parser().parse_args(argv))
+            else:
+                module.main()
+            exit_code: int = 0
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else int(e.code is not None)
+        except Exception:
+            traceback.print_exc()
+            exit_code = 1
+        finally:
+            duration: float = time.perf_counter() - start_time
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved_stdout, 1)
+            os.dup2(saved_stderr, 2)
+            os.close(saved_stdout)
+            os.close(saved_stderr)
+            sys.argv = saved_argv
+            os.environ.clear()
+            os.environ.update(saved_env)
+            os.chdir(saved_cwd)
+        output.seek(0)
+        return {"exit_code": exit_code, "output": output.read().decode("utf-8", errors="replace"), "duration": duration}
+
+
+class CheckerRequestHandler(socketserver.StreamRequestHandler):
+    server: "CheckerServer"
+
+    def handle(self):
+        request: Dict[str, Any] = receive_message(self.connection)
+        script: str = request["script"]
+        if script not in self.server.scripts:
+            send_message(self.connection, {"exit_code": 255, "output": f"{script} is not available in this daemon\n", "duration": 0.0})
+            return
+        logger.info(f"Running {script} {' '.join(request['argv'])}")
+        response: Dict[str, Any] = run_script(module=self.server.scripts[script], argv=request["argv"], cwd=request["cwd"], env=request["env"])
+        logger.info(f"{script} exited with {response['exit_code']} after {response['duration']:.3f}s")
+        send_message(self.connection, response)
+
+
+class CheckerServer(socketserver.UnixStreamServer):
+    # Requests are handled one after another: the scripts change the working directory, the environment and
+    # the file descriptors of the process, and fork worker processes, which is unsafe with other threads running
+    def __init__(self, socket_path: str, scripts: Dict[str, ModuleType]):
+        super().__init__(socket_path, CheckerRequestHandler)
+        os.chmod(socket_path, 0o600)
+        self.scripts: Dict[str, ModuleType] = scripts
+
+
+def main(args: argparse.Namespace):
+    if args.verbose:
+        logger.setLevel("INFO")
+
+    start_time: float = time.perf_counter()
+    scripts: Dict[str, ModuleType] = warm_up(args.scripts)
+    logger.info(f"Warmed up {len(scripts)} scripts in {time.perf_counter() - start_time:.3f}s")
+
+    # A socket left behind by a daemon which was killed would make bind fail
+    Path(args.socket).unlink(missing_ok=True)
+    server: CheckerServer = CheckerServer(socket_path=args.socket, scripts=scripts)
+    logger.info(f"Listening on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        Path(args.socket).unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog="VoronDesign checker daemon",
+        description="This tool keeps the checker scripts and their dependencies loaded and runs them on request "
+        "of checker_client.py, without the interpreter start and import cost of every invocation",
+    )
+    parser.add_argument(
+        "-s",
+        "--socket",
+        required=False,
+        action="store",
+        type=str,
+        default=DEFAULT_SOCKET_PATH,
+        help="Unix socket to listen on",
+    )
+    parser.add_argument(
+        "--scripts",
+        required=False,
+        action="store",
+        type=str,
+        nargs="+",
+        choices=DAEMON_SCRIPTS,
+        default=DAEMON_SCRIPTS,
+        help="Scripts to keep warm",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        required=False,
+        action="store_true",
+        help="Print debug output to stdout",
+    )
+    args: argparse.Namespace = parser.parse_args()
+    main(args=args)
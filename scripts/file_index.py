@@ -0,0 +1,66 @@
+import logging
+import os
+import posixpath
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from metadata_index import METADATA_FILE_NAME
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+
+class FileIndex:
+    # In-memory set of all files and directories below a root, collected with a single scandir walk.
+    # Lookups replace one stat syscall per referenced file.
+    def __init__(self, root: Path):
+        self.root: Path = Path(root)
+        self.paths: Set[str] = set()
+        self.metadata_files: List[Path] = []
+        # Lowercase path -> actual paths, used to suggest fixes for wrongly cased references
+        self.case_insensitive_paths: Dict[str, List[str]] = {}
+        self._scan()
+
+    def _scan(self):
+        pending: List[str] = [""]
+        # Real paths of all scanned directories, so that symlinked directories are entered without following cycles
+        visited: Set[str] = {os.path.realpath(self.root)}
+        while len(pending) > 0:
+            relative_dir: str = pending.pop()
+            with os.scandir(Path(self.root, relative_dir)) as entries:
+                for entry in entries:
+                    if entry.name == ".git":
+                        continue
+                    relative_path: str = posixpath.join(relative_dir, entry.name) if relative_dir != "" else entry.name
+                    self.paths.add(relative_path)
+                    self.case_insensitive_paths.setdefault(relative_path.lower(), []).append(relative_path)
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(relative_path)
+                    elif entry.is_symlink() and entry.is_dir():
+                        real_path: str = os.path.realpath(entry.path)
+                        if real_path not in visited:
+                            visited.add(real_path)
+                            pending.append(relative_path)
+                    elif entry.name == METADATA_FILE_NAME:
+                        self.metadata_files.append(Path(self.root, relative_path))
+        # Sort Path objects (not strings), to keep the order of sorted(Path.glob(...))
+        self.metadata_files.sort()
+        logger.info(f"Indexed {len(self.paths)} paths in {self.root}")
+
+    def _normalize(self, base_dir: str, reference: str) -> str:
+        normalized: str = posixpath.normpath(posixpath.join(base_dir, reference))
+        return "" if normalized == "." else normalized
+
+    def exists(self, base_dir: str, reference: str) -> bool:
+        normalized: str = self._normalize(base_dir=base_dir, reference=reference)
+        if normalized == "" or normalized in self.paths:
+            return True
+        # References the index can not resolve (e.g. ".." through a symlink or outside of the root) are checked on disk
+        return Path(self.root, base_dir, reference).exists()
+
+    def suggest(self, base_dir: str, reference: str) -> Optional[str]:
+        # Returns a differently cased existing path (relative to base_dir), e.g. "part.STL" for "part.stl"
+        candidates: List[str] = self.case_insensitive_paths.get(self._normalize(base_dir=base_dir, reference=reference).lower(), [])
+        if len(candidates) == 0:
+            return None
+        return posixpath.relpath(sorted(candidates)[0], base_dir if base_dir != "" else ".")
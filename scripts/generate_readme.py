@@ -1,11 +1,15 @@
 from pathlib import Path
 import os
-import yaml
+import hashlib
 import json
 import argparse
 import textwrap
 import logging
-import subprocess
+import time
+from typing import Any, Dict, List, Optional
+
+from git_history import build_last_changed_index, get_head_commit, is_ancestor
+from metadata_index import ModMetadata, parse_metadata_files, scan_metadata_files
 
 logging.basicConfig()
 logger = logging.getLogger(__name__)
@@ -30,52 +34,127 @@ header = """
 """
 
 
+METADATA_CACHE_VERSION = 1
+
+
+def shorten_mod(mod: ModMetadata) -> Dict[str, str]:
+    return {
+        "path": mod.mod_dir,
+        "title": textwrap.shorten(mod.title, width=35, placeholder="..."),
+        "creator": mod.creator,
+        "description": textwrap.shorten(mod.description, width=70, placeholder="..."),
+        "printer_compatibility": f'{", ".join(sorted(mod.printer_compatibility))}',
+    }
+
+
+def load_metadata_cache(cache_file: Optional[str]) -> Dict[str, Any]:
+    empty_cache: Dict[str, Any] = {"version": METADATA_CACHE_VERSION, "head": None, "mods": {}, "last_changed": {}}
+    if cache_file is None or not Path(cache_file).exists():
+        return empty_cache
+    with open(cache_file, "r", encoding="utf-8") as f:
+        cache: Dict[str, Any] = json.load(f)
+    if cache.get("version") != METADATA_CACHE_VERSION:
+        logger.info(f"Ignoring metadata cache {cache_file} with outdated format")
+        return empty_cache
+    return cache
+
+
+def get_last_changed(input_dir: str, mod_dirs: List[str], cache: Dict[str, Any], head: Optional[str]) -> Dict[str, str]:
+    # Only walk the commits since the cached HEAD if possible. Directories which did not change since then keep their
+    # cached date, directories without a cached date (e.g. after a force push) fall back to a full history walk.
+    cached_head: Optional[str] = cache["head"]
+    last_changed: Dict[str, str] = {}
+    if cached_head is not None and head is not None and is_ancestor(repo_dir=Path(input_dir), commit=cached_head, head=head):
+        last_changed = {mod_dir: cache["last_changed"][mod_dir] for mod_dir in mod_dirs if mod_dir in cache["last_changed"]}
+        if cached_head != head:
+            last_changed.update(
+                build_last_changed_index(repo_dir=Path(input_dir), directories=mod_dirs, revision_range=f"{cached_head}..{head}")
+            )
+    undated_dirs: List[str] = [mod_dir for mod_dir in mod_dirs if mod_dir not in last_changed]
+    if len(undated_dirs) > 0:
+        last_changed.update(build_last_changed_index(repo_dir=Path(input_dir), directories=undated_dirs))
+    return last_changed
+
+
+def render_mod_table(mods: List[Dict[str, str]]) -> str:
+    table = header
+    prev_username = ""
+    for mod in mods:
+        table += (
+            f'| {mod["creator"] if mod["creator"] != prev_username else ""} '
+            f'| [{mod["title"]}]({mod["path"]}) '
+            f'| {mod["description"]} '
+            f'| {mod["printer_compatibility"]} '
+            f'| {mod["last_changed"]} '
+            '|\n'
+        )
+        prev_username = mod["creator"]
+    return table
+
+
+def write_if_changed(file_path: Path, content: str):
+    if file_path.exists() and file_path.read_text(encoding="utf-8") == content:
+        logger.info(f"{file_path.as_posix()} is up to date")
+        return
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
 def main(args: argparse.Namespace):
 
     if args.verbose:
         logger.setLevel("INFO")
-    yaml_list = Path(args.input_dir).glob("**/.metadata.yml")
-    mods = []
-    for yml_file in sorted(yaml_list):
-        with open(yml_file, "r") as f:
-            content = yaml.safe_load(f)
-            mods.append({
-                "path": yml_file.relative_to(args.input_dir).parent.as_posix(),
-                "title": textwrap.shorten(content["title"], width=35, placeholder="..."),
-                "creator":  yml_file.relative_to(args.input_dir).parts[0],
-                "description": textwrap.shorten(content["description"], width=70, placeholder="..."),
-                "printer_compatibility": f'{", ".join(sorted(content["printer_compatibility"]))}',
-                "last_changed": subprocess.run(['git', '-C', args.input_dir, 'log', '-n', '1', '--date=iso-local', '--format=%cd', '--', yml_file.relative_to(args.input_dir).parent.as_posix()], stdout=subprocess.PIPE).stdout.decode('utf-8').strip()
-            })
+    yaml_list = scan_metadata_files(Path(args.input_dir))
+
+    # In incremental mode only new or changed metadata files are parsed, all others are taken from the cache
+    start_time = time.perf_counter()
+    cache = load_metadata_cache(args.cache_file)
+    cached_mods: Dict[str, Dict[str, Any]] = cache["mods"]
+    parsed_mods: Dict[str, Optional[Dict[str, Any]]] = {}
+    changed_files: List[Path] = []
+    for yml_file in yaml_list:
+        yml_path = yml_file.relative_to(args.input_dir).as_posix()
+        if yml_path in cached_mods and cached_mods[yml_path]["hash"] == hashlib.sha256(yml_file.read_bytes()).hexdigest():
+            parsed_mods[yml_path] = cached_mods[yml_path]
+        else:
+            # Placeholder, keeps the order of the mods
+            parsed_mods[yml_path] = None
+            changed_files.append(yml_file)
+    for mod in parse_metadata_files(root=Path(args.input_dir), yml_files=changed_files):
+        parsed_mods[mod.yml_file.relative_to(args.input_dir).as_posix()] = {"hash": mod.content_hash, "record": shorten_mod(mod)}
+    changed_count = len(changed_files)
+    deleted_count = len(set(cached_mods) - set(parsed_mods))
+    logger.info(
+        f"Parsed {changed_count} new or changed metadata files, removed {deleted_count}, "
+        f"reused {len(parsed_mods) - changed_count} in {time.perf_counter() - start_time:.3f}s"
+    )
+
+    start_time = time.perf_counter()
+    head = get_head_commit(repo_dir=Path(args.input_dir)) if args.cache_file is not None else None
+    mod_dirs = [mod["record"]["path"] for mod in parsed_mods.values()]
+    last_changed = get_last_changed(input_dir=args.input_dir, mod_dirs=mod_dirs, cache=cache, head=head)
+    logger.info(f"Built git history index for {len(yaml_list)} mods in {time.perf_counter() - start_time:.3f}s")
+
+    start_time = time.perf_counter()
+    mods = [{**mod["record"], "last_changed": last_changed.get(mod["record"]["path"], "")} for mod in parsed_mods.values()]
+    mod_table = render_mod_table(mods)
 
     if args.json == 'true':
-        with open(Path(args.input_dir, "mods.json"), "w", encoding='utf-8') as f:
-            json.dump(mods, f, indent=4)
+        write_if_changed(Path(args.input_dir, "mods.json"), json.dumps(mods, indent=4))
 
     with open(os.environ["GITHUB_STEP_SUMMARY"], "w", encoding='utf-8') as f:
-        f.write(header)
-        prev_username = ""
-        for mod in mods:
-            f.write(f'| {mod["creator"] if mod["creator"] != prev_username else ""} | [{mod["title"]}]({mod["path"]}) | {mod["description"]} | {mod["printer_compatibility"]} | {mod["last_changed"]} |\n')
-            prev_username = mod["creator"]
+        f.write(mod_table)
     if args.preview != "true":
-        with open(Path(args.input_dir, "README.md"), "w", encoding='utf-8') as f:
-            f.write(preamble)
-            f.write(header)
-            prev_username = ""
-            for mod in mods:
-                f.write(
-                    f'| {mod["creator"] if mod["creator"] != prev_username else ""} '
-                    f'| [{mod["title"]}]({mod["path"]}) '
-                    f'| {mod["description"]} '
-                    f'| {mod["printer_compatibility"]} '
-                    f'| {mod["last_changed"]} '
-                    '|\n'
-                )
-                prev_username = mod["creator"]
+        write_if_changed(Path(args.input_dir, "README.md"), preamble + mod_table)
+    logger.info(f"Rendered {len(mods)} mods in {time.perf_counter() - start_time:.3f}s")
 
+    if args.cache_file is not None:
+        Path(args.cache_file).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.cache_file, "w", encoding="utf-8") as f:
+            json.dump({"version": METADATA_CACHE_VERSION, "head": head, "mods": parsed_mods, "last_changed": last_changed}, f)
 
-if __name__ == "__main__":
+
+def make_parser() -> argparse.ArgumentParser:
     parser: argparse.ArgumentParser = argparse.ArgumentParser(
         prog="VoronDesign VoronUsers readme generator",
         description="This tool is used to generate the readme and json overview files for VORONUsers",
@@ -105,6 +184,14 @@ if __name__ == "__main__":
         help="Whether to generate a json file as well",
 
     )
+    parser.add_argument(
+        "-c",
+        "--cache_file",
+        required=False,
+        action="store",
+        type=str,
+        help="Cache of parsed metadata files and mod dates, enables incremental regeneration",
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -112,5 +199,9 @@ if __name__ == "__main__":
         action="store_true",
         help="Print debug output to stdout",
     )
-    args: argparse.Namespace = parser.parse_args()
+    return parser
+
+
+if __name__ == "__main__":
+    args: argparse.Namespace = make_parser().parse_args()
     main(args=args)
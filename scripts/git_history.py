@@ -0,0 +1,124 @@
+import logging
+import subprocess
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, List, Optional, Set
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+# Every commit starts with a line "<NUL><commit date><NUL><hash><NUL><parent hashes>", followed by the changed file names.
+# With -m a merge commit is listed once per parent, each time with the files that differ from that parent.
+COMMIT_MARKER = "\x00"
+COMMIT_FORMAT = "%x00%cd%x00%H%x00%P"
+
+def get_head_commit(repo_dir: Path) -> Optional[str]:
+    result: subprocess.CompletedProcess = subprocess.run(
+        ["git", "-C", Path(repo_dir).as_posix(), "rev-parse", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    if result.returncode != 0:
+        return None
+    return result.stdout.decode("utf-8").strip()
+
+
+def is_ancestor(repo_dir: Path, commit: str, head: str) -> bool:
+    result: subprocess.CompletedProcess = subprocess.run(
+        ["git", "-C", Path(repo_dir).as_posix(), "merge-base", "--is-ancestor", commit, head],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return result.returncode == 0
+
+
+def build_last_changed_index(repo_dir: Path, directories: Iterable[str], revision_range: Optional[str] = None) -> Dict[str, str]:
+    # Walks the history once (newest first) instead of running one "git log -n 1 -- <dir>" per directory.
+    # Directories are relative to repo_dir, the walk stops as soon as every directory has been dated.
+    pending: Set[str] = set(directories)
+    last_changed: Dict[str, str] = {}
+    if len(pending) == 0:
+        return last_changed
+
+    cmd = ["git", "-c", "core.quotepath=off", "-C", Path(repo_dir).as_posix(), "log", "-m", "--date=iso-local", f"--format={COMMIT_FORMAT}", "--name-only", "--relative"]
+    if revision_range is not None:
+        cmd.append(revision_range)
+    cmd += ["--", "."]
+
+    def date_commit(date: str, parent_count: int, changed_dirs: List[Set[str]]):
+        # Like "git log -n 1 -- <dir>", a merge only dates the directories which differ from all of its parents,
+        # any other directory is dated by the commit on the branch it was changed on
+        if len(changed_dirs) == 0 or len(changed_dirs) < parent_count:
+            return
+        for directory in set.intersection(*changed_dirs) & pending:
+            last_changed[directory] = date
+            pending.discard(directory)
+
+    process: subprocess.Popen = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, encoding="utf-8")
+    commit_date: str = ""
+    commit_hash: str = ""
+    parent_count: int = 0
+    # Directories changed by the current commit, one set per parent
+    changed_dirs: List[Set[str]] = []
+    try:
+        for line in process.stdout:
+            line = line.rstrip("\n")
+            if line.startswith(COMMIT_MARKER):
+                date, header_hash, parents = line[len(COMMIT_MARKER) :].split(COMMIT_MARKER)
+                if header_hash != commit_hash:
+                    date_commit(commit_date, parent_count, changed_dirs)
+                    if len(pending) == 0:
+                        break
+                    commit_date, commit_hash, parent_count, changed_dirs = date, header_hash, len(parents.split()), []
+                changed_dirs.append(set())
+                continue
+            if line == "":
+                continue
+            changed_dirs[-1].update(parent.as_posix() for parent in PurePosixPath(line).parents)
+        else:
+            date_commit(commit_date, parent_count, changed_dirs)
+    finally:
+        # Stop git from walking the rest of the history once every directory is dated
+        process.kill()
+        process.wait()
+    logger.info(f"Dated {len(last_changed)} directories, {len(pending)} without history")
+    return last_changed
+
+
+def get_changed_files(repo_dir: Path, since: str) -> Optional[Dict[str, Optional[str]]]:
+    # Files changed between the merge base with since and the working tree, from a single "git diff" call.
+    # Maps every changed file (relative to repo_dir) to its previous path if it was renamed without any
+    # content change, and to None otherwise. Deleted files are left out, untracked (but not ignored) files are included.
+    result: subprocess.CompletedProcess = subprocess.run(
+        ["git", "-C", Path(repo_dir).as_posix(), "diff", "--name-status", "-z", "-M", "--relative", "--merge-base", since],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    if result.returncode != 0:
+        logger.error(f"Unable to diff against {since}: {result.stderr.decode('utf-8').strip()}")
+        return None
+
+    fields: List[str] = result.stdout.decode("utf-8").split("\x00")
+    changed: Dict[str, Optional[str]] = {}
+    index: int = 0
+    while index < len(fields) and fields[index] != "":
+        status: str = fields[index]
+        if status.startswith(("R", "C")):
+            # Renames and copies list the old and the new path, the score is the similarity in percent
+            old_path, new_path = fields[index + 1], fields[index + 2]
+            changed[new_path] = old_path if status == "R100" else None
+            index += 3
+            continue
+        if status != "D":
+            changed[fields[index + 1]] = None
+        index += 2
+
+    result = subprocess.run(
+        ["git", "-C", Path(repo_dir).as_posix(), "ls-files", "-z", "--others", "--exclude-standard"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    if result.returncode != 0:
+        logger.error(f"Unable to list untracked files: {result.stderr.decode('utf-8').strip()}")
+        return None
+    for untracked in result.stdout.decode("utf-8").split("\x00"):
+        if untracked != "":
+            changed[untracked] = None
+    return changed
@@ -0,0 +1,83 @@
+import functools
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, List, Optional
+
+import yaml
+
+try:
+    # libyaml based loader, several times faster than the pure python one
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+METADATA_FILE_NAME = ".metadata.yml"
+# Below this number of files, starting worker processes costs more than it saves
+PARALLEL_THRESHOLD = 256
+PARALLEL_CHUNKSIZE = 64
+
+
+@dataclass(frozen=True)
+class ModMetadata:
+    yml_file: Path
+    mod_dir: str
+    creator: str
+    content_hash: str
+    title: str
+    description: str
+    printer_compatibility: List[str]
+    cad: List[str]
+    images: List[str]
+
+
+def scan_metadata_files(root: Path) -> List[Path]:
+    metadata_files: List[Path] = []
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names[:] = [dir_name for dir_name in dir_names if dir_name != ".git"]
+        if METADATA_FILE_NAME in file_names:
+            metadata_files.append(Path(dir_path, METADATA_FILE_NAME))
+    # Sort Path objects (not strings), to keep the order of sorted(Path.glob(...))
+    return sorted(metadata_files)
+
+
+def load_metadata_content(raw_content: bytes) -> Any:
+    return yaml.load(raw_content, Loader=SafeLoader)
+
+
+def parse_metadata_file(root: Path, yml_file: Path) -> ModMetadata:
+    raw_content: bytes = yml_file.read_bytes()
+    content = load_metadata_content(raw_content)
+    relative_path: Path = yml_file.relative_to(root)
+    return ModMetadata(
+        yml_file=yml_file,
+        mod_dir=relative_path.parent.as_posix(),
+        creator=relative_path.parts[0],
+        content_hash=hashlib.sha256(raw_content).hexdigest(),
+        # Only images are optional, a missing required key raises a KeyError like the individual tools always did
+        title=content["title"],
+        description=content["description"],
+        printer_compatibility=list(content["printer_compatibility"]),
+        cad=list(content["cad"]),
+        images=list(content.get("images", [])),
+    )
+
+
+def parse_metadata_files(root: Path, yml_files: Iterable[Path], jobs: Optional[int] = None) -> List[ModMetadata]:
+    yml_files = list(yml_files)
+    if len(yml_files) < PARALLEL_THRESHOLD or jobs == 1:
+        return [parse_metadata_file(root=root, yml_file=yml_file) for yml_file in yml_files]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(functools.partial(parse_metadata_file, root), yml_files, chunksize=PARALLEL_CHUNKSIZE))
+
+
+def load_metadata_index(root: Path, jobs: Optional[int] = None) -> List[ModMetadata]:
+    yml_files: List[Path] = scan_metadata_files(root)
+    logger.info(f"Found {len(yml_files)} metadata files in {root}")
+    return parse_metadata_files(root=root, yml_files=yml_files, jobs=jobs)
@@ -0,0 +1,316 @@
+import argparse
+import functools
+import hashlib
+import io
+import itertools
+import logging
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+FORMAT_PNG = "png"
+FORMAT_WEBP = "webp"
+FORMAT_JPEG = "jpeg"
+JPEG_SUFFIXES: List[str] = [".jpg", ".jpeg"]
+IMAGE_PATTERNS: List[str] = ["**/*.png", "**/*.jpg", "**/*.jpeg", "**/*.webp"]
+# Below this number of images, starting worker processes costs more than it saves
+PARALLEL_THRESHOLD = 8
+# Every step that does not meet the size bound lowers the WebP or JPEG quality by this much, down to the minimum
+QUALITY_STEP = 10
+MIN_QUALITY = 40
+# Once the quality is at its minimum, the image is scaled down by this factor per step
+DOWNSCALE_FACTOR = 0.75
+MIN_DIMENSION = 64
+
+OPTIMIZE_SUMMARY = """## Image optimization summary
+
+| Images | Encoded | Cached | Failed | Original [MB] | Optimized [MB] | Saved | Duration [s] |
+| --- | --- | --- | --- | --- | --- | --- | --- |
+| {images} | {encoded} | {cached} | {failed} | {original_mb:.2f} | {optimized_mb:.2f} | {saved:.0%} | {duration:.2f} |
+"""
+
+
+def get_variant_format(image_path: Path, input_args: argparse.Namespace) -> str:
+    # Photos would only grow as lossless png, JPEGs keep their format (and file name) unless WebP is requested
+    if input_args.format == FORMAT_PNG and image_path.suffix.lower() in JPEG_SUFFIXES:
+        return FORMAT_JPEG
+    return input_args.format
+
+
+def get_variant_suffix(image_path: Path, input_args: argparse.Namespace) -> str:
+    if get_variant_format(image_path=image_path, input_args=input_args) == FORMAT_JPEG:
+        return image_path.suffix
+    return f".{input_args.format}"
+
+
+def get_variant_hash(content: bytes, image_format: str, input_args: argparse.Namespace) -> str:
+    # Identical images optimized with identical parameters always produce the same variant
+    digest = hashlib.sha256(
+        f"{image_format}:{input_args.max_dimension}:{input_args.max_kb}:{input_args.quality}:{input_args.quantize}:".encode("utf-8")
+    )
+    digest.update(content)
+    return digest.hexdigest()
+
+
+def encode_image(image: Image.Image, image_format: str, quality: int, quantize: bool) -> bytes:
+    output: io.BytesIO = io.BytesIO()
+    if image_format == FORMAT_WEBP:
+        image.save(output, format="WEBP", quality=quality, method=6)
+    elif image_format == FORMAT_JPEG:
+        image.convert("RGB").save(output, format="JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        # PNGs stay lossless unless reducing the colors to a palette is requested
+        if quantize and image.mode != "P":
+            image = image.quantize(colors=256, method=Image.Quantize.FASTOCTREE if image.mode == "RGBA" else Image.Quantize.MEDIANCUT)
+        image.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+
+def optimize_content(content: bytes, image_format: str, input_args: argparse.Namespace) -> bytes:
+    with Image.open(io.BytesIO(content)) as opened:
+        # Photos are often stored sideways with an EXIF orientation, which is dropped with the rest of the metadata
+        image: Image.Image = ImageOps.exif_transpose(opened)
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+    image.thumbnail((input_args.max_dimension, input_args.max_dimension), Image.Resampling.LANCZOS)
+    max_bytes: int = input_args.max_kb * 1024
+    quality: int = input_args.quality
+    while True:
+        encoded: bytes = encode_image(image=image, image_format=image_format, quality=quality, quantize=input_args.quantize)
+        if len(encoded) <= max_bytes or max(image.size) <= MIN_DIMENSION:
+            return encoded
+        if image_format != FORMAT_PNG and quality > MIN_QUALITY:
+            quality = max(MIN_QUALITY, quality - QUALITY_STEP)
+            continue
+        image = image.resize(
+            (max(1, int(image.width * DOWNSCALE_FACTOR)), max(1, int(image.height * DOWNSCALE_FACTOR))), Image.Resampling.LANCZOS
+        )
+
+
+def optimize_image(input_args: argparse.Namespace, image_path: Path, variant_path: Path) -> Tuple[str, int, int]:
+    # Returns how the variant was produced ("encoded", "cached" or "failed") and the original and optimized size
+    content: bytes = image_path.read_bytes()
+    image_format: str = get_variant_format(image_path=image_path, input_args=input_args)
+    variant_hash: str = get_variant_hash(content=content, image_format=image_format, input_args=input_args)
+    # Variants which ended up as the original are cached with the suffix of the original
+    cache_path: Optional[Path] = Path(input_args.cache_dir, variant_hash[:2]) if input_args.cache_dir is not None else None
+    cached_variant_path: Optional[Path] = next(cache_path.glob(f"{variant_hash}.*"), None) if cache_path is not None else None
+    variant_path.parent.mkdir(parents=True, exist_ok=True)
+    if cached_variant_path is not None:
+        logger.info(f"Using cached variant of {image_path.as_posix()}")
+        shutil.copyfile(cached_variant_path, variant_path.with_suffix(cached_variant_path.suffix))
+        return "cached", len(content), cached_variant_path.stat().st_size
+
+    try:
+        optimized: bytes = optimize_content(content=content, image_format=image_format, input_args=input_args)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.error(f"Unable to optimize {image_path.as_posix()}", exc_info=e)
+        # The original is uploaded instead, with its own extension
+        logger.warning(f"Uploading the original of {image_path.as_posix()} instead")
+        shutil.copyfile(image_path, variant_path.with_suffix(image_path.suffix))
+        return "failed", len(content), 0
+    # Never make an image bigger than it was, the original is uploaded with its own extension instead
+    if len(optimized) >= len(content):
+        optimized = content
+        variant_path = variant_path.with_suffix(image_path.suffix)
+    variant_path.write_bytes(optimized)
+    if cache_path is not None:
+        cache_path.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(variant_path, Path(cache_path, variant_hash + variant_path.suffix))
+    logger.info(f"Optimized {image_path.as_posix()} from {len(content)} to {len(optimized)} bytes")
+    return "encoded", len(content), len(optimized)
+
+
+def collect_images(input_args: argparse.Namespace) -> List[Tuple[Path, Path]]:
+    # Pairs of source image and variant path, the directory structure below the input directory is kept
+    output_path: Path = Path(input_args.output_dir)
+    sources: List[Tuple[Path, Path]] = []
+    if input_args.input_dir is not None:
+        input_path: Path = Path(input_args.input_dir)
+        images: List[Path] = sorted(set(itertools.chain.from_iterable(input_path.glob(pattern) for pattern in IMAGE_PATTERNS)))
+        sources.extend((image, Path(output_path, image.relative_to(input_path))) for image in images)
+    if input_args.metadata_dir is not None:
+        # Mod images are only listed in the metadata files, next to which they are stored
+        from metadata_index import load_metadata_index
+
+        metadata_path: Path = Path(input_args.metadata_dir).resolve()
+        resolved_output_path: Path = output_path.resolve()
+        for mod in load_metadata_index(root=metadata_path, jobs=input_args.jobs):
+            for image in mod.images:
+                image_path: Path = Path(metadata_path, mod.mod_dir, image).resolve()
+                variant_path: Path = Path(resolved_output_path, mod.mod_dir, image).resolve()
+                # The metadata files are part of the PR, references must not leave the metadata or the output directory
+                if not image_path.is_relative_to(metadata_path) or not variant_path.is_relative_to(resolved_output_path):
+                    logger.warning(f"Image {image} of {mod.mod_dir} is outside of the mod directories, skipping it")
+                elif image_path.exists():
+                    sources.append((image_path, variant_path))
+                else:
+                    logger.warning(f"Image {image} of {mod.mod_dir} does not exist")
+    # Images which only differ in their extension (e.g. photo.jpg and photo.png) map to the same variant
+    variants: Dict[Path, Path] = {}
+    for image, variant in sources:
+        variant = variant.with_suffix(get_variant_suffix(image_path=image, input_args=input_args))
+        if variant in variants:
+            logger.warning(f"{image.as_posix()} and {variants[variant].as_posix()} have the same variant, skipping the former")
+            continue
+        variants[variant] = image
+    return [(image, variant) for variant, image in variants.items()]
+
+
+def main(args: argparse.Namespace):
+    if args.verbose:
+        logger.setLevel("INFO")
+
+    if args.input_dir is None and args.metadata_dir is None:
+        logger.error("Either --input_dir or --metadata_dir is required")
+        sys.exit(255)
+
+    images: List[Tuple[Path, Path]] = collect_images(input_args=args)
+    start_time: float = time.perf_counter()
+    optimize = functools.partial(optimize_image, args)
+    if len(images) < PARALLEL_THRESHOLD or args.jobs == 1:
+        results: List[Tuple[str, int, int]] = [optimize(image, variant) for image, variant in images]
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(optimize, *zip(*images)))
+    duration: float = time.perf_counter() - start_time
+
+    counts: Dict[str, int] = {outcome: sum(1 for result in results if result[0] == outcome) for outcome in ["encoded", "cached", "failed"]}
+    original_bytes: int = sum(result[1] for result in results if result[0] != "failed")
+    optimized_bytes: int = sum(result[2] for result in results if result[0] != "failed")
+    logger.info(f"Optimized {len(images)} images in {duration:.2f}s: {counts}, {original_bytes} -> {optimized_bytes} bytes")
+    summary: str = OPTIMIZE_SUMMARY.format(
+        images=len(images),
+        encoded=counts["encoded"],
+        cached=counts["cached"],
+        failed=counts["failed"],
+        original_mb=original_bytes / 1024 / 1024,
+        optimized_mb=optimized_bytes / 1024 / 1024,
+        saved=1 - optimized_bytes / original_bytes if original_bytes > 0 else 0.0,
+        duration=duration,
+    )
+    logger.info(summary)
+    if args.github_step_summary:
+        with open(os.environ["GITHUB_STEP_SUMMARY"], "a", encoding="utf-8") as gh_step_summary:
+            gh_step_summary.write(summary)
+
+    if counts["failed"] > 0 and args.fail_on_error:
+        sys.exit(255)
+
+
+if __name__ == "__main__":
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog="VoronDesign image optimizer",
+        description="This tool resizes and re-encodes images into size-bounded variants, which are uploaded instead of the originals",
+    )
+    parser.add_argument(
+        "-i",
+        "--input_dir",
+        required=False,
+        action="store",
+        type=str,
+        help="Directory containing images to be optimized, e.g. the thumbnails of the rotation checker",
+    )
+    parser.add_argument(
+        "--metadata_dir",
+        required=False,
+        action="store",
+        type=str,
+        help="Directory containing mods, the images listed in their metadata files are optimized as well",
+    )
+    parser.add_argument(
+        "-o",
+        "--output_dir",
+        required=True,
+        action="store",
+        type=str,
+        help="Directory to store the optimized variants into, keeping the directory structure",
+    )
+    parser.add_argument(
+        "--format",
+        required=False,
+        action="store",
+        type=str,
+        choices=[FORMAT_PNG, FORMAT_WEBP],
+        default=FORMAT_PNG,
+        help="Format of the variants, the thumbnail urls of the rotation checker point to png images. "
+        "With png, JPEG photos are kept as JPEG.",
+    )
+    parser.add_argument(
+        "--max_dimension",
+        required=False,
+        action="store",
+        type=int,
+        default=1600,
+        help="Maximum width and height of the variants in pixels",
+    )
+    parser.add_argument(
+        "--max_kb",
+        required=False,
+        action="store",
+        type=int,
+        default=300,
+        help="Size bound of the variants, the quality and then the dimensions are reduced until a variant fits",
+    )
+    parser.add_argument(
+        "--quality",
+        required=False,
+        action="store",
+        type=int,
+        default=80,
+        help="Initial WebP and JPEG quality, png variants are lossless",
+    )
+    parser.add_argument(
+        "--quantize",
+        required=False,
+        action="store_true",
+        help="Reduce png variants to a palette of 256 colors, which is lossy but much smaller",
+    )
+    parser.add_argument(
+        "-c",
+        "--cache_dir",
+        required=False,
+        action="store",
+        type=str,
+        help="Directory to cache variants in, keyed by image content hash and optimization parameters",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        required=False,
+        action="store",
+        type=int,
+        default=1,
+        help="Number of worker processes used to optimize images in parallel",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        required=False,
+        action="store_true",
+        help="Print debug output to stdout",
+    )
+    parser.add_argument(
+        "-f",
+        "--fail_on_error",
+        required=False,
+        action="store_true",
+        help="Whether to return an error exit code if one of the images can not be optimized",
+    )
+    parser.add_argument(
+        "-g",
+        "--github_step_summary",
+        required=False,
+        action="store_true",
+        help="Whether to output a step summary when running inside a github action",
+    )
+    args: argparse.Namespace = parser.parse_args()
+    main(args=args)
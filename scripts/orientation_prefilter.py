@@ -0,0 +1,58 @@
+import logging
+from typing import Dict, Tuple
+
+import numpy as np
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+# Facets whose normal is within this angle of -Z are considered to be lying on the print bed
+BOTTOM_ANGLE_TOLERANCE_DEG: float = 1.0
+# Downward facing facets steeper than this angle (measured from the vertical) need support
+OVERHANG_ANGLE_DEG: float = 45.0
+# Resolution of the normal direction histogram, normals are rounded to 1/NORMAL_BINS
+NORMAL_BINS: int = 20
+# Distance to the lowest point below which a vertex is considered to touch the print bed, in mm
+BED_CONTACT_TOLERANCE: float = 0.01
+
+
+def orientation_metrics(mesh: np.ndarray) -> Dict[str, float]:
+    facets: np.ndarray = np.asarray(mesh, dtype=np.float64).reshape(-1, 3, 3)
+    cross: np.ndarray = np.cross(facets[:, 1] - facets[:, 0], facets[:, 2] - facets[:, 0])
+    double_areas: np.ndarray = np.linalg.norm(cross, axis=1)
+    valid: np.ndarray = double_areas > 0
+    facets, cross, areas = facets[valid], cross[valid], double_areas[valid] / 2
+    if len(facets) == 0:
+        return {"total_area": 0.0, "contact_area": 0.0, "largest_face_area": 0.0, "overhang_area": 0.0}
+    normals: np.ndarray = cross / (2 * areas[:, None])
+
+    # Area touching the print bed in the current orientation
+    min_z: float = float(facets[:, :, 2].min())
+    on_bed: np.ndarray = (normals[:, 2] <= -np.cos(np.radians(BOTTOM_ANGLE_TOLERANCE_DEG))) & (
+        facets[:, :, 2].max(axis=1) - min_z <= BED_CONTACT_TOLERANCE
+    )
+
+    # Downward facing area which is not supported by the print bed
+    overhanging: np.ndarray = (normals[:, 2] < -np.cos(np.radians(OVERHANG_ANGLE_DEG))) & ~on_bed
+
+    # Area-weighted histogram over normal directions, its largest bin approximates the largest flat face
+    _, direction_ids = np.unique(np.round(normals * NORMAL_BINS).astype(np.int64), axis=0, return_inverse=True)
+    direction_areas: np.ndarray = np.bincount(direction_ids.ravel(), weights=areas)
+
+    return {
+        "total_area": float(areas.sum()),
+        "contact_area": float(areas[on_bed].sum()),
+        "largest_face_area": float(direction_areas.max()),
+        "overhang_area": float(areas[overhanging].sum()),
+    }
+
+
+def is_obviously_well_oriented(mesh: np.ndarray, min_contact_ratio: float, max_overhang_ratio: float) -> Tuple[bool, Dict[str, float]]:
+    # True if the mesh already lies on (roughly) its largest flat face without noteworthy overhangs.
+    # Anything else is left to the full Tweak analysis.
+    metrics: Dict[str, float] = orientation_metrics(mesh)
+    if metrics["total_area"] == 0 or metrics["largest_face_area"] == 0:
+        return False, metrics
+    metrics["contact_ratio"] = metrics["contact_area"] / metrics["largest_face_area"]
+    metrics["overhang_ratio"] = metrics["overhang_area"] / metrics["total_area"]
+    return metrics["contact_ratio"] >= min_contact_ratio and metrics["overhang_ratio"] <= max_overhang_ratio, metrics
@@ -6,8 +6,6 @@ import sys
 
 from pathlib import Path
 
-import requests
-
 logging.basicConfig()
 logger = logging.getLogger(__name__)
 
@@ -86,7 +84,7 @@ def main(args: argparse.Namespace):
             print(f'labels-to-set={",".join(labels)}', file=fh)
             print(f'pr-number={pr_number}', file=fh)
 
-    except (requests.RequestException, KeyError, ValueError, IOError) as e:
+    except (KeyError, ValueError, IOError) as e:
         logger.error("An Error occurred while generating the PR comment", exc_info=e)
 
 
@@ -0,0 +1,145 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE: int = 1024 * 1024
+CACHE_FILE_SUFFIX: str = ".json"
+
+
+def file_content_hash(file_path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    # Entries are stored as one small json file per key, sharded by the first two hex digits.
+    # The key combines the content hash with a namespace (which checker) and the tool version,
+    # so upgrading admesh/tweaker3 automatically invalidates all previous results.
+    def __init__(self, cache_dir: Path, namespace: str, tool_version: str):
+        self.cache_dir: Path = Path(cache_dir)
+        self.namespace: str = namespace
+        self.tool_version: str = tool_version
+
+    def _entry_path(self, content_hash: str) -> Path:
+        key: str = hashlib.sha256(f"{self.namespace}:{self.tool_version}:{content_hash}".encode("utf-8")).hexdigest()
+        return Path(self.cache_dir, key[:2], key + CACHE_FILE_SUFFIX)
+
+    def get(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        entry_path: Path = self._entry_path(content_hash)
+        try:
+            with open(entry_path, "r", encoding="utf-8") as f:
+                entry: Dict[str, Any] = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Refresh the mtime so that pruning evicts the least recently used entries first
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return entry
+
+    def put(self, content_hash: str, entry: Dict[str, Any]):
+        entry_path: Path = self._entry_path(content_hash)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first, so concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=entry_path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            logger.warning(f"Unable to write cache entry {entry_path}", exc_info=e)
+            Path(tmp_path).unlink(missing_ok=True)
+
+
+def prune_cache(
+    cache_dir: Path, max_size_bytes: Optional[int] = None, max_age_days: Optional[float] = None, suffix: str = CACHE_FILE_SUFFIX
+) -> Tuple[int, int]:
+    # Any directory of files sharded like the result cache can be pruned, e.g. the binary STL sidecars
+    entries: List[Tuple[float, int, Path]] = []
+    for entry_path in Path(cache_dir).glob(f"*/*{suffix}"):
+        try:
+            stat_result: os.stat_result = entry_path.stat()
+        except OSError:
+            continue
+        entries.append((stat_result.st_mtime, stat_result.st_size, entry_path))
+    # Oldest (least recently used) entries first
+    entries.sort()
+
+    removed_entries: int = 0
+    removed_bytes: int = 0
+    total_size: int = sum(size for _, size, _ in entries)
+    age_cutoff: float = time.time() - max_age_days * 86400 if max_age_days is not None else float("-inf")
+    for mtime, size, entry_path in entries:
+        too_old: bool = mtime < age_cutoff
+        too_big: bool = max_size_bytes is not None and total_size > max_size_bytes
+        if not (too_old or too_big):
+            continue
+        try:
+            entry_path.unlink()
+        except OSError:
+            continue
+        total_size -= size
+        removed_entries += 1
+        removed_bytes += size
+    logger.info(f"Pruned {removed_entries} cache entries ({removed_bytes} bytes) from {cache_dir}")
+    return removed_entries, removed_bytes
+
+
+def main(args: argparse.Namespace):
+    if args.verbose:
+        logger.setLevel("INFO")
+    max_size_bytes: Optional[int] = int(args.max_size_mb * 1024 * 1024) if args.max_size_mb is not None else None
+    prune_cache(cache_dir=Path(args.cache_dir), max_size_bytes=max_size_bytes, max_age_days=args.max_age_days)
+
+
+if __name__ == "__main__":
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog="VoronDesign result cache pruner",
+        description="This tool can be used to prune or size-limit a checker result cache directory",
+    )
+    parser.add_argument(
+        "-c",
+        "--cache_dir",
+        required=True,
+        action="store",
+        type=str,
+        help="Cache directory to prune",
+    )
+    parser.add_argument(
+        "-s",
+        "--max_size_mb",
+        required=False,
+        action="store",
+        type=float,
+        help="Evict least recently used entries until the cache is smaller than this size",
+    )
+    parser.add_argument(
+        "-a",
+        "--max_age_days",
+        required=False,
+        action="store",
+        type=float,
+        help="Evict entries which have not been used for this many days",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        required=False,
+        action="store_true",
+        help="Print debug output to stdout",
+    )
+    args: argparse.Namespace = parser.parse_args()
+    main(args=args)
@@ -0,0 +1,50 @@
+import logging
+
+import numpy as np
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+# The grid is refined until the decimated mesh fits into max_facets, this bounds the number of attempts
+MAX_ITERATIONS = 8
+
+
+def cluster_vertices(mesh: np.ndarray, cells_per_axis: int) -> np.ndarray:
+    # Snaps every vertex to the mean of all vertices in its grid cell, returns the decimated facets (facets, 3, 3)
+    vertices: np.ndarray = mesh.reshape(-1, 3)
+    minimum: np.ndarray = vertices.min(axis=0)
+    cell_size: float = float((vertices.max(axis=0) - minimum).max()) / cells_per_axis or 1.0
+    cells: np.ndarray = np.minimum(((vertices - minimum) / cell_size).astype(np.int64), cells_per_axis - 1)
+    cell_keys: np.ndarray = (cells[:, 0] * cells_per_axis + cells[:, 1]) * cells_per_axis + cells[:, 2]
+    _, cluster_ids = np.unique(cell_keys, return_inverse=True)
+    cluster_ids = cluster_ids.ravel()
+    cluster_sizes: np.ndarray = np.bincount(cluster_ids)
+    representatives: np.ndarray = np.stack(
+        [np.bincount(cluster_ids, weights=vertices[:, axis]) / cluster_sizes for axis in range(3)], axis=1
+    )
+
+    # Facets collapsed into an edge or a point disappear, facets collapsed onto the same cells are kept once
+    triangles: np.ndarray = cluster_ids.reshape(-1, 3)
+    valid: np.ndarray = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & (triangles[:, 2] != triangles[:, 0])
+    triangles = triangles[valid]
+    _, unique_indices = np.unique(np.sort(triangles, axis=1), axis=0, return_index=True)
+    return representatives[triangles[np.sort(unique_indices)]]
+
+
+def decimate_mesh(mesh: np.ndarray, max_facets: int) -> np.ndarray:
+    # Vertex clustering decimation of a mesh given as vertices (3 * facets, 3), returned in the same layout.
+    # Meshes with at most max_facets facets are returned unchanged.
+    mesh = np.asarray(mesh, dtype=np.float64).reshape(-1, 3)
+    facet_count: int = len(mesh) // 3
+    if facet_count <= max_facets:
+        return mesh
+    # A closed surface on an n^3 grid touches roughly n^2 cells, with about two facets per cell
+    cells_per_axis: int = max(2, int(np.sqrt(max_facets / 2)))
+    decimated: np.ndarray = cluster_vertices(mesh, cells_per_axis)
+    for _ in range(MAX_ITERATIONS):
+        if len(decimated) <= max_facets:
+            break
+        cells_per_axis = max(2, int(cells_per_axis * np.sqrt(max_facets / len(decimated)) * 0.95))
+        decimated = cluster_vertices(mesh, cells_per_axis)
+    logger.info(f"Decimated mesh from {facet_count} to {len(decimated)} facets on a {cells_per_axis}^3 grid")
+    return decimated.reshape(-1, 3)
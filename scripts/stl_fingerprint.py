@@ -0,0 +1,197 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from result_cache import ResultCache, file_content_hash
+from stl_mesh import PRESCREEN_KEYS, prescreen_facets
+from stl_sidecar import load_stl
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+# Version 2 fingerprints ASCII STLs, which version 1 recorded without a fingerprint
+GEOMETRY_INDEX_VERSION = 2
+# Invariants are compared relative to the size of the mesh, rounded to this many decimals.
+# Values which happen to lie on a rounding boundary can still differ, which only costs a regular check.
+FINGERPRINT_DECIMALS = 4
+POSE_DECIMALS = 3
+PARALLEL_CHUNKSIZE = 16
+# Entries of STLs which were not part of any run for this long (e.g. deleted or renamed files) are dropped on save
+INDEX_ENTRY_MAX_AGE_DAYS = 90
+
+STEP_SUMMARY_DUPLICATES_PREAMBLE = """
+### Geometrically identical STLs
+
+The following STLs have the same geometry (possibly moved or rotated) as other STLs recorded in the geometry index:
+
+"""
+
+
+def surface_moments(points: np.ndarray, areas: np.ndarray, axes: np.ndarray) -> np.ndarray:
+    # Third moment of the surface along each axis, the integral of u^3 over a triangle with linear u
+    # is area / 10 * (sum of all monomials of degree 3 in the vertex values)
+    projected: np.ndarray = points @ axes
+    u0, u1, u2 = projected[:, 0], projected[:, 1], projected[:, 2]
+    monomials: np.ndarray = u0**3 + u1**3 + u2**3 + u0**2 * (u1 + u2) + u1**2 * (u0 + u2) + u2**2 * (u0 + u1) + u0 * u1 * u2
+    return (areas[:, None] * monomials).sum(axis=0) / (10 * areas.sum())
+
+
+def geometry_fingerprint(facets: np.ndarray) -> Optional[Tuple[str, str]]:
+    # Returns the fingerprint of the shape, which is invariant to facet order, translation and rotation, and the pose,
+    # the up direction in the frame of the shape, which is additionally invariant to rotations around Z.
+    # Meshes without any area have no fingerprint.
+    vertices: np.ndarray = np.asarray(facets["vertices"], dtype=np.float64)
+    areas: np.ndarray = np.linalg.norm(np.cross(vertices[:, 1] - vertices[:, 0], vertices[:, 2] - vertices[:, 0]), axis=1) / 2
+    total_area: float = float(areas.sum())
+    if total_area == 0:
+        return None
+
+    centroid: np.ndarray = (areas[:, None] * vertices.mean(axis=1)).sum(axis=0) / total_area
+    points: np.ndarray = vertices - centroid
+    # Second moment of the surface, the integral of x x^T over a triangle is area / 12 * (sum p p^T + s s^T)
+    sums: np.ndarray = points.sum(axis=1)
+    second_moment: np.ndarray = (
+        np.einsum("i,ikj,ikl->jl", areas, points, points) + np.einsum("i,ij,il->jl", areas, sums, sums)
+    ) / (12 * total_area)
+    eigenvalues, axes = np.linalg.eigh(second_moment)
+    eigenvalues, axes = eigenvalues[::-1], axes[:, ::-1].copy()
+
+    # The principal axes are only defined up to their sign: the first two point towards the heavier side of the
+    # surface, the third completes a right-handed frame. Its third moment then tells mirrored shapes apart.
+    # Shapes with (nearly) equal principal moments have no stable frame and usually get different fingerprints.
+    signs: np.ndarray = np.where(surface_moments(points, areas, axes[:, :2]) < 0, -1.0, 1.0)
+    axes[:, :2] *= signs
+    axes[:, 2] = np.cross(axes[:, 0], axes[:, 1])
+    third_moments: np.ndarray = surface_moments(points, areas, axes)
+
+    scale: float = float(np.sqrt(eigenvalues.sum()))
+    volume: float = float(np.einsum("ij,ij->i", points[:, 0], np.cross(points[:, 1], points[:, 2])).sum()) / 6
+    invariants: np.ndarray = np.concatenate(
+        ([total_area / scale**2, volume / scale**3], eigenvalues / scale**2, third_moments / scale**3)
+    )
+    # Geometrically identical meshes with different defects must not share their results
+    topology: Dict[str, int] = prescreen_facets(facets)
+    fingerprint_values: List[Any] = (
+        [len(facets), float(f"{scale:.{FINGERPRINT_DECIMALS}g}")]
+        + [topology[key] for key in PRESCREEN_KEYS]
+        # Adding 0.0 folds -0.0 into 0.0
+        + (np.round(invariants, FINGERPRINT_DECIMALS) + 0.0).tolist()
+    )
+    fingerprint: str = hashlib.sha256(json.dumps(fingerprint_values).encode("utf-8")).hexdigest()
+    pose: str = hashlib.sha256(json.dumps((np.round(axes[2], POSE_DECIMALS) + 0.0).tolist()).encode("utf-8")).hexdigest()
+    return fingerprint, pose
+
+
+def fingerprint_stl(stl_file: Path, content_hash: Optional[str] = None, sidecar_dir: Optional[str] = None) -> Optional[Tuple[str, str]]:
+    # ASCII STLs are loaded through their binary sidecar, which the checks reuse afterwards
+    facets: Optional[np.ndarray] = load_stl(stl_file=stl_file, sidecar_dir=sidecar_dir, content_hash=content_hash)
+    if facets is None or len(facets) == 0:
+        return None
+    return geometry_fingerprint(facets)
+
+
+class GeometryIndex:
+    # Repository wide record of the content hash, fingerprint and pose of every STL checked so far, keyed by the path
+    # relative to the input directory. Entries of files outside of the current run (e.g. in a sparse checkout or with
+    # --since) are kept, so duplicates are found across runs, until they were not seen for INDEX_ENTRY_MAX_AGE_DAYS.
+    def __init__(self, index_file: Path, input_path: Path):
+        self.index_file: Path = index_file
+        self.input_path: Path = input_path
+        self.files: Dict[str, Dict[str, Any]] = {}
+        # Fingerprint -> paths, built on first use and dropped whenever the files change
+        self._paths_by_fingerprint: Optional[Dict[str, List[str]]] = None
+        if index_file.exists():
+            with open(index_file, "r", encoding="utf-8") as f:
+                index: Dict[str, Any] = json.load(f)
+            if index.get("version") == GEOMETRY_INDEX_VERSION:
+                self.files = index["files"]
+                # Entries written before they were dated count as seen now
+                for entry in self.files.values():
+                    entry.setdefault("last_seen", time.time())
+            else:
+                logger.info(f"Ignoring geometry index {index_file} with outdated format")
+
+    def _key(self, stl: Path) -> str:
+        return stl.relative_to(self.input_path).as_posix()
+
+    def update(self, stls: List[Path], jobs: Optional[int] = None, sidecar_dir: Optional[str] = None) -> Dict[Path, str]:
+        # Only STLs whose content changed since they were indexed are fingerprinted again.
+        # Returns the content hash of every STL, so the checks do not have to hash them again.
+        content_hashes: Dict[Path, str] = {stl: file_content_hash(stl) for stl in stls}
+        changed: List[Path] = [stl for stl in stls if self.files.get(self._key(stl), {}).get("content_hash") != content_hashes[stl]]
+        fingerprint_file = functools.partial(fingerprint_stl, sidecar_dir=sidecar_dir)
+        changed_hashes: List[str] = [content_hashes[stl] for stl in changed]
+        if jobs is not None and jobs > 1 and len(changed) > PARALLEL_CHUNKSIZE:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                geometries: List[Optional[Tuple[str, str]]] = list(pool.map(fingerprint_file, changed, changed_hashes, chunksize=PARALLEL_CHUNKSIZE))
+        else:
+            geometries = [fingerprint_file(stl, content_hash) for stl, content_hash in zip(changed, changed_hashes)]
+        for stl, geometry in zip(changed, geometries):
+            fingerprint, pose = geometry if geometry is not None else (None, None)
+            self.files[self._key(stl)] = {"content_hash": content_hashes[stl], "fingerprint": fingerprint, "pose": pose}
+        now: float = time.time()
+        for stl in stls:
+            self.files[self._key(stl)]["last_seen"] = now
+        self._paths_by_fingerprint = None
+        logger.info(f"Fingerprinted {len(changed)} new or changed STLs, {len(stls) - len(changed)} were up to date")
+        return content_hashes
+
+    def find_twins(self, stl: Path, same_pose: bool = False) -> List[str]:
+        entry: Dict[str, Any] = self.files[self._key(stl)]
+        if entry["fingerprint"] is None:
+            return []
+        if self._paths_by_fingerprint is None:
+            self._paths_by_fingerprint = {}
+            for path, other in self.files.items():
+                if other["fingerprint"] is not None:
+                    self._paths_by_fingerprint.setdefault(other["fingerprint"], []).append(path)
+        return [
+            path
+            for path in self._paths_by_fingerprint[entry["fingerprint"]]
+            if path != self._key(stl) and (not same_pose or self.files[path]["pose"] == entry["pose"])
+        ]
+
+    def lookup_twin_result(self, stl: Path, result_cache: ResultCache, same_pose: bool = False) -> Optional[Tuple[str, Dict[str, Any]]]:
+        # Cached result of a geometrically identical STL and its path. The result is not stored under the own content hash,
+        # the cache only ever holds results of STLs which were actually checked.
+        content_hash: str = self.files[self._key(stl)]["content_hash"]
+        if result_cache.get(content_hash) is not None:
+            return None
+        for twin in self.find_twins(stl=stl, same_pose=same_pose):
+            twin_hash: str = self.files[twin]["content_hash"]
+            cached_result: Optional[Dict[str, Any]] = result_cache.get(twin_hash) if twin_hash != content_hash else None
+            if cached_result is not None:
+                return twin, cached_result
+        return None
+
+    def make_duplicate_summary(self, stls: List[Path]) -> str:
+        duplicates: List[str] = []
+        for stl in stls:
+            twins: List[str] = self.find_twins(stl=stl)
+            if len(twins) > 0:
+                duplicates.append(f"- {self._key(stl)}: {', '.join(sorted(twins))}\n")
+        if len(duplicates) == 0:
+            return ""
+        return STEP_SUMMARY_DUPLICATES_PREAMBLE + "".join(duplicates)
+
+    def save(self):
+        expired_before: float = time.time() - INDEX_ENTRY_MAX_AGE_DAYS * 24 * 60 * 60
+        expired: List[str] = [path for path, entry in self.files.items() if entry["last_seen"] < expired_before]
+        for path in expired:
+            del self.files[path]
+        if len(expired) > 0:
+            logger.info(f"Dropped {len(expired)} geometry index entries which were not seen for {INDEX_ENTRY_MAX_AGE_DAYS} days")
+            self._paths_by_fingerprint = None
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        temporary_file: Path = self.index_file.with_name(self.index_file.name + ".tmp")
+        with open(temporary_file, "w", encoding="utf-8") as f:
+            json.dump({"version": GEOMETRY_INDEX_VERSION, "files": self.files}, f)
+        os.replace(temporary_file, self.index_file)
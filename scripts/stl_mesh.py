@@ -0,0 +1,227 @@
+import logging
+import struct
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+STL_HEADER_SIZE: int = 80
+STL_FACET_COUNT_SIZE: int = 4
+STL_FACET_DTYPE: np.dtype = np.dtype(
+    [
+        ("normal", "<f4", (3,)),
+        ("vertices", "<f4", (3, 3)),
+        ("attributes", "<u2"),
+    ]
+)
+
+# Larger ASCII STLs are never parsed in memory, they are converted to a binary STL in chunks.
+# The tokens of a chunk take up about 16 times its size.
+ASCII_STREAMING_THRESHOLD: int = 100 * 1024 * 1024
+ASCII_CHUNK_SIZE: int = 4 * 1024 * 1024
+# Token layout of a single facet, None marks the numbers
+ASCII_FACET_TOKENS: List[Optional[bytes]] = (
+    [b"facet", b"normal", None, None, None, b"outer", b"loop"] + [b"vertex", None, None, None] * 3 + [b"endloop", b"endfacet"]
+)
+ASCII_KEYWORD_COLUMNS: List[int] = [i for i, token in enumerate(ASCII_FACET_TOKENS) if token is not None]
+ASCII_VALUE_COLUMNS: List[int] = [i for i, token in enumerate(ASCII_FACET_TOKENS) if token is None]
+ASCII_KEYWORDS: np.ndarray = np.array([token for token in ASCII_FACET_TOKENS if token is not None])
+# The null bytes make sure no reader mistakes the converted file for an ASCII STL
+BINARY_STL_HEADER: bytes = b"VoronDesign binary STL".ljust(STL_HEADER_SIZE, b"\0")
+
+PRESCREEN_KEYS = [
+    "degenerate_facets",
+    "unmatched_edges",
+    "backwards_edges",
+    "inconsistent_normals",
+    "inverted_volume",
+]
+
+
+def load_binary_stl(stl_file: Path) -> Optional[np.ndarray]:
+    # Returns None for anything that is not a well-formed binary STL (e.g. ASCII STLs)
+    file_size: int = stl_file.stat().st_size
+    data_offset: int = STL_HEADER_SIZE + STL_FACET_COUNT_SIZE
+    if file_size < data_offset:
+        return None
+    with open(stl_file, "rb") as f:
+        f.seek(STL_HEADER_SIZE)
+        facet_count: int = struct.unpack("<I", f.read(STL_FACET_COUNT_SIZE))[0]
+    if file_size != data_offset + facet_count * STL_FACET_DTYPE.itemsize:
+        return None
+    if facet_count == 0:
+        return np.zeros(0, dtype=STL_FACET_DTYPE)
+    return np.memmap(stl_file, dtype=STL_FACET_DTYPE, mode="r", offset=data_offset, shape=(facet_count,))
+
+
+def parse_binary_stl(raw_content: bytes) -> Optional[np.ndarray]:
+    # In-memory counterpart of load_binary_stl, for callers which read the file content anyway
+    data_offset: int = STL_HEADER_SIZE + STL_FACET_COUNT_SIZE
+    if len(raw_content) < data_offset:
+        return None
+    facet_count: int = struct.unpack_from("<I", raw_content, STL_HEADER_SIZE)[0]
+    if len(raw_content) != data_offset + facet_count * STL_FACET_DTYPE.itemsize:
+        return None
+    return np.frombuffer(raw_content, dtype=STL_FACET_DTYPE, count=facet_count, offset=data_offset)
+
+
+def is_ascii_stl(stl_file: Path) -> bool:
+    # Binary STLs may start with "solid" as well, so only files which are no valid binary STL count
+    with open(stl_file, "rb") as f:
+        starts_with_solid: bool = f.read(STL_HEADER_SIZE).lstrip().lower().startswith(b"solid")
+    return starts_with_solid and load_binary_stl(stl_file) is None
+
+
+def parse_ascii_facets(content: bytes) -> Optional[np.ndarray]:
+    # Parses complete "facet ... endfacet" blocks, without the "solid" and "endsolid" lines. Every facet is
+    # exactly ASCII_FACET_TOKENS long, so the tokens of the whole content form a single 2D array.
+    tokens: np.ndarray = np.array(content.lower().split())
+    if len(tokens) % len(ASCII_FACET_TOKENS) != 0:
+        return None
+    tokens = tokens.reshape(-1, len(ASCII_FACET_TOKENS))
+    if not np.array_equal(tokens[:, ASCII_KEYWORD_COLUMNS], np.broadcast_to(ASCII_KEYWORDS, (len(tokens), len(ASCII_KEYWORDS)))):
+        return None
+    try:
+        values: np.ndarray = tokens[:, ASCII_VALUE_COLUMNS].astype(np.float32)
+    except ValueError:
+        return None
+    facets: np.ndarray = np.zeros(len(tokens), dtype=STL_FACET_DTYPE)
+    facets["normal"] = values[:, :3]
+    facets["vertices"] = values[:, 3:].reshape(-1, 3, 3)
+    return facets
+
+
+def split_ascii_header(raw_content: bytes) -> Optional[bytes]:
+    # Content after the "solid <name>" line, None if the content does not start like an ASCII STL
+    if not raw_content[:STL_HEADER_SIZE].lstrip().lower().startswith(b"solid"):
+        return None
+    header_end: int = raw_content.find(b"\n")
+    return raw_content[header_end + 1 :] if header_end >= 0 else None
+
+
+def split_ascii_facets(body: bytes) -> Tuple[bytes, bytes]:
+    # Splits into the complete facets and the incomplete rest
+    facets_end: int = body.lower().rfind(b"endfacet")
+    if facets_end < 0:
+        return b"", body
+    facets_end += len(b"endfacet")
+    return body[:facets_end], body[facets_end:]
+
+
+def is_ascii_stl_end(tail: bytes) -> bool:
+    # Only the "endsolid <name>" line may follow the last facet, anything else could be another solid
+    lines: List[bytes] = tail.strip().splitlines()
+    return len(lines) == 1 and lines[0].lower().startswith(b"endsolid")
+
+
+def parse_ascii_stl(raw_content: bytes) -> Optional[np.ndarray]:
+    # Returns None for anything that is not a well-formed ASCII STL with a single solid,
+    # files with multiple solids are left to the readers which keep them apart
+    body: Optional[bytes] = split_ascii_header(raw_content)
+    if body is None:
+        return None
+    facets_content, tail = split_ascii_facets(body)
+    if not is_ascii_stl_end(tail):
+        return None
+    return parse_ascii_facets(facets_content)
+
+
+def parse_stl(raw_content: bytes) -> Optional[np.ndarray]:
+    facets: Optional[np.ndarray] = parse_binary_stl(raw_content)
+    if facets is None and len(raw_content) <= ASCII_STREAMING_THRESHOLD:
+        facets = parse_ascii_stl(raw_content)
+    return facets
+
+
+def write_binary_stl(facets: np.ndarray, stl_file: Path):
+    with open(stl_file, "wb") as f:
+        f.write(BINARY_STL_HEADER)
+        f.write(struct.pack("<I", len(facets)))
+        f.write(np.ascontiguousarray(facets, dtype=STL_FACET_DTYPE).tobytes())
+
+
+def convert_ascii_stl(stl_file: Path, binary_stl_file: Path) -> bool:
+    # Converts an ASCII STL into a binary STL chunk by chunk, so memory use is bounded by ASCII_CHUNK_SIZE
+    # regardless of the file size. Returns False (and leaves no output) for anything but a well-formed ASCII STL.
+    facet_count: int = 0
+    with open(stl_file, "rb") as f_in, open(binary_stl_file, "wb") as f_out:
+        f_out.write(BINARY_STL_HEADER)
+        f_out.write(struct.pack("<I", facet_count))
+        pending: Optional[bytes] = split_ascii_header(f_in.read(ASCII_CHUNK_SIZE))
+        while pending is not None:
+            chunk: bytes = f_in.read(ASCII_CHUNK_SIZE)
+            facets_content, pending = split_ascii_facets(pending + chunk)
+            facets: Optional[np.ndarray] = parse_ascii_facets(facets_content)
+            if facets is None or len(pending) > ASCII_CHUNK_SIZE:
+                pending = None
+                break
+            f_out.write(facets.tobytes())
+            facet_count += len(facets)
+            if chunk == b"":
+                break
+        f_out.seek(STL_HEADER_SIZE)
+        f_out.write(struct.pack("<I", facet_count))
+    if pending is None or not is_ascii_stl_end(pending):
+        binary_stl_file.unlink(missing_ok=True)
+        return False
+    return True
+
+
+def prescreen_facets(facets: np.ndarray) -> Dict[str, int]:
+    # Conservative, vectorized approximation of the problems admesh repairs. Any non-zero counter
+    # means the mesh has to go through the full admesh repair to get exact statistics.
+    stats: Dict[str, int] = {key: 0 for key in PRESCREEN_KEYS}
+    if len(facets) == 0:
+        return stats
+
+    # Adding 0.0 folds -0.0 into 0.0, so that bitwise vertex comparison matches numeric comparison
+    vertices: np.ndarray = np.ascontiguousarray(facets["vertices"], dtype=np.float32) + np.float32(0.0)
+    v0, v1, v2 = vertices[:, 0], vertices[:, 1], vertices[:, 2]
+
+    # Facets with coincident vertices or zero area
+    cross: np.ndarray = np.cross(v1 - v0, v2 - v0)
+    degenerate: np.ndarray = (
+        np.all(v0 == v1, axis=1) | np.all(v1 == v2, axis=1) | np.all(v2 == v0, axis=1) | ~np.any(cross, axis=1)
+    )
+    stats["degenerate_facets"] = int(np.count_nonzero(degenerate))
+
+    # Stored normals pointing against the winding order
+    stored_normals: np.ndarray = np.asarray(facets["normal"], dtype=np.float32)
+    stats["inconsistent_normals"] = int(np.count_nonzero(np.einsum("ij,ij->i", stored_normals, cross) < 0))
+
+    # Inside-out meshes get all of their facets reversed by admesh
+    signed_volume: float = float(np.einsum("ij,ij->i", v0.astype(np.float64), np.cross(v1, v2).astype(np.float64)).sum())
+    stats["inverted_volume"] = int(signed_volume < 0)
+
+    # Map every vertex to an integer id by its exact bit pattern
+    vertex_keys: np.ndarray = vertices[~degenerate].reshape(-1, 3).view(np.dtype((np.void, 12))).ravel()
+    _, vertex_ids = np.unique(vertex_keys, return_inverse=True)
+    vertex_ids = vertex_ids.reshape(-1, 3).astype(np.int64)
+
+    # Every edge of a closed, consistently oriented mesh is shared by exactly two facets in opposite directions.
+    # Holes leave edges with a single facet, non-manifold edges have more than two.
+    edge_start: np.ndarray = vertex_ids.ravel()
+    edge_end: np.ndarray = np.roll(vertex_ids, -1, axis=1).ravel()
+    vertex_count: int = int(vertex_ids.max()) + 1 if vertex_ids.size > 0 else 0
+    edge_keys: np.ndarray = np.minimum(edge_start, edge_end) * vertex_count + np.maximum(edge_start, edge_end)
+    edge_forward: np.ndarray = (edge_start < edge_end).astype(np.int64)
+
+    order: np.ndarray = np.argsort(edge_keys, kind="stable")
+    sorted_keys: np.ndarray = edge_keys[order]
+    run_starts: np.ndarray = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+    run_lengths: np.ndarray = np.diff(np.append(run_starts, len(sorted_keys)))
+    forward_counts: np.ndarray = np.add.reduceat(edge_forward[order], run_starts) if len(run_starts) > 0 else run_starts
+
+    stats["unmatched_edges"] = int(np.count_nonzero(run_lengths != 2))
+    stats["backwards_edges"] = int(np.count_nonzero((run_lengths == 2) & (forward_counts != 1)))
+    return stats
+
+
+def prescreen_stl(stl_file: Path) -> Optional[Dict[str, int]]:
+    facets: Optional[np.ndarray] = load_binary_stl(stl_file)
+    if facets is None:
+        return None
+    return prescreen_facets(facets)
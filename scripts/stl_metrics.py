@@ -0,0 +1,176 @@
+import argparse
+import contextlib
+import cProfile
+import json
+import logging
+import resource
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+PROFILER_CPROFILE = "cprofile"
+PROFILER_PYINSTRUMENT = "pyinstrument"
+profiler_suffix_map: Dict[str, str] = {
+    PROFILER_CPROFILE: ".prof",
+    PROFILER_PYINSTRUMENT: ".html",
+}
+
+metric_column_map: Dict[str, str] = {
+    "load_time": "Load Time",
+    "repair_time": "Repair Time",
+    "tweak_time": "Tweak Time",
+    "render_time": "Render Time",
+    "total_time": "Total Time",
+    "facets": "Facets",
+    "worker_peak_rss_mb": "Worker Peak RSS",
+}
+
+
+def get_peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@contextlib.contextmanager
+def timed(metrics: Dict[str, float], key: str) -> Iterator[None]:
+    start_time: float = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics[key] = metrics.get(key, 0.0) + time.perf_counter() - start_time
+
+
+def get_profile_path(args: argparse.Namespace, stl_file: Path, stage: str) -> Path:
+    relative_name: str = stl_file.relative_to(args.input_dir).as_posix().replace("/", "__")
+    return Path(args.profile_dir, stage, relative_name + profiler_suffix_map[args.profiler])
+
+
+def start_profiler(profiler_name: str) -> Optional[Any]:
+    try:
+        if profiler_name == PROFILER_PYINSTRUMENT:
+            from pyinstrument import Profiler
+
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    except (ImportError, ValueError, RuntimeError) as e:
+        # Only one profiler can be active per process, e.g. in thread executor mode
+        logger.warning(f"Could not start {profiler_name} profiler: {e}")
+        return None
+
+
+def stop_profiler(profiler: Any, profile_path: Path):
+    profile_path.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        profiler.dump_stats(profile_path.as_posix())
+    else:
+        profiler.stop()
+        profile_path.write_text(profiler.output_html(), encoding="utf-8")
+
+
+@contextlib.contextmanager
+def measure_stl(metrics: Dict[str, float], stl_file: Path, args: argparse.Namespace, stage: str) -> Iterator[None]:
+    # Records total time and the peak RSS of the worker after one file, and profiles it if requested.
+    # ru_maxrss is a lifetime high-water mark, so it also covers the files the worker processed before
+    # and, in thread executor mode, all other threads.
+    profiler: Optional[Any] = start_profiler(args.profiler) if args.profile_dir is not None else None
+    try:
+        with timed(metrics, "total_time"):
+            yield
+    finally:
+        metrics["worker_peak_rss_mb"] = get_peak_rss_mb()
+        if profiler is not None:
+            stop_profiler(profiler=profiler, profile_path=get_profile_path(args=args, stl_file=stl_file, stage=stage))
+
+
+def extend_preamble(preamble: str, keys: List[str]) -> str:
+    # Appends metric columns to the header and separator line of a step summary table
+    lines: List[str] = preamble.split("\n")
+    header_index: int = next(index for index, line in enumerate(lines) if line.startswith("|"))
+    lines[header_index] = lines[header_index].rstrip().rstrip("|").rstrip() + " | " + " | ".join(metric_column_map[key] for key in keys) + " |"
+    lines[header_index + 1] = lines[header_index + 1].rstrip().rstrip("|").rstrip() + " | " + " | ".join("---" for _ in keys) + " |"
+    return "\n".join(lines)
+
+
+def make_metric_cells(metrics: Dict[str, float], keys: List[str]) -> List[str]:
+    cells: List[str] = []
+    for key in keys:
+        if key not in metrics:
+            cells.append("")
+        elif key == "facets":
+            cells.append(str(int(metrics[key])))
+        elif key == "worker_peak_rss_mb":
+            cells.append(f"{metrics[key]:.1f} MB")
+        else:
+            cells.append(f"{metrics[key] * 1000:.1f} ms")
+    return cells
+
+
+def write_metrics_file(metrics_file: Path, input_path: Path, stage: str, entries: List[Tuple[Path, Dict[str, Any]]]):
+    metrics_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(metrics_file, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "stage": stage,
+                "files": [{"file": stl_file.relative_to(input_path).as_posix(), **metrics} for stl_file, metrics in entries],
+            },
+            f,
+            indent=4,
+        )
+
+
+def keep_slowest_profiles(args: argparse.Namespace, stage: str, entries: List[Tuple[Path, Dict[str, float]]]):
+    # Every file is profiled, only the profiles of the slowest files are kept
+    if args.profile_dir is None:
+        return
+    ordered: List[Tuple[Path, Dict[str, float]]] = sorted(entries, key=lambda entry: entry[1].get("total_time", 0.0), reverse=True)
+    for stl_file, _ in ordered[args.profile_slowest :]:
+        get_profile_path(args=args, stl_file=stl_file, stage=stage).unlink(missing_ok=True)
+    logger.info(f"Kept the {stage} profiles of the {min(args.profile_slowest, len(ordered))} slowest STLs in {args.profile_dir}")
+
+
+def add_instrumentation_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--instrument",
+        required=False,
+        action="store_true",
+        help="Add per-file timing, facet count and peak memory columns to the step summary",
+    )
+    parser.add_argument(
+        "--metrics_file",
+        required=False,
+        action="store",
+        type=str,
+        help="File to store the per-file metrics as json into",
+    )
+    parser.add_argument(
+        "--profile_dir",
+        required=False,
+        action="store",
+        type=str,
+        help="Directory to store profiles of the slowest STLs into",
+    )
+    parser.add_argument(
+        "--profile_slowest",
+        required=False,
+        action="store",
+        type=int,
+        default=5,
+        help="Number of slowest STLs to keep the profiles of",
+    )
+    parser.add_argument(
+        "--profiler",
+        required=False,
+        action="store",
+        type=str,
+        choices=[PROFILER_CPROFILE, PROFILER_PYINSTRUMENT],
+        default=PROFILER_CPROFILE,
+        help="Profiler used with --profile_dir, pyinstrument requires the pyinstrument package",
+    )
@@ -0,0 +1,140 @@
+import struct
+import zlib
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+DEFAULT_IMAGE_SIZE: int = 300
+# Camera looks from the front-right-top, similar to the default view of stl-thumb
+CAMERA_AZIMUTH_DEG: float = -45.0
+CAMERA_ELEVATION_DEG: float = 35.0
+LIGHT_DIRECTION: np.ndarray = np.array([-0.3, 0.7, 0.65])
+MODEL_COLOR: np.ndarray = np.array([0.0, 0.45, 1.0])
+AMBIENT_LIGHT: float = 0.25
+IMAGE_MARGIN: float = 0.05
+# Every (triangle, pixel) candidate pair evaluated at once takes about 256 bytes of temporary arrays,
+# the chunks are bounded so that a render stays far below the memory limit of a checker worker
+CHUNK_MEMORY_BYTES: int = 64 * 1024 * 1024
+BYTES_PER_CANDIDATE: int = 256
+MAX_CANDIDATES_PER_CHUNK: int = CHUNK_MEMORY_BYTES // BYTES_PER_CANDIDATE
+
+
+def view_matrix() -> np.ndarray:
+    azimuth: float = np.radians(CAMERA_AZIMUTH_DEG)
+    elevation: float = np.radians(CAMERA_ELEVATION_DEG)
+    rotate_z: np.ndarray = np.array(
+        [[np.cos(azimuth), -np.sin(azimuth), 0], [np.sin(azimuth), np.cos(azimuth), 0], [0, 0, 1]]
+    )
+    # Tilt the model towards the camera, afterwards the camera looks along -Z of the view space
+    rotate_x: np.ndarray = np.array(
+        [[1, 0, 0], [0, np.sin(elevation), np.cos(elevation)], [0, -np.cos(elevation), np.sin(elevation)]]
+    )
+    return rotate_x @ rotate_z
+
+
+def project(triangles: np.ndarray, size: int) -> np.ndarray:
+    # Orthographic projection of (N, 3, 3) triangles into pixel coordinates, depth is kept in the third column
+    view_space: np.ndarray = triangles.reshape(-1, 3) @ view_matrix().T
+    lower: np.ndarray = view_space.min(axis=0)
+    upper: np.ndarray = view_space.max(axis=0)
+    extent: float = float(max(upper[0] - lower[0], upper[1] - lower[1])) or 1.0
+    scale: float = size * (1 - 2 * IMAGE_MARGIN) / extent
+    center: np.ndarray = (upper + lower) / 2
+    screen: np.ndarray = np.empty_like(view_space)
+    screen[:, 0] = (view_space[:, 0] - center[0]) * scale + size / 2
+    screen[:, 1] = size / 2 - (view_space[:, 1] - center[1]) * scale
+    screen[:, 2] = view_space[:, 2]
+    return screen.reshape(-1, 3, 3)
+
+
+def shade(triangles: np.ndarray) -> np.ndarray:
+    normals: np.ndarray = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]) @ view_matrix().T
+    lengths: np.ndarray = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+    light: np.ndarray = LIGHT_DIRECTION / np.linalg.norm(LIGHT_DIRECTION)
+    # Two-sided lighting, so that meshes with flipped normals still render sensibly
+    intensity: np.ndarray = AMBIENT_LIGHT + (1 - AMBIENT_LIGHT) * np.abs(normals @ light)
+    return np.clip(intensity[:, None] * MODEL_COLOR[None, :] * 255, 0, 255).astype(np.uint8)
+
+
+def rasterize(screen: np.ndarray, colors: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    image: np.ndarray = np.zeros((size * size, 4), dtype=np.uint8)
+    depth: np.ndarray = np.full(size * size, -np.inf)
+
+    # Pixel bounding box of every triangle, clipped to the image
+    x_min: np.ndarray = np.clip(np.floor(screen[:, :, 0].min(axis=1)), 0, size - 1).astype(np.int64)
+    x_max: np.ndarray = np.clip(np.ceil(screen[:, :, 0].max(axis=1)), 0, size - 1).astype(np.int64)
+    y_min: np.ndarray = np.clip(np.floor(screen[:, :, 1].min(axis=1)), 0, size - 1).astype(np.int64)
+    y_max: np.ndarray = np.clip(np.ceil(screen[:, :, 1].max(axis=1)), 0, size - 1).astype(np.int64)
+    widths: np.ndarray = x_max - x_min + 1
+    candidates: np.ndarray = widths * (y_max - y_min + 1)
+
+    # Process triangles in chunks so that the (triangle, pixel) candidate pairs fit into memory
+    cumulative_candidates: np.ndarray = np.cumsum(candidates)
+    chunk_start: int = 0
+    while chunk_start < len(screen):
+        previous_candidates: int = int(cumulative_candidates[chunk_start - 1]) if chunk_start > 0 else 0
+        chunk_end: int = int(np.searchsorted(cumulative_candidates, previous_candidates + MAX_CANDIDATES_PER_CHUNK, side="right"))
+        chunk: slice = slice(chunk_start, max(chunk_end, chunk_start + 1))
+        chunk_start = chunk.stop
+        counts: np.ndarray = candidates[chunk]
+        triangle_ids: np.ndarray = np.repeat(np.arange(chunk.start, chunk.start + len(counts)), counts)
+        # Index of every candidate pixel within its triangle's bounding box
+        offsets: np.ndarray = np.arange(len(triangle_ids)) - np.repeat(np.cumsum(counts) - counts, counts)
+        px: np.ndarray = x_min[triangle_ids] + offsets % widths[triangle_ids]
+        py: np.ndarray = y_min[triangle_ids] + offsets // widths[triangle_ids]
+
+        # Barycentric coordinates of the pixel centers
+        a: np.ndarray = screen[triangle_ids, 0]
+        b: np.ndarray = screen[triangle_ids, 1]
+        c: np.ndarray = screen[triangle_ids, 2]
+        sx: np.ndarray = px + 0.5
+        sy: np.ndarray = py + 0.5
+        area: np.ndarray = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+        valid_area: np.ndarray = area != 0
+        safe_area: np.ndarray = np.where(valid_area, area, 1.0)
+        w0: np.ndarray = ((b[:, 0] - sx) * (c[:, 1] - sy) - (b[:, 1] - sy) * (c[:, 0] - sx)) / safe_area
+        w1: np.ndarray = ((c[:, 0] - sx) * (a[:, 1] - sy) - (c[:, 1] - sy) * (a[:, 0] - sx)) / safe_area
+        w2: np.ndarray = 1 - w0 - w1
+        inside: np.ndarray = valid_area & (w0 >= 0) & (w1 >= 0) & (w2 >= 0)
+
+        pixel_ids: np.ndarray = (py * size + px)[inside]
+        z: np.ndarray = (w0 * a[:, 2] + w1 * b[:, 2] + w2 * c[:, 2])[inside]
+        triangle_ids = triangle_ids[inside]
+
+        # Z-buffer: the fragment closest to the camera (largest z) wins
+        order: np.ndarray = np.lexsort((-z, pixel_ids))
+        pixel_ids, z, triangle_ids = pixel_ids[order], z[order], triangle_ids[order]
+        first: np.ndarray = np.concatenate(([True], pixel_ids[1:] != pixel_ids[:-1])) if len(pixel_ids) > 0 else np.zeros(0, dtype=bool)
+        pixel_ids, z, triangle_ids = pixel_ids[first], z[first], triangle_ids[first]
+        closer: np.ndarray = z > depth[pixel_ids]
+        depth[pixel_ids[closer]] = z[closer]
+        image[pixel_ids[closer], :3] = colors[triangle_ids[closer]]
+        image[pixel_ids[closer], 3] = 255
+    return image.reshape(size, size, 4), depth.reshape(size, size)
+
+
+def encode_png(image: np.ndarray) -> bytes:
+    height, width, channels = image.shape
+
+    def chunk(chunk_type: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF)
+
+    # Filter type 0 (None) in front of every scanline
+    raw: bytes = np.hstack([np.zeros((height, 1), dtype=np.uint8), image.reshape(height, width * channels)]).tobytes()
+    header: bytes = struct.pack(">IIBBBBB", width, height, 8, 6 if channels == 4 else 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b"")
+
+
+def render_mesh(mesh: np.ndarray, size: int = DEFAULT_IMAGE_SIZE) -> bytes:
+    # Renders a shaded PNG of a (N*3, 3) or (N, 3, 3) vertex array without GPU or external binaries
+    triangles: np.ndarray = np.asarray(mesh, dtype=np.float64).reshape(-1, 3, 3)
+    if len(triangles) == 0:
+        return encode_png(np.zeros((size, size, 4), dtype=np.uint8))
+    image, _ = rasterize(screen=project(triangles, size), colors=shade(triangles), size=size)
+    return encode_png(image)
+
+
+def render_mesh_to_file(mesh: np.ndarray, image_path: Path, size: int = DEFAULT_IMAGE_SIZE):
+    image_path.write_bytes(render_mesh(mesh=mesh, size=size))
@@ -0,0 +1,129 @@
+import itertools
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+from git_history import get_changed_files
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+STEP_SUMMARY_DEFERRED_PREAMBLE = """
+### Deferred STLs
+
+The time budget of this run was exhausted before the following STLs could be checked:
+
+"""
+
+
+def is_stl(file_name: str) -> bool:
+    return file_name.endswith((".stl", ".STL"))
+
+
+def collect_changed_stls(input_path: Path, since: str, cache_dir: Optional[str] = None) -> Optional[List[Path]]:
+    changed: Optional[Dict[str, Optional[str]]] = get_changed_files(repo_dir=input_path, since=since)
+    if changed is None:
+        return None
+    stls: List[Path] = []
+    for stl, renamed_from in sorted(changed.items()):
+        if not is_stl(stl) or not Path(input_path, stl).exists():
+            continue
+        # The content is unchanged, so the result cache (--cache_dir) returns the result of the previous path
+        if renamed_from is not None:
+            if cache_dir is None:
+                logger.warning(f"{stl} was renamed from {renamed_from} without changes, but is checked again without --cache_dir")
+            else:
+                logger.info(f"{stl} was renamed from {renamed_from} without changes")
+        stls.append(Path(input_path, stl))
+    logger.info(f"{len(stls)} STLs changed since {since}")
+    return stls
+
+
+def collect_stls(input_path: Path, work_list: Optional[Path] = None, since: Optional[str] = None, cache_dir: Optional[str] = None) -> List[Path]:
+    # Resume from a persisted work list of a previous run if there is one
+    if work_list is not None and work_list.exists():
+        with open(work_list, "r", encoding="utf-8") as f:
+            pending: List[str] = json.load(f)
+        stls: List[Path] = [Path(input_path, stl) for stl in pending if Path(input_path, stl).exists()]
+        logger.info(f"Resuming {len(stls)} deferred STLs from {work_list}")
+        return stls
+    if since is not None:
+        changed_stls: Optional[List[Path]] = collect_changed_stls(input_path=input_path, since=since, cache_dir=cache_dir)
+        if changed_stls is not None:
+            return changed_stls
+        logger.warning("Checking all STLs instead")
+    return sorted(itertools.chain(input_path.glob("**/*.stl"), input_path.glob("**/*.STL")))
+
+
+def order_by_cost(stls: List[Path]) -> List[Path]:
+    # Both admesh and Tweak scale with the facet count, the file size is a cheap estimate for it.
+    # Cheapest first, so that a limited time budget checks as many files as possible.
+    return sorted(stls, key=lambda stl: (stl.stat().st_size, stl.as_posix()))
+
+
+def save_work_list(work_list: Path, input_path: Path, deferred: List[Path]):
+    if len(deferred) == 0:
+        work_list.unlink(missing_ok=True)
+        return
+    work_list.parent.mkdir(parents=True, exist_ok=True)
+    with open(work_list, "w", encoding="utf-8") as f:
+        json.dump([stl.relative_to(input_path).as_posix() for stl in deferred], f, indent=4)
+    logger.info(f"Persisted {len(deferred)} deferred STLs to {work_list}")
+
+
+def run_batches(
+    stls: List[Path],
+    process_batch: Callable[[List[Path]], List[T]],
+    batch_size: int,
+    time_budget: Optional[float] = None,
+    start_time: Optional[float] = None,
+) -> Tuple[List[T], List[Path]]:
+    # The time budget counts from start_time (time.monotonic()), e.g. the start of the run, so that the time spent
+    # before the first batch (collecting, hashing and indexing the STLs) is part of it
+    results: List[T] = []
+    if start_time is None:
+        start_time = time.monotonic()
+    processed_bytes: int = 0
+    # Only the batches themselves measure the throughput, the time spent before them says nothing about it
+    batch_time: float = 0.0
+    index: int = 0
+    while index < len(stls):
+        batch: List[Path] = stls[index : index + batch_size]
+        elapsed: float = time.monotonic() - start_time
+        if time_budget is not None:
+            batch_bytes: int = sum(stl.stat().st_size for stl in batch)
+            # Estimate the duration of the next batch from the throughput observed so far
+            estimate: float = batch_time / processed_bytes * batch_bytes if processed_bytes > 0 else 0.0
+            # Checked before every batch including the first one, an exhausted budget checks no STL at all
+            if elapsed >= time_budget or elapsed + estimate > time_budget:
+                break
+        batch_start_time: float = time.monotonic()
+        results.extend(process_batch(batch))
+        batch_time += time.monotonic() - batch_start_time
+        processed_bytes += sum(stl.stat().st_size for stl in batch)
+        index += len(batch)
+    deferred: List[Path] = stls[index:]
+    if len(deferred) > 0:
+        logger.warning(
+            f"Time budget of {time_budget}s exhausted after {len(results)} STLs, deferring {len(deferred)} STLs: "
+            + ", ".join(stl.as_posix() for stl in deferred)
+        )
+    return results, deferred
+
+
+def in_input_order(input_stls: List[Path], stls: List[Path], results: List[T]) -> Tuple[List[Path], List[T]]:
+    # Checked STLs and their results in the order they were collected in, instead of the cost order they were checked in.
+    # Deferred STLs are the tail of stls and have no result.
+    position: Dict[Path, int] = {stl: index for index, stl in enumerate(input_stls)}
+    checked: List[Tuple[Path, T]] = sorted(zip(stls, results), key=lambda entry: position[entry[0]])
+    return [stl for stl, _ in checked], [result for _, result in checked]
+
+
+def make_deferred_summary(input_path: Path, deferred: List[Path]) -> str:
+    if len(deferred) == 0:
+        return ""
+    return STEP_SUMMARY_DEFERRED_PREAMBLE + "".join(f"- {stl.relative_to(input_path).as_posix()}\n" for stl in deferred)
@@ -0,0 +1,77 @@
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from result_cache import file_content_hash
+from stl_mesh import ASCII_STREAMING_THRESHOLD, convert_ascii_stl, is_ascii_stl, load_binary_stl, parse_ascii_stl, write_binary_stl
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+SIDECAR_FILE_SUFFIX: str = ".stl"
+
+
+def sidecar_path(sidecar_dir: Path, content_hash: str) -> Path:
+    return Path(sidecar_dir, content_hash[:2], content_hash + SIDECAR_FILE_SUFFIX)
+
+
+def create_sidecar(stl_file: Path, sidecar_file: Path, facets: Optional[np.ndarray] = None) -> bool:
+    # Written to a temporary file first, so concurrent workers never load a partial sidecar
+    sidecar_file.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=sidecar_file.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        if facets is None and stl_file.stat().st_size > ASCII_STREAMING_THRESHOLD:
+            logger.info(f"Converting large ASCII STL {stl_file.as_posix()} in streaming mode")
+            converted: bool = convert_ascii_stl(stl_file=stl_file, binary_stl_file=Path(tmp_path))
+        else:
+            if facets is None:
+                facets = parse_ascii_stl(stl_file.read_bytes())
+            converted = facets is not None
+            if converted:
+                write_binary_stl(facets=facets, stl_file=Path(tmp_path))
+        if converted:
+            os.replace(tmp_path, sidecar_file)
+        return converted
+    except OSError as e:
+        logger.warning(f"Unable to write binary sidecar {sidecar_file}", exc_info=e)
+        return False
+    finally:
+        Path(tmp_path).unlink(missing_ok=True)
+
+
+def get_binary_stl(
+    stl_file: Path, sidecar_dir: Optional[str], content_hash: Optional[str] = None, facets: Optional[np.ndarray] = None
+) -> Path:
+    # Path downstream tools (admesh, tweaker3, stl-thumb) should load instead of stl_file: the binary sidecar of
+    # ASCII STLs, keyed by content hash, so every ASCII STL is only parsed as text once across stages and runs.
+    # Binary STLs and everything that can not be converted (e.g. multiple solids) are loaded from stl_file.
+    # Callers which already parsed the STL pass its facets, so it is not parsed again.
+    if sidecar_dir is None or not is_ascii_stl(stl_file):
+        return stl_file
+    if content_hash is None:
+        content_hash = file_content_hash(stl_file)
+    sidecar_file: Path = sidecar_path(sidecar_dir=Path(sidecar_dir), content_hash=content_hash)
+    if sidecar_file.exists():
+        logger.info(f"Using binary sidecar of {stl_file.as_posix()}")
+        # Refresh the mtime so that pruning evicts the least recently used sidecars first
+        os.utime(sidecar_file)
+        return sidecar_file
+    if not create_sidecar(stl_file=stl_file, sidecar_file=sidecar_file, facets=facets):
+        logger.info(f"{stl_file.as_posix()} can not be converted to a binary STL")
+        return stl_file
+    return sidecar_file
+
+
+def load_stl(stl_file: Path, sidecar_dir: Optional[str] = None, content_hash: Optional[str] = None) -> Optional[np.ndarray]:
+    # Facets of binary and ASCII STLs. Without a sidecar directory large ASCII STLs are not loaded,
+    # they are only ever converted in streaming mode.
+    binary_stl: Path = get_binary_stl(stl_file=stl_file, sidecar_dir=sidecar_dir, content_hash=content_hash)
+    facets: Optional[np.ndarray] = load_binary_stl(binary_stl)
+    if facets is None and binary_stl.stat().st_size <= ASCII_STREAMING_THRESHOLD:
+        facets = parse_ascii_stl(binary_stl.read_bytes())
+    return facets
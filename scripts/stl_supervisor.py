@@ -0,0 +1,152 @@
+import argparse
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import resource
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+# How long a worker gets to exit cleanly on shutdown before it is killed
+SHUTDOWN_TIMEOUT = 5.0
+
+
+def worker_main(connection: multiprocessing.connection.Connection, memory_limit_mb: Optional[float], initializer: Optional[Callable], initargs: Tuple):
+    if memory_limit_mb is not None:
+        # Allocations beyond the limit raise MemoryError (caught by the checkers) or crash the worker
+        memory_limit: int = int(memory_limit_mb * 1024 * 1024)
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    if initializer is not None:
+        initializer(*initargs)
+    while True:
+        task: Optional[Tuple[Callable, Tuple]] = connection.recv()
+        if task is None:
+            return
+        fn, call_args = task
+        connection.send(fn(*call_args))
+
+
+class Worker:
+    def __init__(self, memory_limit_mb: Optional[float], initializer: Optional[Callable], initargs: Tuple):
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.process: multiprocessing.Process = multiprocessing.Process(
+            target=worker_main, args=(child_connection, memory_limit_mb, initializer, initargs), daemon=True
+        )
+        self.process.start()
+        child_connection.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class Supervisor:
+    # Drop-in replacement for ProcessPoolExecutor.map, which runs every call in a worker process with a deadline.
+    # Workers which time out are killed, crashed workers are replaced. Both are reported through on_failure,
+    # which is called in the supervising process with the reason and the arguments of the failed call.
+    def __init__(
+        self,
+        on_failure: Callable[..., Any],
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+        memory_limit_mb: Optional[float] = None,
+        initializer: Optional[Callable] = None,
+        initargs: Tuple = (),
+    ):
+        self.on_failure: Callable[..., Any] = on_failure
+        self.max_workers: int = max_workers or os.cpu_count() or 1
+        self.timeout: Optional[float] = timeout
+        self.memory_limit_mb: Optional[float] = memory_limit_mb
+        self.initializer: Optional[Callable] = initializer
+        self.initargs: Tuple = initargs
+        self.idle: List[Worker] = []
+
+    def __enter__(self) -> "Supervisor":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def shutdown(self):
+        for worker in self.idle:
+            worker.connection.send(None)
+        for worker in self.idle:
+            worker.process.join(SHUTDOWN_TIMEOUT)
+            if worker.process.is_alive():
+                worker.kill()
+        self.idle = []
+
+    def _fail(self, reason: str, call_args: Tuple) -> Any:
+        # By convention the file being processed is the last argument
+        logger.error(f"Processing {call_args[-1]} failed: {reason}")
+        return self.on_failure(reason, *call_args)
+
+    def map(self, fn: Callable, *iterables: Iterable, chunksize: int = 1) -> List[Any]:
+        # chunksize is accepted for compatibility with Executor.map, every call is scheduled separately
+        calls: List[Tuple] = list(zip(*iterables))
+        results: List[Any] = [None] * len(calls)
+        pending: Deque[int] = deque(range(len(calls)))
+        busy: Dict[Worker, Tuple[int, Optional[float]]] = {}
+        while len(pending) > 0 or len(busy) > 0:
+            while len(pending) > 0 and (len(self.idle) > 0 or len(busy) < self.max_workers):
+                worker: Worker = self.idle.pop() if len(self.idle) > 0 else Worker(self.memory_limit_mb, self.initializer, self.initargs)
+                try:
+                    worker.connection.send((fn, calls[pending[0]]))
+                except (BrokenPipeError, ConnectionResetError):
+                    # The worker died while it was idle
+                    worker.kill()
+                    continue
+                index: int = pending.popleft()
+                busy[worker] = (index, time.monotonic() + self.timeout if self.timeout is not None else None)
+
+            deadlines: List[float] = [deadline for _, deadline in busy.values() if deadline is not None]
+            wait_timeout: Optional[float] = max(0.0, min(deadlines) - time.monotonic()) if len(deadlines) > 0 else None
+            multiprocessing.connection.wait(
+                [worker.connection for worker in busy] + [worker.process.sentinel for worker in busy], timeout=wait_timeout
+            )
+
+            now: float = time.monotonic()
+            for worker, (index, deadline) in list(busy.items()):
+                if worker.connection.poll():
+                    try:
+                        results[index] = worker.connection.recv()
+                        del busy[worker]
+                        self.idle.append(worker)
+                        continue
+                    except EOFError:
+                        pass
+                if not worker.process.is_alive():
+                    worker.kill()
+                    del busy[worker]
+                    results[index] = self._fail(f"worker crashed with exit code {worker.process.exitcode}", calls[index])
+                elif deadline is not None and now >= deadline:
+                    worker.kill()
+                    del busy[worker]
+                    results[index] = self._fail(f"timed out after {self.timeout}s", calls[index])
+        return results
+
+
+def is_supervised(args: argparse.Namespace) -> bool:
+    return args.file_timeout is not None or args.memory_limit_mb is not None
+
+
+def add_supervisor_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--file_timeout",
+        required=False,
+        action="store",
+        type=float,
+        help="Kill the analysis of a single STL after this many seconds and report it as exception",
+    )
+    parser.add_argument(
+        "--memory_limit_mb",
+        required=False,
+        action="store",
+        type=float,
+        help="Address space limit of the worker processes, STLs exceeding it are reported as exception",
+    )
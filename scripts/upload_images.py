@@ -1,12 +1,17 @@
 import argparse
 from concurrent.futures import ThreadPoolExecutor
 import functools
+import hashlib
 import itertools
+import json
 import logging
 import os
 from pathlib import Path
+import re
 import sys
-from typing import List
+from typing import Dict, List, Optional
+
+import requests
 from imagekitio import ImageKit
 from imagekitio.models.UploadFileRequestOptions import UploadFileRequestOptions
 from imagekitio.models.results import UploadFileResult
@@ -14,56 +19,121 @@ from imagekitio.models.results import UploadFileResult
 logging.basicConfig()
 logger = logging.getLogger(__name__)
 
+# Thumbnails and the variants of optimize_images.py, which keeps the originals of images it can not optimize
+IMAGE_PATTERNS: List[str] = ["**/*.png", "**/*.webp", "**/*.jpg", "**/*.jpeg"]
+MANIFEST_VERSION = 1
+# Thumbnails of the rotation checker end in a hash of the mesh content and render parameters, e.g. part_0123456789abcdef.png
+CONTENT_HASHED_NAME = re.compile(r"_[0-9a-f]{16}\.png$")
+HEAD_REQUEST_TIMEOUT = 30.0
+
 try:
     imagekit: ImageKit | None = ImageKit(
         private_key=os.environ["IMAGEKIT_PRIVATE_KEY"],
         public_key=os.environ["IMAGEKIT_PUBLIC_KEY"],
         url_endpoint=os.environ["IMAGEKIT_URL_ENDPOINT"],
     )
-    imagekit_options_common: UploadFileRequestOptions = UploadFileRequestOptions(
+except (KeyError, ValueError):
+    imagekit = None
+
+
+def load_manifest(manifest_file: Optional[Path]) -> Dict[str, Dict[str, str]]:
+    # folder -> file name -> content hash of every image that has already been uploaded
+    if manifest_file is None or not manifest_file.exists():
+        return {}
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        manifest: Dict = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        logger.info(f"Ignoring upload manifest {manifest_file} with outdated format")
+        return {}
+    return manifest["folders"]
+
+
+def save_manifest(manifest_file: Path, folders: Dict[str, Dict[str, str]]):
+    manifest_file.parent.mkdir(parents=True, exist_ok=True)
+    temporary_file: Path = manifest_file.with_name(manifest_file.name + ".tmp")
+    with open(temporary_file, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "folders": folders}, f, indent=4, sort_keys=True)
+    os.replace(temporary_file, manifest_file)
+
+
+def image_exists(folder: str, file_name: str) -> bool:
+    # Imagekit replaces "[", "]", "(", ")" with underscores
+    image_url: str = re.sub(r"\]|\[|\)|\(", "_", f"{os.environ['IMAGEKIT_URL_ENDPOINT']}/{folder}/{file_name}")
+    try:
+        response: requests.Response = requests.head(image_url, timeout=HEAD_REQUEST_TIMEOUT)
+    except requests.RequestException:
+        return False
+    return response.status_code == 200
+
+
+def upload_image(input_args: argparse.Namespace, manifest: Dict[str, Dict[str, str]], image_path: Path) -> Optional[str]:
+    # Returns the content hash of the image once it is available in imagekit, None if the upload failed
+    if imagekit is None:
+        logger.warning("No suitable imagekit credentials were found. Skipping image creation!")
+        return None
+
+    folder: str = image_path.parent.relative_to(Path(input_args.input_folder)).as_posix()
+    content: bytes = image_path.read_bytes()
+    content_hash: str = hashlib.sha256(content).hexdigest()
+    if not input_args.overwrite_existing:
+        if manifest.get(folder, {}).get(image_path.name) == content_hash:
+            logger.info(f"Image {folder}/{image_path.name} is in the upload manifest, skipping upload")
+            return content_hash
+        # Only content hashed names identify their content, any other existing image may be outdated and is uploaded again
+        if CONTENT_HASHED_NAME.search(image_path.name) is not None and image_exists(folder=folder, file_name=image_path.name):
+            logger.info(f"Image {folder}/{image_path.name} already exists, skipping upload")
+            return content_hash
+
+    # The options are created per upload, the folder differs between the concurrently uploaded images
+    imagekit_options: UploadFileRequestOptions = UploadFileRequestOptions(
         use_unique_file_name=False,
         is_private_file=False,
         overwrite_file=True,
         overwrite_ai_tags=True,
         overwrite_tags=True,
         overwrite_custom_metadata=True,
+        folder=folder,
     )
-except (KeyError, ValueError):
-    imagekit = None
-    imagekit_options_common = None
-
-def upload_image(input_args: argparse.Namespace, image_path: Path) -> bool:
-    if imagekit is None or imagekit_options_common is None:
-        logger.warning("No suitable imagekit credentials were found. Skipping image creation!")
-        return False
+    try:
+        result: UploadFileResult = imagekit.upload_file(file=content, file_name=image_path.name, options=imagekit_options)
+    except Exception as e:
+        logger.error(f"Uploading {folder}/{image_path.name} failed: {e}")
+        return None
+    logger.info(f"Uploaded {folder}/{image_path.name} to {result.url}")
+    return content_hash if result.url != "" else None
 
-    with open(image_path, "rb") as image:
-        imagekit_options: UploadFileRequestOptions = imagekit_options_common
-        imagekit_options.folder = image_path.parent.relative_to(Path(input_args.input_folder)).as_posix()
-        result: UploadFileResult = imagekit.upload_file(
-            file=image, file_name=image_path.name, options=imagekit_options
-        )
-    logger.warning(result)
-    return result.url != ""
 
 def main(args: argparse.Namespace):
+    if args.verbose:
+        logger.setLevel("INFO")
+
     input_path: Path = Path(args.input_folder)
 
     logger.info(f"Processing Image files in {str(input_path)}")
-    images: List[Path] = list(input_path.glob("**/*.png"))
+    images: List[Path] = list(itertools.chain.from_iterable(input_path.glob(pattern) for pattern in IMAGE_PATTERNS))
     if len(images) == 0:
         return
+
+    manifest_file: Optional[Path] = Path(args.manifest_file) if args.manifest_file is not None else None
+    manifest: Dict[str, Dict[str, str]] = load_manifest(manifest_file)
     with ThreadPoolExecutor() as pool:
-        results = pool.map(functools.partial(upload_image, args), images)
+        results: List[Optional[str]] = list(pool.map(functools.partial(upload_image, args, manifest), images))
+
+    # The manifest is only updated here, the upload threads just read it
+    for image_path, content_hash in zip(images, results):
+        if content_hash is not None:
+            manifest.setdefault(image_path.parent.relative_to(input_path).as_posix(), {})[image_path.name] = content_hash
+    if manifest_file is not None:
+        save_manifest(manifest_file=manifest_file, folders=manifest)
 
-    if not all(results):
+    if not all(content_hash is not None for content_hash in results):
         sys.exit(255)
 
 
 if __name__ == "__main__":
     parser: argparse.ArgumentParser = argparse.ArgumentParser(
-        prog="VoronDesign STL rotation checker & fixer",
-        description="This tool can be used to check the rotation of STLs in a folder and potentially fix them",
+        prog="VoronDesign image uploader",
+        description="This tool uploads all images in a folder to imagekit, skipping images which were uploaded before",
     )
     parser.add_argument(
         "-i",
@@ -71,7 +141,28 @@ if __name__ == "__main__":
         required=True,
         action="store",
         type=str,
-        help="Directory containing STL files to be checked",
+        help="Directory containing the images to be uploaded, subfolders are kept in imagekit",
+    )
+    parser.add_argument(
+        "-m",
+        "--manifest_file",
+        required=False,
+        action="store",
+        type=str,
+        help="Manifest of the content hashes of all uploaded images, images in it are not uploaded again",
+    )
+    parser.add_argument(
+        "--overwrite_existing",
+        required=False,
+        action="store_true",
+        help="Upload images even if they are in the manifest or, for content hashed thumbnail names, already exist",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        required=False,
+        action="store_true",
+        help="Print debug output to stdout",
     )
     args: argparse.Namespace = parser.parse_args()
-    main(args=args)
\ No newline at end of file
+    main(args=args)
@@ -0,0 +1,184 @@
+import argparse
+import functools
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import jsonschema
+import yaml
+
+from metadata_index import PARALLEL_CHUNKSIZE, PARALLEL_THRESHOLD, load_metadata_content, scan_metadata_files
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+STEP_SUMMARY_PREAMBLE = """## Metadata validation summary
+
+| File | Result | Errors |
+| --- | --- | --- |
+"""
+
+RESULT_SUCCESS = "✅ SUCCESS"
+RESULT_FAILURE = "❌ FAILURE"
+
+# Compiled once per process, either in main or in the initializer of each worker process
+validator: Optional[Any] = None
+
+
+def compile_validator(schema_file: str):
+    global validator
+    with open(schema_file, "r", encoding="utf-8") as f:
+        schema: Dict[str, Any] = json.load(f)
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    validator = validator_class(schema)
+
+
+def format_error(error: jsonschema.ValidationError) -> str:
+    location: str = "/".join(str(part) for part in error.absolute_path)
+    return f"{location or '<root>'}: {error.message}"
+
+
+def validate_metadata_file(root: Path, yml_file: Path) -> Tuple[str, List[str]]:
+    relative_path: str = yml_file.relative_to(root).as_posix()
+    try:
+        content: Any = load_metadata_content(yml_file.read_bytes())
+    except yaml.YAMLError as e:
+        return relative_path, [f"Invalid YAML: {e}"]
+    return relative_path, sorted(format_error(error) for error in validator.iter_errors(content))
+
+
+def validate_metadata_files(root: Path, yml_files: List[Path], schema_file: str, jobs: Optional[int] = None) -> List[Tuple[str, List[str]]]:
+    if len(yml_files) < PARALLEL_THRESHOLD or jobs == 1:
+        compile_validator(schema_file)
+        return [validate_metadata_file(root=root, yml_file=yml_file) for yml_file in yml_files]
+    with ProcessPoolExecutor(max_workers=jobs, initializer=compile_validator, initargs=(schema_file,)) as pool:
+        return list(pool.map(functools.partial(validate_metadata_file, root), yml_files, chunksize=PARALLEL_CHUNKSIZE))
+
+
+def make_step_summary(results: List[Tuple[str, List[str]]]) -> str:
+    # Only invalid files are listed, a repository with thousands of mods would exceed the step summary size limit
+    step_summary: str = STEP_SUMMARY_PREAMBLE
+    for relative_path, errors in results:
+        if len(errors) > 0:
+            escaped_errors: List[str] = [error.replace("|", "\\|").replace("\n", " ") for error in errors]
+            step_summary += f"| {relative_path} | {RESULT_FAILURE} | {'<br>'.join(escaped_errors)} |\n"
+    valid_count: int = sum(1 for _, errors in results if len(errors) == 0)
+    step_summary += f"| {valid_count} other files | {RESULT_SUCCESS} | |\n"
+    return step_summary
+
+
+def main(args: argparse.Namespace):
+    if args.verbose:
+        logger.setLevel("INFO")
+
+    root: Path = Path(args.input_dir)
+    start_time: float = time.perf_counter()
+    yml_files: List[Path] = scan_metadata_files(root)
+    results: List[Tuple[str, List[str]]] = validate_metadata_files(
+        root=root, yml_files=yml_files, schema_file=args.schema_file, jobs=args.jobs
+    )
+    duration: float = time.perf_counter() - start_time
+    invalid_count: int = sum(1 for _, errors in results if len(errors) > 0)
+    files_per_second: float = len(results) / duration if duration > 0 else 0.0
+    logger.info(f"Validated {len(results)} metadata files in {duration:.2f}s ({files_per_second:.0f} files/s), {invalid_count} invalid")
+
+    if args.report_file is not None:
+        Path(args.report_file).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.report_file, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "schema": args.schema_file,
+                    "files": len(results),
+                    "invalid": invalid_count,
+                    "duration": duration,
+                    "files_per_second": files_per_second,
+                    "results": {relative_path: errors for relative_path, errors in results},
+                },
+                f,
+                indent=4,
+            )
+
+    if args.github_step_summary:
+        with open(os.environ["GITHUB_STEP_SUMMARY"], "w", encoding="utf-8") as gh_step_summary:
+            gh_step_summary.write(make_step_summary(results))
+
+    if "GITHUB_OUTPUT" in os.environ:
+        with open(os.environ["GITHUB_OUTPUT"], "a") as f:
+            f.write(f"extended-outcome={'failure' if invalid_count > 0 else 'success'}\n")
+
+    if invalid_count > 0 and args.fail_on_error:
+        logger.error("Invalid metadata files detected!")
+        sys.exit(255)
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog="VoronDesign metadata validator",
+        description="This tool validates all .metadata.yml files in a folder against the metadata json schema",
+    )
+    parser.add_argument(
+        "-i",
+        "--input_dir",
+        required=True,
+        action="store",
+        type=str,
+        help="Directory containing the metadata files to be validated",
+    )
+    parser.add_argument(
+        "-s",
+        "--schema_file",
+        required=False,
+        action="store",
+        type=str,
+        default=Path(__file__).parent.parent.joinpath("support_files", "json_schema.json").as_posix(),
+        help="JSON schema to validate against",
+    )
+    parser.add_argument(
+        "-r",
+        "--report_file",
+        required=False,
+        action="store",
+        type=str,
+        help="File to store a machine readable json report into",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        required=False,
+        action="store",
+        type=int,
+        help="Number of worker processes for large repositories, defaults to the number of CPUs",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        required=False,
+        action="store_true",
+        help="Print debug output to stdout",
+    )
+    parser.add_argument(
+        "-f",
+        "--fail_on_error",
+        required=False,
+        action="store_true",
+        help="Whether to return an error exit code if one of the metadata files is invalid",
+    )
+    parser.add_argument(
+        "-g",
+        "--github_step_summary",
+        required=False,
+        action="store_true",
+        help="Whether to output a step summary when running inside a github action",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    args: argparse.Namespace = make_parser().parse_args()
+    main(args=args)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The scripts are run from their own directory and import each other as top level modules
+sys.path.insert(0, Path(__file__).parent.parent.joinpath("scripts").as_posix())
@@ -0,0 +1,21 @@
+from pathlib import Path
+
+import check_stl_rotation
+from check_stl_rotation import RESULT_EXCEPTION, ReturnStatus, check_stl_rotation as check_stl
+
+
+def test_analysis_exception_is_reported_as_exception_row(monkeypatch, tmp_path: Path):
+    def failing_check_rotation(**kwargs):
+        raise RuntimeError("analysis failed")
+
+    monkeypatch.setattr(check_stl_rotation, "check_rotation", failing_check_rotation)
+    args = check_stl_rotation.make_parser().parse_args(
+        ["--input_dir", tmp_path.as_posix(), "--url_endpoint", "https://example.com", "--imagekit_subfolder", "ci"]
+    )
+    stl_file: Path = Path(tmp_path, "part.stl")
+    stl_file.write_bytes(b"")
+
+    status, row, _ = check_stl(input_args=args, stl_file_path=stl_file)
+
+    assert status == ReturnStatus.EXCEPTION
+    assert row == f"| part.stl | {RESULT_EXCEPTION} |  |  |\n"
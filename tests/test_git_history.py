@@ -0,0 +1,67 @@
+import os
+import subprocess
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from git_history import build_last_changed_index
+
+DIRECTORIES: List[str] = ["branch_only", "main_only", "both_sides", "merge_only", "unchanged"]
+
+
+def git(repo_dir: Path, *args: str, date: str = "2024-01-01T00:00:00"):
+    env = {**os.environ, "GIT_AUTHOR_DATE": date, "GIT_COMMITTER_DATE": date}
+    subprocess.run(["git", "-C", repo_dir.as_posix(), *args], check=True, stdout=subprocess.DEVNULL, env=env)
+
+
+def write(repo_dir: Path, file_name: str, content: str):
+    Path(repo_dir, file_name).parent.mkdir(parents=True, exist_ok=True)
+    Path(repo_dir, file_name).write_text(content)
+
+
+@pytest.fixture
+def merged_repo(tmp_path: Path) -> Path:
+    git(tmp_path, "init", "-q", "-b", "main")
+    git(tmp_path, "config", "user.email", "test@example.com")
+    git(tmp_path, "config", "user.name", "test")
+    for directory in DIRECTORIES:
+        write(tmp_path, f"{directory}/a.txt", "1")
+        write(tmp_path, f"{directory}/b.txt", "1")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-q", "-m", "initial", date="2024-01-01T00:00:00")
+
+    git(tmp_path, "checkout", "-q", "-b", "feature")
+    write(tmp_path, "branch_only/a.txt", "2")
+    write(tmp_path, "both_sides/a.txt", "2")
+    git(tmp_path, "commit", "-q", "-a", "-m", "feature", date="2024-02-01T00:00:00")
+
+    git(tmp_path, "checkout", "-q", "main")
+    write(tmp_path, "main_only/a.txt", "2")
+    write(tmp_path, "both_sides/b.txt", "2")
+    git(tmp_path, "commit", "-q", "-a", "-m", "main", date="2024-03-01T00:00:00")
+
+    # The merge itself changes merge_only, like a conflict resolution
+    git(tmp_path, "merge", "-q", "--no-ff", "--no-commit", "feature")
+    write(tmp_path, "merge_only/a.txt", "2")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-q", "-m", "merge", date="2024-04-01T00:00:00")
+    return tmp_path
+
+
+def test_merge_commits_match_per_directory_log(merged_repo: Path):
+    expected = {
+        directory: subprocess.run(
+            ["git", "-C", merged_repo.as_posix(), "log", "-n", "1", "--date=iso-local", "--format=%cd", "--", directory],
+            check=True,
+            stdout=subprocess.PIPE,
+        )
+        .stdout.decode("utf-8")
+        .strip()
+        for directory in DIRECTORIES
+    }
+    last_changed = build_last_changed_index(repo_dir=merged_repo, directories=DIRECTORIES)
+    assert last_changed == expected
+    assert last_changed["branch_only"].startswith("2024-02-01")
+    assert last_changed["both_sides"].startswith("2024-04-01")
+    assert last_changed["merge_only"].startswith("2024-04-01")